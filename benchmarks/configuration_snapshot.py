@@ -0,0 +1,80 @@
+"""
+Measures overhead of resolving cache configuration on the cache-hit path.
+
+Unversioned configuration is resolved on every call (only components used by the call are read),
+while versioned one is resolved only when it changes.
+
+Both numbers are measured with the code currently installed. To compare with a release preceding versioned
+configurations (which resolved every configuration on every call), run this script against its checkout -
+UnversionedCacheConfiguration implements only methods available in every release.
+
+Run with: python -m benchmarks.configuration_snapshot
+"""
+
+import asyncio
+import time
+from datetime import timedelta
+
+from memoize.configuration import CacheConfiguration, MutableCacheConfiguration, DefaultInMemoryCacheConfiguration
+from memoize.entrybuilder import CacheEntryBuilder
+from memoize.eviction import EvictionStrategy
+from memoize.key import KeyExtractor
+from memoize.postprocessing import Postprocessing
+from memoize.storage import CacheStorage
+from memoize.wrapper import memoize
+
+CALLS = 200_000
+
+
+class UnversionedCacheConfiguration(CacheConfiguration):
+    """Delegates to another configuration but does not expose its version."""
+
+    def __init__(self, delegate: CacheConfiguration) -> None:
+        self._delegate = delegate
+
+    def configured(self) -> bool:
+        return self._delegate.configured()
+
+    def method_timeout(self) -> timedelta:
+        return self._delegate.method_timeout()
+
+    def entry_builder(self) -> CacheEntryBuilder:
+        return self._delegate.entry_builder()
+
+    def key_extractor(self) -> KeyExtractor:
+        return self._delegate.key_extractor()
+
+    def storage(self) -> CacheStorage:
+        return self._delegate.storage()
+
+    def eviction_strategy(self) -> EvictionStrategy:
+        return self._delegate.eviction_strategy()
+
+    def postprocessing(self) -> Postprocessing:
+        return self._delegate.postprocessing()
+
+
+async def measure_hit_ns(configuration: CacheConfiguration, calls: int = CALLS) -> float:
+    @memoize(configuration=configuration)
+    async def cached(arg):
+        return arg
+
+    await cached(1)
+
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        await cached(1)
+    return (time.perf_counter_ns() - start) / calls
+
+
+async def main() -> None:
+    unversioned = await measure_hit_ns(UnversionedCacheConfiguration(
+        MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration())))
+    versioned = await measure_hit_ns(MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration()))
+
+    print('cache hit, configuration resolved on every call: {:8.0f} ns/call'.format(unversioned))
+    print('cache hit, versioned configuration snapshot:     {:8.0f} ns/call'.format(versioned))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
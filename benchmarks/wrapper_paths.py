@@ -0,0 +1,256 @@
+"""
+Measures per-call overhead (ns/call) of the main paths of the cache wrapper:
+
+* hit - value served from cache;
+* cold_miss - value missing in cache (each call uses a new key, so entries get evicted once capacity is reached);
+* refresh_trigger - value served from cache while its update point is reached
+  (includes the background refresh itself, which runs between calls);
+* blocking_expiry - value expired, so every call waits for its refresh;
+* dogpile - N concurrent calls for the same missing value (reported per call).
+
+Each path is measured for the default configuration and for custom configurations - mutable ones (versioned,
+so resolved only when they change) and a plain CacheConfiguration subclass (unversioned, so resolved on every call).
+
+Run with: python -m benchmarks.wrapper_paths [--json] [--output FILE] [--compare FILE] [--calls N] [--dogpile N]
+
+JSON output (--json/--output) is meant to be stored & compared between releases (--compare shows relative change
+against results stored earlier).
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Any
+
+from memoize.configuration import CacheConfiguration, DefaultInMemoryCacheConfiguration, MutableCacheConfiguration
+from memoize.entrybuilder import CacheEntryBuilder, ProvidedLifeSpanCacheEntryBuilder
+from memoize.eviction import EvictionStrategy, LeastRecentlyUpdatedEvictionStrategy, \
+    LeastRecentlyUsedEvictionStrategy, WindowTinyLfuEvictionStrategy, ClockEvictionStrategy
+from memoize.key import KeyExtractor, EncodedMethodReferenceAndArgsKeyExtractor
+from memoize.postprocessing import Postprocessing, NoPostprocessing, DeepcopyPostprocessing
+from memoize.storage import CacheStorage, LocalInMemoryCacheStorage
+from memoize.wrapper import memoize
+
+CALLS = 20_000
+DOGPILE = 100
+
+LONG = timedelta(hours=1)
+NONE = timedelta(0)
+
+ConfigurationFactory = Callable[[timedelta, timedelta], CacheConfiguration]
+
+
+def default_configuration(update_after: timedelta, expire_after: timedelta) -> CacheConfiguration:
+    return DefaultInMemoryCacheConfiguration(update_after=update_after, expire_after=expire_after)
+
+
+def large_capacity_configuration(update_after: timedelta, expire_after: timedelta) -> CacheConfiguration:
+    return MutableCacheConfiguration \
+        .initialized_with(DefaultInMemoryCacheConfiguration()) \
+        .set_eviction_strategy(LeastRecentlyUpdatedEvictionStrategy(capacity=1_000_000)) \
+        .set_entry_builder(ProvidedLifeSpanCacheEntryBuilder(update_after=update_after, expire_after=expire_after))
+
+
+def lru_configuration(update_after: timedelta, expire_after: timedelta) -> CacheConfiguration:
+    return MutableCacheConfiguration \
+        .initialized_with(DefaultInMemoryCacheConfiguration(update_after=update_after, expire_after=expire_after)) \
+        .set_eviction_strategy(LeastRecentlyUsedEvictionStrategy())
+
+
+def tinylfu_configuration(update_after: timedelta, expire_after: timedelta) -> CacheConfiguration:
+    return MutableCacheConfiguration \
+        .initialized_with(DefaultInMemoryCacheConfiguration(update_after=update_after, expire_after=expire_after)) \
+        .set_eviction_strategy(WindowTinyLfuEvictionStrategy())
+
+
+def clock_configuration(update_after: timedelta, expire_after: timedelta) -> CacheConfiguration:
+    return MutableCacheConfiguration \
+        .initialized_with(DefaultInMemoryCacheConfiguration(update_after=update_after, expire_after=expire_after)) \
+        .set_eviction_strategy(ClockEvictionStrategy())
+
+
+def deepcopy_configuration(update_after: timedelta, expire_after: timedelta) -> CacheConfiguration:
+    return MutableCacheConfiguration \
+        .initialized_with(DefaultInMemoryCacheConfiguration(update_after=update_after, expire_after=expire_after)) \
+        .set_postprocessing(DeepcopyPostprocessing())
+
+
+class PlainCacheConfiguration(CacheConfiguration):
+    """Custom configuration implementing only required methods (so it is unversioned)."""
+
+    def __init__(self, update_after: timedelta, expire_after: timedelta) -> None:
+        self._storage = LocalInMemoryCacheStorage()
+        self._key_extractor = EncodedMethodReferenceAndArgsKeyExtractor()
+        self._eviction_strategy = LeastRecentlyUpdatedEvictionStrategy()
+        self._entry_builder = ProvidedLifeSpanCacheEntryBuilder(update_after=update_after, expire_after=expire_after)
+        self._postprocessing = NoPostprocessing()
+
+    def configured(self) -> bool:
+        return True
+
+    def method_timeout(self) -> timedelta:
+        return timedelta(minutes=2)
+
+    def entry_builder(self) -> CacheEntryBuilder:
+        return self._entry_builder
+
+    def key_extractor(self) -> KeyExtractor:
+        return self._key_extractor
+
+    def storage(self) -> CacheStorage:
+        return self._storage
+
+    def eviction_strategy(self) -> EvictionStrategy:
+        return self._eviction_strategy
+
+    def postprocessing(self) -> Postprocessing:
+        return self._postprocessing
+
+
+def unversioned_configuration(update_after: timedelta, expire_after: timedelta) -> CacheConfiguration:
+    return PlainCacheConfiguration(update_after=update_after, expire_after=expire_after)
+
+
+CONFIGURATIONS: Dict[str, ConfigurationFactory] = {
+    'default': default_configuration,
+    'large_capacity': large_capacity_configuration,
+    'lru': lru_configuration,
+    'tinylfu': tinylfu_configuration,
+    'clock': clock_configuration,
+    'deepcopy': deepcopy_configuration,
+    'unversioned': unversioned_configuration,
+}
+
+
+async def _drain_background_tasks() -> None:
+    await asyncio.sleep(0)
+    current = asyncio.current_task()
+    pending = [task for task in asyncio.all_tasks() if task is not current]
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _timed(calls: int, call: Callable[[int], Awaitable[Any]]) -> float:
+    start = time.perf_counter_ns()
+    for i in range(calls):
+        await call(i)
+    return (time.perf_counter_ns() - start) / calls
+
+
+async def measure_hit(configuration: ConfigurationFactory, calls: int) -> float:
+    @memoize(configuration=configuration(LONG, LONG))
+    async def cached(arg):
+        return [arg]
+
+    await cached(0)
+    return await _timed(calls, lambda i: cached(0))
+
+
+async def measure_cold_miss(configuration: ConfigurationFactory, calls: int) -> float:
+    @memoize(configuration=configuration(LONG, LONG))
+    async def cached(arg):
+        return [arg]
+
+    result = await _timed(calls, cached)
+    await _drain_background_tasks()
+    return result
+
+
+async def measure_refresh_trigger(configuration: ConfigurationFactory, calls: int) -> float:
+    @memoize(configuration=configuration(NONE, LONG))
+    async def cached(arg):
+        return [arg]
+
+    async def call(i: int) -> None:
+        await cached(0)
+        await _drain_background_tasks()
+
+    await cached(0)
+    return await _timed(calls, call)
+
+
+async def measure_blocking_expiry(configuration: ConfigurationFactory, calls: int) -> float:
+    @memoize(configuration=configuration(NONE, NONE))
+    async def cached(arg):
+        return [arg]
+
+    await cached(0)
+    result = await _timed(calls, lambda i: cached(0))
+    await _drain_background_tasks()
+    return result
+
+
+async def measure_dogpile(configuration: ConfigurationFactory, calls: int, concurrency: int) -> float:
+    @memoize(configuration=configuration(LONG, LONG))
+    async def cached(arg):
+        await asyncio.sleep(0)
+        return [arg]
+
+    async def call(i: int) -> None:
+        await asyncio.gather(*[cached(i) for _ in range(concurrency)])
+
+    rounds = max(calls // concurrency, 1)
+    result = await _timed(rounds, call) / concurrency
+    await _drain_background_tasks()
+    return result
+
+
+async def run(calls: int, concurrency: int) -> List[Dict[str, Any]]:
+    results = []
+    for configuration_name, configuration in CONFIGURATIONS.items():
+        measurements = [
+            ('hit', await measure_hit(configuration, calls)),
+            ('cold_miss', await measure_cold_miss(configuration, calls)),
+            ('refresh_trigger', await measure_refresh_trigger(configuration, calls)),
+            ('blocking_expiry', await measure_blocking_expiry(configuration, calls)),
+            ('dogpile', await measure_dogpile(configuration, calls, concurrency)),
+        ]
+        for path, ns_per_call in measurements:
+            results.append({'path': path, 'configuration': configuration_name, 'ns_per_call': round(ns_per_call, 1)})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measures overhead of the main paths of the cache wrapper.')
+    parser.add_argument('--calls', type=int, default=CALLS, help='calls per measurement; default = %(default)s')
+    parser.add_argument('--dogpile', type=int, default=DOGPILE,
+                        help='concurrent calls in dogpile measurement; default = %(default)s')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--output', help='write results (as JSON) to given file')
+    parser.add_argument('--compare', help='compare results with ones stored (as JSON) in given file')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.calls, args.dogpile))
+    report = {
+        'python': '{} {}'.format(platform.python_implementation(), platform.python_version()),
+        'machine': platform.machine(),
+        'calls': args.calls,
+        'dogpile': args.dogpile,
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    baseline: Dict[Any, float] = {}
+    if args.compare:
+        with open(args.compare) as stored:
+            baseline = {(result['path'], result['configuration']): result['ns_per_call']
+                        for result in json.load(stored)['results']}
+    for result in results:
+        line = '{path:<16} {configuration:<16} {ns_per_call:10.0f} ns/call'.format(**result)
+        previous = baseline.get((result['path'], result['configuration']))
+        if previous:
+            line += ' ({:+.1%} vs {:.0f})'.format(result['ns_per_call'] / previous - 1, previous)
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
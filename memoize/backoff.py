@@ -0,0 +1,73 @@
+"""
+[API] Provides interface (and built-in implementations)
+of negative caching - for how long failures of cached method should be served from cache.
+This interface is used in cache configuration.
+"""
+
+from abc import ABCMeta, abstractmethod
+from datetime import timedelta
+
+from typing import Optional, Union
+from asyncio import CancelledError
+
+
+class CachedFailure:
+    """Value of an entry that represents failure of cached method (stored only if FailureBackoff allows it)."""
+
+    def __init__(self, exception: Union[Exception, CancelledError], failures: int) -> None:
+        self.exception = exception
+        self.failures = failures
+
+    def __repr__(self) -> str:
+        return "CachedFailure[exception={exception},failures={failures}]".format(
+            exception=repr(self.exception), failures=self.failures)
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+
+class FailureBackoff(metaclass=ABCMeta):
+    @abstractmethod
+    def backoff(self, failures: int) -> Optional[timedelta]:
+        """Determines for how long failure should be served from cache (instead of calling cached method again)
+        after given number of consecutive failures (starting from 1). If None is returned, failure is not cached."""
+        raise NotImplementedError()
+
+
+class NoFailureBackoff(FailureBackoff):
+    """Failures are not cached (each call after a failure calls cached method again)."""
+
+    def backoff(self, failures: int) -> Optional[timedelta]:
+        return None
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[]".format(name=self.__class__)
+
+
+class ExponentialFailureBackoff(FailureBackoff):
+    """Failures are cached for time growing exponentially with number of consecutive failures (up to a limit)."""
+
+    def __init__(self, initial: timedelta = timedelta(seconds=1), maximum: timedelta = timedelta(minutes=1),
+                 multiplier: float = 2.0) -> None:
+        """
+        :param datetime.timedelta initial:              for how long first failure is cached; default = 1 second
+        :param datetime.timedelta maximum:              upper limit of the time failure is cached; default = 1 minute
+        :param float multiplier:                        growth of the time with each consecutive failure; default = 2
+        """
+        self._initial = initial
+        self._maximum = maximum
+        self._multiplier = multiplier
+
+    def backoff(self, failures: int) -> Optional[timedelta]:
+        seconds = self._initial.total_seconds() * self._multiplier ** min(failures - 1, 64)
+        return min(timedelta(seconds=min(seconds, self._maximum.total_seconds())), self._maximum)
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[initial={initial},maximum={maximum},multiplier={multiplier}]".format(
+            name=self.__class__, initial=self._initial, maximum=self._maximum, multiplier=self._multiplier)
@@ -0,0 +1,322 @@
+"""
+[API] Provides a wrapper that caches results of batch methods (taking a collection of ids and returning a dict)
+as separate per-id entries.
+"""
+
+import asyncio
+import collections
+import functools
+import logging
+import time
+from asyncio import CancelledError
+from typing import Optional, Callable, Dict, List, Any, Hashable, Tuple, Awaitable, Union, Deque
+
+from memoize.configuration import CacheConfiguration, NotConfiguredCacheCalledException, \
+    DefaultInMemoryCacheConfiguration, FrozenCacheConfiguration, LazyCacheConfiguration
+from memoize.entry import CacheKey, CacheEntry, early_refresh_due
+from memoize.exceptions import CachedMethodFailedException
+from memoize.invalidation import InvalidationSupport
+from memoize.key import KeyExtractor, InstanceScopedKeyExtractor
+from memoize.metrics import CacheEvent, Latency
+from memoize.statuses import UpdateStatuses, InMemoryLocks
+
+Item = Hashable
+
+
+class _ItemNotReturned(KeyError):
+    """Marks an update of an item that was requested from wrapped method but was absent in its results."""
+
+
+def memoize_batch(method: Optional[Callable] = None, configuration: Optional[CacheConfiguration] = None,
+                  invalidation: Optional[InvalidationSupport] = None,
+                  update_statuses: Optional[UpdateStatuses] = None, ids_position: int = 0):
+    """Wraps batch function with memoization. Wrapped function has to accept a collection of ids
+    (as a positional argument at `ids_position`) and return a dict of results keyed by these ids.
+
+    Every id is cached as a separate entry, so calls with overlapping ids share cached results.
+    Key of an entry is formatted by the configured KeyExtractor as if wrapped function was called with a single id
+    in place of the collection (this is also how ids should be passed to InvalidationSupport).
+
+    Upon call, all entries are requested from storage at once (see CacheStorage.get_many)
+    and wrapped function is called (at most once) with missing/expired ids only.
+    Ids that are being refreshed concurrently are not requested again - their refreshes are awaited instead.
+    Ids absent in results of wrapped function are neither cached nor returned.
+
+    Refreshing semantics (update/expiry, early refreshes), failures and 'force_refresh_memoized' flag
+    are the same as in memoize.wrapper.memoize.
+
+    Note: Following settings of configuration are not supported (they are ignored): `failure_backoff`
+    (failures are not cached), `stale_if_error` (failed refreshes of expired ids fail the call),
+    `max_blocking_wait` (calls wait for refreshes without a limit) and `profiler` (calls are not profiled).
+
+    :param function method:                         function to be decorated
+    :param CacheConfiguration configuration:        cache configuration; default: DefaultInMemoryCacheConfiguration
+    :param InvalidationSupport invalidation:        pass created instance of InvalidationSupport to have it configured
+    :param UpdateStatuses update_statuses:          allows to override how cache updates are tracked (e.g. lock config);
+                                                    default: InMemoryStatuses
+    :param int ids_position:                        position of the argument holding collection of ids; default: 0
+                                                    (set to 1 for methods, to skip 'self')
+
+    :raises: CachedMethodFailedException            upon call: if cached method timed-out or thrown an exception
+    :raises: NotConfiguredCacheCalledException      upon call: if provided configuration is not ready
+    """
+
+    if method is None:
+        if configuration is None:
+            configuration = DefaultInMemoryCacheConfiguration()
+        return functools.partial(
+            memoize_batch,
+            configuration=configuration,
+            invalidation=invalidation,
+            update_statuses=update_statuses,
+            ids_position=ids_position,
+        )
+
+    if invalidation is not None and not invalidation._initialized() and configuration is not None:
+        invalidation._initialize(configuration.storage(), configuration.key_extractor(), method)
+
+    logger = logging.getLogger('{}@{}'.format(memoize_batch.__name__, method.__name__))
+    logger.debug('wrapping %s with batch memoization - configuration: %s', method.__name__, configuration)
+
+    if update_statuses is None:
+        update_statuses = InMemoryLocks()
+
+    snapshot: Optional[Union[FrozenCacheConfiguration, LazyCacheConfiguration]] = None
+
+    def resolve_configuration(current: CacheConfiguration) -> CacheConfiguration:
+        nonlocal snapshot
+        if snapshot is None or not snapshot.is_up_to_date_with(current):
+            if current.version() is None:
+                # unversioned configuration is resolved on every call (reading only components the call uses)
+                snapshot = LazyCacheConfiguration(current)
+            else:
+                snapshot = FrozenCacheConfiguration.initialized_with(current)
+            track_released_keys(snapshot.key_extractor())
+        return snapshot
+
+    released_keys: Deque[CacheKey] = collections.deque()  # keys of collected instances (InstanceScopedKeyExtractor)
+    tracked_key_extractors: List[KeyExtractor] = []
+    last_key_extractor: Optional[KeyExtractor] = None
+
+    def track_released_keys(key_extractor: KeyExtractor) -> None:
+        nonlocal last_key_extractor
+        if key_extractor is last_key_extractor:
+            return  # unversioned configurations are resolved on every call
+        last_key_extractor = key_extractor
+        if isinstance(key_extractor, InstanceScopedKeyExtractor) and key_extractor not in tracked_key_extractors:
+            tracked_key_extractors.append(key_extractor)
+            key_extractor.add_release_listener(on_keys_released)
+
+    def on_keys_released(keys: List[CacheKey]) -> None:
+        # called by garbage collector, so releasing is only scheduled (or left for the next call if IO-loop is not
+        # running in current thread)
+        released_keys.extend(keys)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.call_soon(asyncio.ensure_future, release_collected())
+
+    async def release_collected() -> None:
+        if snapshot is None:
+            return
+        configuration_snapshot = snapshot
+        # popped one by one, as garbage collector may add keys meanwhile
+        keys = [released_keys.popleft() for _ in range(len(released_keys))]
+        await try_release(keys, configuration_snapshot)
+
+    def args_for(args: Tuple[Any, ...], ids: Any) -> Tuple[Any, ...]:
+        return args[:ids_position] + (ids,) + args[ids_position + 1:]
+
+    async def try_release(keys: List[CacheKey], configuration_snapshot: CacheConfiguration) -> None:
+        # keys being updated are skipped (their entries are about to be written)
+        releasable = [key for key in keys if not update_statuses.is_being_updated(key)]
+        if not releasable:
+            return
+        try:
+            await configuration_snapshot.storage().release_many(releasable)
+            configuration_snapshot.key_extractor().on_released(releasable)
+            eviction_strategy = configuration_snapshot.eviction_strategy()
+            metrics = configuration_snapshot.metrics_listener()
+            for key in releasable:
+                eviction_strategy.mark_released(key)
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.RELEASE, key)
+            logger.debug('Released cache keys %s', releasable)
+        except Exception as e:
+            logger.error('Failed to release cache keys %s: %s', releasable, e)
+
+    def release_over_capacity(configuration_snapshot: CacheConfiguration) -> None:
+        # once all entries of a batch are written, so entries over capacity are released with a single task
+        to_release = configuration_snapshot.eviction_strategy().next_batch_to_release()
+        if to_release:
+            asyncio.get_event_loop().call_soon(
+                asyncio.ensure_future,
+                try_release(to_release, configuration_snapshot)
+            )
+
+    async def store(key: CacheKey, value: Any, computation_time: float,
+                    configuration_snapshot: CacheConfiguration) -> CacheEntry:
+        offered_entry = configuration_snapshot.entry_builder().build(key, value)
+        offered_entry.computation_time = computation_time
+        metrics = configuration_snapshot.metrics_listener()
+        eviction_strategy = configuration_snapshot.eviction_strategy()
+        if not eviction_strategy.admits(key, offered_entry):
+            # previous entry (if any) would be outdated
+            logger.debug('Entry not admitted to cache for key %s', key)
+            await configuration_snapshot.storage().release(key)
+            eviction_strategy.mark_released(key)
+            configuration_snapshot.key_extractor().on_released([key])
+            update_statuses.mark_updated(key, offered_entry)
+            return offered_entry
+        if metrics is None:
+            await configuration_snapshot.storage().offer(key, offered_entry)
+        else:
+            offer_started = time.perf_counter()
+            await configuration_snapshot.storage().offer(key, offered_entry)
+            metrics.on_latency(Latency.STORAGE_OFFER, time.perf_counter() - offer_started)
+        update_statuses.mark_updated(key, offered_entry)
+
+        eviction_strategy.mark_written(key, offered_entry)
+        configuration_snapshot.key_extractor().on_written(key)
+        return offered_entry
+
+    async def refresh(items: List[Item], keys: Dict[Item, CacheKey], args: Tuple[Any, ...], kwargs: Dict[str, Any],
+                      blocking: bool, configuration_snapshot: CacheConfiguration) -> Dict[Item, CacheEntry]:
+        metrics = configuration_snapshot.metrics_listener()
+        concurrent: Dict[Item, Awaitable[Union[CacheEntry, Exception]]] = {}
+        requested: List[Item] = []
+        for item in items:
+            if update_statuses.is_being_updated(keys[item]):
+                if blocking:
+                    concurrent[item] = update_statuses.await_updated(keys[item])
+                    if metrics is not None:
+                        metrics.on_event(CacheEvent.DOGPILE_WAIT, keys[item])
+            else:
+                update_statuses.mark_being_updated(keys[item])
+                requested.append(item)
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.BLOCKING_REFRESH if blocking else CacheEvent.BACKGROUND_REFRESH,
+                                     keys[item])
+
+        entries: Dict[Item, CacheEntry] = {}
+        if requested:
+            logger.debug('Requesting %s ids from wrapped method', len(requested))
+            started = time.perf_counter()
+            try:
+                values = await asyncio.wait_for(
+                    method(*args_for(args, requested), **kwargs),
+                    configuration_snapshot.method_timeout().total_seconds()
+                )
+            except asyncio.TimeoutError as e:
+                logger.debug('Timeout for %s: %s', requested, e)
+                for item in requested:
+                    if metrics is not None:
+                        metrics.on_event(CacheEvent.FAILURE, keys[item])
+                    update_statuses.mark_update_aborted(keys[item], e)
+                raise CachedMethodFailedException('Refresh timed out') from e
+            except (Exception, CancelledError) as e:
+                logger.debug('Error while refreshing cache for %s: %s', requested, e)
+                for item in requested:
+                    if metrics is not None:
+                        metrics.on_event(CacheEvent.FAILURE, keys[item])
+                    update_statuses.mark_update_aborted(keys[item], e)
+                raise CachedMethodFailedException('Refresh failed to complete') from e
+            finally:
+                # observed whether method returned, failed or timed out
+                computation_time = time.perf_counter() - started
+                if metrics is not None:
+                    metrics.on_latency(Latency.METHOD, computation_time)
+
+            try:
+                for position, item in enumerate(requested):
+                    try:
+                        if item in values:
+                            entries[item] = await store(keys[item], values[item], computation_time,
+                                                        configuration_snapshot)
+                        else:
+                            update_statuses.mark_update_aborted(keys[item], _ItemNotReturned(item))
+                    except (Exception, CancelledError) as e:
+                        logger.debug('Error while storing refreshed entries for %s: %s', requested, e)
+                        for not_stored in requested[position:]:
+                            if update_statuses.is_being_updated(keys[not_stored]):
+                                update_statuses.mark_update_aborted(keys[not_stored], e)
+                        raise CachedMethodFailedException('Refresh failed to complete') from e
+            finally:
+                release_over_capacity(configuration_snapshot)
+
+        for item, update in concurrent.items():
+            logger.debug('As entry expired, waiting for results of concurrent refresh %s', keys[item])
+            entry = await update
+            if isinstance(entry, _ItemNotReturned):
+                continue
+            if isinstance(entry, Exception):
+                raise CachedMethodFailedException('Concurrent refresh failed to complete') from entry
+            if entry is None:
+                raise CachedMethodFailedException('Concurrent refresh timed out')
+            entries[item] = entry
+
+        return entries
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        if configuration is None:
+            raise NotConfiguredCacheCalledException()
+
+        configuration_snapshot = resolve_configuration(configuration)
+        if not configuration_snapshot.configured():
+            raise NotConfiguredCacheCalledException()
+        if released_keys:
+            await release_collected()
+
+        force_refresh = kwargs.pop('force_refresh_memoized', False)
+        key_extractor = configuration_snapshot.key_extractor()
+        items: List[Item] = list(dict.fromkeys(args[ids_position]))
+        keys = {item: key_extractor.format_key(method, args_for(args, item), kwargs) for item in items}
+
+        metrics = configuration_snapshot.metrics_listener()
+        get_started = time.perf_counter()
+        current_entries = await configuration_snapshot.storage().get_many([keys[item] for item in items])
+        if metrics is not None:
+            metrics.on_latency(Latency.STORAGE_GET, time.perf_counter() - get_started)
+
+        now = time.time()
+        early_refresh_beta = configuration_snapshot.early_refresh_beta()
+        eviction_strategy = configuration_snapshot.eviction_strategy()
+        results: Dict[Item, CacheEntry] = {}
+        to_create: List[Item] = []
+        to_update: List[Item] = []
+        for item, current_entry in zip(items, current_entries):
+            if current_entry is None:
+                to_create.append(item)
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.MISS, keys[item])
+                continue
+            eviction_strategy.mark_read(keys[item])
+            if force_refresh or current_entry.expires_after_timestamp <= now:
+                to_create.append(item)
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.MISS, keys[item])
+            else:
+                results[item] = current_entry
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.HIT, keys[item])
+                if current_entry.update_after_timestamp <= now or (
+                        early_refresh_beta > 0 and early_refresh_due(current_entry, now, early_refresh_beta)):
+                    to_update.append(item)
+
+        if to_update:
+            logger.debug('Entry update point expired - entries update (async - current entries returned) '
+                         'for %s ids', len(to_update))
+            asyncio.get_event_loop().call_soon(
+                asyncio.ensure_future,
+                refresh(to_update, keys, args, kwargs, False, configuration_snapshot)
+            )
+        if to_create:
+            logger.debug('Creating (blocking) entries for %s ids', len(to_create))
+            results.update(await refresh(to_create, keys, args, kwargs, True, configuration_snapshot))
+
+        postprocessing = configuration_snapshot.postprocessing()
+        return {item: postprocessing.apply(results[item].value) for item in items if item in results}
+
+    return wrapper
@@ -0,0 +1,100 @@
+"""
+[API] Provides request coalescing - loading values missing in cache in batches (DataLoader-style).
+"""
+
+import asyncio
+import datetime
+import logging
+from asyncio import CancelledError
+from typing import Callable, Awaitable, Sequence, Any, Tuple, Dict, List, Optional
+
+from memoize.entry import CacheKey
+
+CallArguments = Tuple[Tuple[Any, ...], Dict[str, Any]]
+
+
+class RequestCoalescing:
+    """Collects refreshes of distinct keys requested within a time window
+    and loads all of them with a single call of the provided batch loader.
+
+    Batch loader receives arguments (as (args, kwargs) tuples) the memoized function would be called with
+    and has to return values in the same order, for instance:
+
+        async def load_users(calls):
+            users = await backend.get_users([args[0] for args, kwargs in calls])
+            return [users[args[0]] for args, kwargs in calls]
+
+        @memoize(configuration=..., coalescing=RequestCoalescing(load_users))
+        async def get_user(user_id):
+            return await backend.get_user(user_id)
+
+    Note: Memoized function itself is not called when coalescing is used.
+    Note: Each memoized function should have its own instance.
+    """
+
+    def __init__(self, batch_loader: Callable[[List[CallArguments]], Awaitable[Sequence[Any]]],
+                 window: Optional[datetime.timedelta] = None, max_batch_size: Optional[int] = None) -> None:
+        """
+        :param batch_loader:                            coroutine function loading values for list of calls
+        :param datetime.timedelta window:               how long calls are collected before batch is loaded;
+                                                        default = None (calls made within single IO-loop iteration)
+        :param int max_batch_size:                      batch is loaded immediately once it reaches this size;
+                                                        default = None (unlimited)
+        """
+        self.logger = logging.getLogger(__name__)
+        self._batch_loader = batch_loader
+        self._window = window
+        self._max_batch_size = max_batch_size
+        self._pending: Dict[CacheKey, Tuple[CallArguments, asyncio.Future]] = {}
+        self._timeout: Optional[float] = None
+        self._scheduled_flush: Optional[asyncio.Handle] = None
+
+    def load(self, key: CacheKey, call_args: Tuple[Any, ...], call_kwargs: Dict[str, Any],
+             timeout: float) -> asyncio.Future:
+        """Requests value for given key to be loaded with the next batch.
+        Returns future which completes with the value (or an exception if batch failed/timed-out)."""
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending[1]
+
+        future: asyncio.Future = asyncio.get_event_loop().create_future()
+        self._pending[key] = ((call_args, call_kwargs), future)
+        self._timeout = timeout if self._timeout is None else min(self._timeout, timeout)
+
+        if self._max_batch_size is not None and len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._scheduled_flush is None:
+            loop = asyncio.get_event_loop()
+            if self._window is None:
+                self._scheduled_flush = loop.call_soon(self._flush)
+            else:
+                self._scheduled_flush = loop.call_later(self._window.total_seconds(), self._flush)
+        return future
+
+    def _flush(self) -> None:
+        if self._scheduled_flush is not None:
+            self._scheduled_flush.cancel()
+            self._scheduled_flush = None
+        batch = list(self._pending.values())
+        timeout = self._timeout
+        self._pending = {}
+        self._timeout = None
+        if batch:
+            asyncio.ensure_future(self._load(batch, timeout))
+
+    async def _load(self, batch: List[Tuple[CallArguments, asyncio.Future]], timeout: Optional[float]) -> None:
+        self.logger.debug('Loading batch of %s coalesced calls', len(batch))
+        try:
+            values = await asyncio.wait_for(self._batch_loader([call for call, _ in batch]), timeout)
+            if len(values) != len(batch):
+                raise ValueError('Batch loader returned {} values for {} calls'.format(len(values), len(batch)))
+        except (Exception, CancelledError) as e:
+            self.logger.debug('Error while loading batch of coalesced calls: %s', e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), value in zip(batch, values):
+            if not future.done():
+                future.set_result(value)
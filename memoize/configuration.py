@@ -6,10 +6,15 @@ of full cache configuration.
 from abc import ABCMeta, abstractmethod
 from datetime import timedelta
 
+from typing import Any, Optional
+
+from memoize.backoff import FailureBackoff, NoFailureBackoff
 from memoize.entrybuilder import CacheEntryBuilder, ProvidedLifeSpanCacheEntryBuilder
 from memoize.eviction import EvictionStrategy, LeastRecentlyUpdatedEvictionStrategy
 from memoize.key import KeyExtractor, EncodedMethodReferenceAndArgsKeyExtractor
+from memoize.metrics import MetricsListener
 from memoize.postprocessing import Postprocessing, NoPostprocessing
+from memoize.profiling import Profiler
 from memoize.storage import CacheStorage
 from memoize.storage import LocalInMemoryCacheStorage
 
@@ -18,6 +23,9 @@ class NotConfiguredCacheCalledException(Exception):
     pass
 
 
+_UNRESOLVED: Any = object()  # marks components (of LazyCacheConfiguration) not resolved yet
+
+
 class CacheConfiguration(metaclass=ABCMeta):
     """ Provides configuration for cache. """
 
@@ -57,6 +65,45 @@ class CacheConfiguration(metaclass=ABCMeta):
         """ Determines which/if Postprocessing is to be used by cache. """
         raise NotImplementedError()
 
+    def early_refresh_beta(self) -> float:
+        """ Enables probabilistic early refreshes (XFetch) if positive (by default disabled).
+        Background refresh may start before entry reaches its update point - the longer computation of the value took
+        and the greater beta is, the earlier it probably starts (1.0 is a reasonable value to start with).
+        Spreads refreshes of entries that were created together. """
+        return 0.0
+
+    def failure_backoff(self) -> FailureBackoff:
+        """ Determines for how long failures of cached method are served from cache (negative caching).
+        By default failures are not cached. Not supported by memoize_batch. """
+        return NoFailureBackoff()
+
+    def stale_if_error(self) -> Optional[timedelta]:
+        """ Enables serving expired entries if their blocking refresh fails or times out (by default disabled).
+        Within given time after expiration, stale entry is returned instead of a failure
+        and another refresh is scheduled in background. Not supported by memoize_batch. """
+        return None
+
+    def max_blocking_wait(self) -> Optional[timedelta]:
+        """ Limits how long a call waits for refresh of an expired entry (by default not limited).
+        If refresh does not finish in given time, expired entry is returned and refresh continues in background.
+        Supported by memoize only (memoize_sync & memoize_batch wait for refreshes without a limit). """
+        return None
+
+    def metrics_listener(self) -> Optional[MetricsListener]:
+        """ Determines which/if MetricsListener receives metrics of cache operations (by default none). """
+        return None
+
+    def profiler(self) -> Optional[Profiler]:
+        """ Determines which/if Profiler times stages of cached calls (by default none).
+        Supported by memoize only (calls of memoize_sync & memoize_batch are not profiled). """
+        return None
+
+    def version(self) -> Optional[int]:
+        """ Identifies state of the configuration. Cache keeps a resolved snapshot of the configuration and
+        resolves it again only when returned version changes.
+        If None is returned (default), configuration is considered unversioned and is resolved on every call. """
+        return None
+
     def __str__(self) -> str:
         return self.__repr__()
 
@@ -68,7 +115,13 @@ class CacheConfiguration(metaclass=ABCMeta):
                 f"key_extractor={self.key_extractor()}, "
                 f"storage={self.storage()}, "
                 f"eviction_strategy={self.eviction_strategy()}, "
-                f"postprocessing={self.postprocessing()}"
+                f"postprocessing={self.postprocessing()}, "
+                f"early_refresh_beta={self.early_refresh_beta()}, "
+                f"failure_backoff={self.failure_backoff()}, "
+                f"stale_if_error={self.stale_if_error()}, "
+                f"max_blocking_wait={self.max_blocking_wait()}, "
+                f"metrics_listener={self.metrics_listener()}, "
+                f"profiler={self.profiler()}"
                 f"]")
 
 
@@ -78,7 +131,12 @@ class MutableCacheConfiguration(CacheConfiguration):
 
     def __init__(self, configured: bool, storage: CacheStorage, key_extractor: KeyExtractor,
                  eviction_strategy: EvictionStrategy, entry_builder: CacheEntryBuilder, postprocessing: Postprocessing,
-                 method_timeout: timedelta) -> None:
+                 method_timeout: timedelta, early_refresh_beta: float = 0.0,
+                 failure_backoff: Optional[FailureBackoff] = None,
+                 stale_if_error: Optional[timedelta] = None,
+                 max_blocking_wait: Optional[timedelta] = None,
+                 metrics_listener: Optional[MetricsListener] = None,
+                 profiler: Optional[Profiler] = None) -> None:
         self.__storage = storage
         self.__configured = configured
         self.__key_extractor = key_extractor
@@ -86,6 +144,13 @@ class MutableCacheConfiguration(CacheConfiguration):
         self.__method_timeout = method_timeout
         self.__eviction_strategy = eviction_strategy
         self.__postprocessing = postprocessing
+        self.__early_refresh_beta = early_refresh_beta
+        self.__failure_backoff = failure_backoff if failure_backoff is not None else NoFailureBackoff()
+        self.__stale_if_error = stale_if_error
+        self.__max_blocking_wait = max_blocking_wait
+        self.__metrics_listener = metrics_listener
+        self.__profiler = profiler
+        self.__version = 0
 
     @staticmethod
     def initialized_with(configuration: CacheConfiguration) -> 'MutableCacheConfiguration':
@@ -97,6 +162,12 @@ class MutableCacheConfiguration(CacheConfiguration):
             method_timeout=configuration.method_timeout(),
             eviction_strategy=configuration.eviction_strategy(),
             postprocessing=configuration.postprocessing(),
+            early_refresh_beta=configuration.early_refresh_beta(),
+            failure_backoff=configuration.failure_backoff(),
+            stale_if_error=configuration.stale_if_error(),
+            max_blocking_wait=configuration.max_blocking_wait(),
+            metrics_listener=configuration.metrics_listener(),
+            profiler=configuration.profiler(),
         )
 
     def method_timeout(self) -> timedelta:
@@ -120,32 +191,107 @@ class MutableCacheConfiguration(CacheConfiguration):
     def postprocessing(self) -> Postprocessing:
         return self.__postprocessing
 
+    def early_refresh_beta(self) -> float:
+        return self.__early_refresh_beta
+
+    def failure_backoff(self) -> FailureBackoff:
+        return self.__failure_backoff
+
+    def stale_if_error(self) -> Optional[timedelta]:
+        return self.__stale_if_error
+
+    def max_blocking_wait(self) -> Optional[timedelta]:
+        return self.__max_blocking_wait
+
+    def metrics_listener(self) -> Optional[MetricsListener]:
+        return self.__metrics_listener
+
+    def profiler(self) -> Optional[Profiler]:
+        return self.__profiler
+
+    def version(self) -> Optional[int]:
+        """ Incremented by setters whenever they actually change the configuration.
+        Subclasses are unversioned (they may override getters to return values changing at runtime). """
+        if type(self) is not MutableCacheConfiguration:
+            return None
+        return self.__version
+
     def set_method_timeout(self, value: timedelta) -> 'MutableCacheConfiguration':
-        self.__method_timeout = value
+        if self.__method_timeout != value:
+            self.__method_timeout = value
+            self.__version += 1
         return self
 
     def set_key_extractor(self, value: KeyExtractor) -> 'MutableCacheConfiguration':
-        self.__key_extractor = value
+        if self.__key_extractor != value:
+            self.__key_extractor = value
+            self.__version += 1
         return self
 
     def set_configured(self, value: bool) -> 'MutableCacheConfiguration':
-        self.__configured = value
+        if self.__configured != value:
+            self.__configured = value
+            self.__version += 1
         return self
 
     def set_storage(self, value: CacheStorage) -> 'MutableCacheConfiguration':
-        self.__storage = value
+        if self.__storage != value:
+            self.__storage = value
+            self.__version += 1
         return self
 
     def set_entry_builder(self, value: CacheEntryBuilder) -> 'MutableCacheConfiguration':
-        self.__entry_builder = value
+        if self.__entry_builder != value:
+            self.__entry_builder = value
+            self.__version += 1
         return self
 
     def set_eviction_strategy(self, value: EvictionStrategy) -> 'MutableCacheConfiguration':
-        self.__eviction_strategy = value
+        if self.__eviction_strategy != value:
+            self.__eviction_strategy = value
+            self.__version += 1
         return self
 
     def set_postprocessing(self, value: Postprocessing) -> 'MutableCacheConfiguration':
-        self.__postprocessing = value
+        if self.__postprocessing != value:
+            self.__postprocessing = value
+            self.__version += 1
+        return self
+
+    def set_early_refresh_beta(self, value: float) -> 'MutableCacheConfiguration':
+        if self.__early_refresh_beta != value:
+            self.__early_refresh_beta = value
+            self.__version += 1
+        return self
+
+    def set_failure_backoff(self, value: FailureBackoff) -> 'MutableCacheConfiguration':
+        if self.__failure_backoff != value:
+            self.__failure_backoff = value
+            self.__version += 1
+        return self
+
+    def set_stale_if_error(self, value: Optional[timedelta]) -> 'MutableCacheConfiguration':
+        if self.__stale_if_error != value:
+            self.__stale_if_error = value
+            self.__version += 1
+        return self
+
+    def set_max_blocking_wait(self, value: Optional[timedelta]) -> 'MutableCacheConfiguration':
+        if self.__max_blocking_wait != value:
+            self.__max_blocking_wait = value
+            self.__version += 1
+        return self
+
+    def set_metrics_listener(self, value: Optional[MetricsListener]) -> 'MutableCacheConfiguration':
+        if self.__metrics_listener != value:
+            self.__metrics_listener = value
+            self.__version += 1
+        return self
+
+    def set_profiler(self, value: Optional[Profiler]) -> 'MutableCacheConfiguration':
+        if self.__profiler != value:
+            self.__profiler = value
+            self.__version += 1
         return self
 
 
@@ -183,3 +329,200 @@ class DefaultInMemoryCacheConfiguration(CacheConfiguration):
 
     def postprocessing(self) -> Postprocessing:
         return self.__postprocessing
+
+    def version(self) -> Optional[int]:
+        # subclasses are unversioned (they may override getters to return values changing at runtime)
+        if type(self) is not DefaultInMemoryCacheConfiguration:
+            return None
+        return 0
+
+
+class FrozenCacheConfiguration(CacheConfiguration):
+    """ Immutable snapshot of a configuration (components are resolved once, on creation).
+    Used internally by the cache to avoid resolving configuration on every call,
+    but may be also used directly when configuration is not meant to change at runtime."""
+
+    def __init__(self, configured: bool, storage: CacheStorage, key_extractor: KeyExtractor,
+                 eviction_strategy: EvictionStrategy, entry_builder: CacheEntryBuilder, postprocessing: Postprocessing,
+                 method_timeout: timedelta, early_refresh_beta: float = 0.0,
+                 failure_backoff: Optional[FailureBackoff] = None,
+                 stale_if_error: Optional[timedelta] = None,
+                 max_blocking_wait: Optional[timedelta] = None,
+                 metrics_listener: Optional[MetricsListener] = None,
+                 profiler: Optional[Profiler] = None, version: Optional[int] = 0) -> None:
+        self.__storage = storage
+        self.__configured = configured
+        self.__key_extractor = key_extractor
+        self.__entry_builder = entry_builder
+        self.__method_timeout = method_timeout
+        self.__eviction_strategy = eviction_strategy
+        self.__postprocessing = postprocessing
+        self.__early_refresh_beta = early_refresh_beta
+        self.__failure_backoff = failure_backoff if failure_backoff is not None else NoFailureBackoff()
+        self.__stale_if_error = stale_if_error
+        self.__max_blocking_wait = max_blocking_wait
+        self.__metrics_listener = metrics_listener
+        self.__profiler = profiler
+        self.__version = version
+
+    @staticmethod
+    def initialized_with(configuration: CacheConfiguration) -> 'FrozenCacheConfiguration':
+        if isinstance(configuration, FrozenCacheConfiguration):
+            return configuration
+        return FrozenCacheConfiguration(
+            version=configuration.version(),
+            storage=configuration.storage(),
+            configured=configuration.configured(),
+            key_extractor=configuration.key_extractor(),
+            entry_builder=configuration.entry_builder(),
+            method_timeout=configuration.method_timeout(),
+            eviction_strategy=configuration.eviction_strategy(),
+            postprocessing=configuration.postprocessing(),
+            early_refresh_beta=configuration.early_refresh_beta(),
+            failure_backoff=configuration.failure_backoff(),
+            stale_if_error=configuration.stale_if_error(),
+            max_blocking_wait=configuration.max_blocking_wait(),
+            metrics_listener=configuration.metrics_listener(),
+            profiler=configuration.profiler(),
+        )
+
+    def is_up_to_date_with(self, configuration: CacheConfiguration) -> bool:
+        """ Checks if snapshot still reflects given (versioned) configuration. """
+        if configuration is self:
+            return True
+        version = configuration.version()
+        return version is not None and version == self.__version
+
+    def method_timeout(self) -> timedelta:
+        return self.__method_timeout
+
+    def key_extractor(self) -> KeyExtractor:
+        return self.__key_extractor
+
+    def configured(self) -> bool:
+        return self.__configured
+
+    def storage(self) -> CacheStorage:
+        return self.__storage
+
+    def entry_builder(self) -> CacheEntryBuilder:
+        return self.__entry_builder
+
+    def eviction_strategy(self) -> EvictionStrategy:
+        return self.__eviction_strategy
+
+    def postprocessing(self) -> Postprocessing:
+        return self.__postprocessing
+
+    def early_refresh_beta(self) -> float:
+        return self.__early_refresh_beta
+
+    def failure_backoff(self) -> FailureBackoff:
+        return self.__failure_backoff
+
+    def stale_if_error(self) -> Optional[timedelta]:
+        return self.__stale_if_error
+
+    def max_blocking_wait(self) -> Optional[timedelta]:
+        return self.__max_blocking_wait
+
+    def metrics_listener(self) -> Optional[MetricsListener]:
+        return self.__metrics_listener
+
+    def profiler(self) -> Optional[Profiler]:
+        return self.__profiler
+
+    def version(self) -> Optional[int]:
+        return self.__version
+
+
+class LazyCacheConfiguration(CacheConfiguration):
+    """ Snapshot of an unversioned configuration (see `version`). Each component is resolved on first use and kept
+    afterwards, so a call reads only the components it needs (unversioned configurations are resolved on every call).
+    Used internally by the cache."""
+
+    __configured = _UNRESOLVED
+    __method_timeout = _UNRESOLVED
+    __entry_builder = _UNRESOLVED
+    __key_extractor = _UNRESOLVED
+    __storage = _UNRESOLVED
+    __eviction_strategy = _UNRESOLVED
+    __postprocessing = _UNRESOLVED
+    __early_refresh_beta = _UNRESOLVED
+    __failure_backoff = _UNRESOLVED
+    __stale_if_error = _UNRESOLVED
+    __max_blocking_wait = _UNRESOLVED
+    __metrics_listener = _UNRESOLVED
+    __profiler = _UNRESOLVED
+
+    def __init__(self, configuration: CacheConfiguration) -> None:
+        self.__configuration = configuration
+
+    def is_up_to_date_with(self, configuration: CacheConfiguration) -> bool:
+        """ Snapshot of an unversioned configuration is never reused. """
+        return False
+
+    def configured(self) -> bool:
+        if self.__configured is _UNRESOLVED:
+            self.__configured = self.__configuration.configured()
+        return self.__configured
+
+    def method_timeout(self) -> timedelta:
+        if self.__method_timeout is _UNRESOLVED:
+            self.__method_timeout = self.__configuration.method_timeout()
+        return self.__method_timeout
+
+    def entry_builder(self) -> CacheEntryBuilder:
+        if self.__entry_builder is _UNRESOLVED:
+            self.__entry_builder = self.__configuration.entry_builder()
+        return self.__entry_builder
+
+    def key_extractor(self) -> KeyExtractor:
+        if self.__key_extractor is _UNRESOLVED:
+            self.__key_extractor = self.__configuration.key_extractor()
+        return self.__key_extractor
+
+    def storage(self) -> CacheStorage:
+        if self.__storage is _UNRESOLVED:
+            self.__storage = self.__configuration.storage()
+        return self.__storage
+
+    def eviction_strategy(self) -> EvictionStrategy:
+        if self.__eviction_strategy is _UNRESOLVED:
+            self.__eviction_strategy = self.__configuration.eviction_strategy()
+        return self.__eviction_strategy
+
+    def postprocessing(self) -> Postprocessing:
+        if self.__postprocessing is _UNRESOLVED:
+            self.__postprocessing = self.__configuration.postprocessing()
+        return self.__postprocessing
+
+    def early_refresh_beta(self) -> float:
+        if self.__early_refresh_beta is _UNRESOLVED:
+            self.__early_refresh_beta = self.__configuration.early_refresh_beta()
+        return self.__early_refresh_beta
+
+    def failure_backoff(self) -> FailureBackoff:
+        if self.__failure_backoff is _UNRESOLVED:
+            self.__failure_backoff = self.__configuration.failure_backoff()
+        return self.__failure_backoff
+
+    def stale_if_error(self) -> Optional[timedelta]:
+        if self.__stale_if_error is _UNRESOLVED:
+            self.__stale_if_error = self.__configuration.stale_if_error()
+        return self.__stale_if_error
+
+    def max_blocking_wait(self) -> Optional[timedelta]:
+        if self.__max_blocking_wait is _UNRESOLVED:
+            self.__max_blocking_wait = self.__configuration.max_blocking_wait()
+        return self.__max_blocking_wait
+
+    def metrics_listener(self) -> Optional[MetricsListener]:
+        if self.__metrics_listener is _UNRESOLVED:
+            self.__metrics_listener = self.__configuration.metrics_listener()
+        return self.__metrics_listener
+
+    def profiler(self) -> Optional[Profiler]:
+        if self.__profiler is _UNRESOLVED:
+            self.__profiler = self.__configuration.profiler()
+        return self.__profiler
@@ -2,24 +2,107 @@
 [Internal use only] Contains implementation of cache entry.
 """
 
+import collections.abc
 import datetime
+import math
+import random
 
-from typing import Any
+from typing import Any, Optional, Union, Tuple, Dict, Hashable, TYPE_CHECKING
 
-CacheKey = str
+if TYPE_CHECKING:
+    CacheKey = Hashable
+else:
+    class CacheKey(collections.abc.Hashable):
+        """Any hashable value may be a key (keys used to be strings only).
+        Calling CacheKey(value) returns the value unchanged (kept for backward compatibility)."""
+
+        def __new__(cls, value):
+            return value
 CachedValue = Any
+Timestamp = Union[datetime.datetime, float]
+
+
+def _to_epoch(timestamp: Timestamp) -> float:
+    return timestamp.timestamp() if isinstance(timestamp, datetime.datetime) else float(timestamp)
+
+
+def _to_datetime(epoch: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc)
 
 
 class CacheEntry:
-    """Implementation of cache entry used internally"""
+    """Implementation of cache entry used internally.
 
-    def __init__(self, created: datetime.datetime, update_after: datetime.datetime, expires_after: datetime.datetime,
-                 value: CachedValue) -> None:
+    Times are kept as (float) seconds since the epoch (see `*_timestamp` attributes), so they are cheap to store
+    and compare. Datetime views (`created`, `update_after`, `expires_after`) are provided for convenience.
+    """
+
+    __slots__ = ('value', 'created_timestamp', 'update_after_timestamp', 'expires_after_timestamp',
+                 'computation_time', '_hash')
+
+    def __init__(self, created: Timestamp, update_after: Timestamp, expires_after: Timestamp,
+                 value: CachedValue, computation_time: Optional[float] = None) -> None:
+        """
+        :param created:                                 creation time (datetime or seconds since the epoch)
+        :param update_after:                            time background update should start after
+        :param expires_after:                           time entry is out-of-date after
+        :param value:                                   cached value
+        :param float computation_time:                  seconds it took to compute the value (if known)
+        """
         self.value = value
-        self.created = created
-        self.update_after = update_after
-        self.expires_after = expires_after
-        self.__hashable = (self.value, self.created, self.update_after, self.expires_after)
+        self.created_timestamp = _to_epoch(created)
+        self.update_after_timestamp = _to_epoch(update_after)
+        self.expires_after_timestamp = _to_epoch(expires_after)
+        self.computation_time = computation_time
+        self._hash: Optional[int] = None
+
+    @property
+    def created(self) -> datetime.datetime:
+        return _to_datetime(self.created_timestamp)
+
+    @created.setter
+    def created(self, value: Timestamp) -> None:
+        self.created_timestamp = _to_epoch(value)
+        self._hash = None
+
+    @property
+    def update_after(self) -> datetime.datetime:
+        return _to_datetime(self.update_after_timestamp)
+
+    @update_after.setter
+    def update_after(self, value: Timestamp) -> None:
+        self.update_after_timestamp = _to_epoch(value)
+        self._hash = None
+
+    @property
+    def expires_after(self) -> datetime.datetime:
+        return _to_datetime(self.expires_after_timestamp)
+
+    @expires_after.setter
+    def expires_after(self, value: Timestamp) -> None:
+        self.expires_after_timestamp = _to_epoch(value)
+        self._hash = None
+
+    def __hashable(self) -> Tuple[Any, float, float, float]:
+        return self.value, self.created_timestamp, self.update_after_timestamp, self.expires_after_timestamp
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {
+            'value': self.value,
+            'created': self.created_timestamp,
+            'update_after': self.update_after_timestamp,
+            'expires_after': self.expires_after_timestamp,
+            'computation_time': self.computation_time,
+        }
+
+    def __setstate__(self, state: Any) -> None:
+        # besides own state, accepts state of entries pickled before __slots__ were introduced
+        # (a dict of attributes, with datetimes instead of timestamps)
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        self.__init__(created=state['created'], update_after=state['update_after'],  # type: ignore
+                      expires_after=state['expires_after'], value=state['value'],
+                      computation_time=state.get('computation_time'))
 
     def __repr__(self) -> str:
         return "CacheEntry[value={value},created={created},update_after={update_after},expires_after={expires_after}]" \
@@ -30,7 +113,19 @@ class CacheEntry:
         return self.__repr__()
 
     def __eq__(self, o) -> bool:
-        return self.__hashable.__eq__(o.__hashable) if isinstance(o, CacheEntry) else False
+        return self.__hashable().__eq__(o.__hashable()) if isinstance(o, CacheEntry) else False
 
     def __hash__(self) -> int:
-        return hash(self.__hashable)
+        if self._hash is None:
+            self._hash = hash(self.__hashable())
+        return self._hash
+
+
+def early_refresh_due(entry: CacheEntry, now: float, beta: float) -> bool:
+    """Probabilistic early refresh (XFetch): the closer update point is and the longer computation of the value took,
+    the more probable the refresh is. Greater beta favours earlier refreshes.
+    Time is expressed in seconds since the epoch."""
+    if entry.computation_time is None:
+        return False
+    gap = -entry.computation_time * beta * math.log(1.0 - random.random())
+    return now + gap >= entry.update_after_timestamp
@@ -5,6 +5,8 @@ This interface is used in cache configuration.
 """
 
 import datetime
+import random
+import time
 from abc import ABCMeta, abstractmethod
 
 from memoize.entry import CacheKey, CachedValue, CacheEntry
@@ -20,25 +22,42 @@ class CacheEntryBuilder(metaclass=ABCMeta):
 class ProvidedLifeSpanCacheEntryBuilder(CacheEntryBuilder):
     """CacheEntryBuilder which uses constant delays independent form values that are cached"""
     def __init__(self, update_after: datetime.timedelta = datetime.timedelta(minutes=10),
-                 expire_after: datetime.timedelta = datetime.timedelta(minutes=30)) -> None:
+                 expire_after: datetime.timedelta = datetime.timedelta(minutes=30), jitter: float = 0.0) -> None:
         """
         Builder that sets update/expire times using provided constants.
         :param datetime.timedelta update_after:         when background/async updates should start; default = 10 minutes
         :param datetime.timedelta expire_after:         when entry starts being out-of-date; default = 30 minutes
+        :param float jitter:                            fraction by which both delays are randomly shortened
+                                                        (so entries created together are not refreshed together);
+                                                        default = 0 (no jitter)
         """
+        if not 0.0 <= jitter < 1.0:
+            raise ValueError('Jitter has to be in range [0, 1)')
         self._expires_after = expire_after
         self._update_after = update_after
+        self._expires_after_seconds = expire_after.total_seconds()
+        self._update_after_seconds = update_after.total_seconds()
+        self._jitter = jitter
 
     def update_timeouts(self, update_after: datetime.timedelta, expire_after: datetime.timedelta) -> None:
         self._expires_after = expire_after
         self._update_after = update_after
+        self._expires_after_seconds = expire_after.total_seconds()
+        self._update_after_seconds = update_after.total_seconds()
 
     def build(self, key: CacheKey, value: CachedValue) -> CacheEntry:
-        now = datetime.datetime.now(datetime.timezone.utc)
+        now = time.time()
+        if self._jitter:
+            factor = 1.0 - random.uniform(0.0, self._jitter)
+            return CacheEntry(created=now,
+                              update_after=now + self._update_after_seconds * factor,
+                              expires_after=now + self._expires_after_seconds * factor,
+                              value=value)
         return CacheEntry(created=now,
-                          update_after=now + self._update_after,
-                          expires_after=now + self._expires_after,
+                          update_after=now + self._update_after_seconds,
+                          expires_after=now + self._expires_after_seconds,
                           value=value)
 
     def __str__(self) -> str:
-        return "{}[update_after={},expire_after={}]".format(self.__class__, self._update_after, self._expires_after)
+        return "{}[update_after={},expire_after={},jitter={}]".format(self.__class__, self._update_after,
+                                                                      self._expires_after, self._jitter)
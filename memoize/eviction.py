@@ -5,11 +5,14 @@ This interface is used in cache configuration.
 """
 
 import collections
+import heapq
+import itertools
 from abc import ABCMeta, abstractmethod
 
-from typing import Optional
+from typing import Optional, Tuple, Deque, Dict, List, Any
 
 from memoize.entry import CacheKey, CacheEntry
+from memoize.sizing import Sizer, EstimatingSizer
 
 
 class EvictionStrategy(metaclass=ABCMeta):
@@ -33,6 +36,26 @@ class EvictionStrategy(metaclass=ABCMeta):
         """Returns element that should be released by the current client according to this strategy (or None)."""
         raise NotImplementedError()
 
+    def next_batch_to_release(self) -> List[CacheKey]:
+        """Returns all elements that should be released (in order of release) to get back within capacity.
+        Default implementation calls 'next_to_release' until it returns None (or an element returned already)."""
+        key = self.next_to_release()
+        if key is None:
+            return []
+        batch = [key]
+        returned = {key}
+        key = self.next_to_release()
+        while key is not None and key not in returned:
+            batch.append(key)
+            returned.add(key)
+            key = self.next_to_release()
+        return batch
+
+    def admits(self, key: CacheKey, entry: CacheEntry) -> bool:
+        """Called before entry is offered to storage. Entries not admitted are returned to callers but not cached
+        (and previous entries of their keys are released). By default all entries are admitted."""
+        return True
+
 
 class LeastRecentlyUpdatedEvictionStrategy(EvictionStrategy):
     def __init__(self, capacity=4096):
@@ -63,6 +86,483 @@ class LeastRecentlyUpdatedEvictionStrategy(EvictionStrategy):
         return "{name}[capacity={capacity}]".format(name=self.__class__, capacity=self._capacity)
 
 
+class LeastRecentlyUsedEvictionStrategy(EvictionStrategy):
+    """Releases entries that were neither read nor updated for the longest time (once capacity is exceeded).
+    Both reads & updates move entry to the end of an ordered dict, so they take constant time."""
+
+    def __init__(self, capacity=4096):
+        self._capacity = capacity
+        self._data = collections.OrderedDict()
+
+    def mark_read(self, key: CacheKey) -> None:
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            pass
+
+    def mark_released(self, key: CacheKey) -> None:
+        self._data.pop(key, None)
+
+    def mark_written(self, key: CacheKey, entry: CacheEntry) -> None:
+        self._data[key] = None
+        self._data.move_to_end(key)
+
+    def next_to_release(self) -> Optional[CacheKey]:
+        entries = len(self._data)
+        if entries > 0 and entries > self._capacity:
+            key, _ = self._data.popitem(last=False)
+            return key
+        return None
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[capacity={capacity}]".format(name=self.__class__, capacity=self._capacity)
+
+
+class ClockEvictionStrategy(EvictionStrategy):
+    """CLOCK (second chance) - approximation of LRU that is cheap in both memory & CPU.
+    Keys are kept in array slots (with a key -> slot index) and reads only set visited flag of a slot
+    (flags are kept in a bytearray). Once capacity is exceeded, a hand sweeps over slots clearing visited flags
+    and releases the first entry not visited since the previous sweep."""
+
+    _FREE = object()  # marks free slots (keys may be of any hashable type)
+
+    def __init__(self, capacity: int = 4096) -> None:
+        """
+        :param int capacity:                            max number of entries; default = 4096
+        """
+        self._capacity = capacity
+        self._slots: Dict[CacheKey, int] = {}
+        self._keys: List[Any] = []
+        self._visited = bytearray()
+        self._free: List[int] = []
+        self._hand = 0
+
+    def mark_read(self, key: CacheKey) -> None:
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._visited[slot] = 1
+
+    def mark_written(self, key: CacheKey, entry: CacheEntry) -> None:
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._visited[slot] = 1
+            return
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+            self._visited[slot] = 0
+        else:
+            slot = len(self._keys)
+            self._keys.append(key)
+            self._visited.append(0)
+        self._slots[key] = slot
+
+    def mark_released(self, key: CacheKey) -> None:
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self._keys[slot] = self._FREE
+            self._visited[slot] = 0
+            self._free.append(slot)
+
+    def next_to_release(self) -> Optional[CacheKey]:
+        if len(self._slots) <= self._capacity:
+            return None
+        keys = self._keys
+        visited = self._visited
+        slots_count = len(keys)
+        hand = self._hand
+        while True:
+            if hand >= slots_count:
+                hand = 0
+            key = keys[hand]
+            if key is self._FREE:
+                hand += 1
+            elif visited[hand]:
+                visited[hand] = 0
+                hand += 1
+            else:
+                self._hand = hand + 1
+                self.mark_released(key)
+                return key
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[capacity={capacity}]".format(name=self.__class__, capacity=self._capacity)
+
+
+class AdaptiveReplacementEvictionStrategy(EvictionStrategy):
+    """ARC (Adaptive Replacement Cache) - balances recency & frequency adapting to the workload.
+    Entries used once are kept in a recency list (T1), entries used again in a frequency list (T2).
+    Keys released from these lists are remembered in ghost lists (B1 & B2) - writes of keys remembered
+    by a ghost list shift target size of T1 towards the list that would have kept them."""
+
+    def __init__(self, capacity: int = 4096) -> None:
+        """
+        :param int capacity:                            max number of entries; default = 4096
+        """
+        self._capacity = capacity
+        self._target = 0.0  # target size of T1 (p)
+        self._recent: collections.OrderedDict = collections.OrderedDict()  # T1
+        self._frequent: collections.OrderedDict = collections.OrderedDict()  # T2
+        self._recent_ghosts: collections.OrderedDict = collections.OrderedDict()  # B1
+        self._frequent_ghosts: collections.OrderedDict = collections.OrderedDict()  # B2
+        self._frequent_ghost_hit = False  # whether the last write hit B2 (affects the choice of list to release from)
+
+    @property
+    def target(self) -> float:
+        """Current target size of the recency list (adapted to the workload)."""
+        return self._target
+
+    def mark_read(self, key: CacheKey) -> None:
+        if key in self._recent:
+            del self._recent[key]
+            self._frequent[key] = None
+        elif key in self._frequent:
+            self._frequent.move_to_end(key)
+
+    def mark_written(self, key: CacheKey, entry: CacheEntry) -> None:
+        self._frequent_ghost_hit = False
+        if key in self._recent or key in self._frequent:
+            self.mark_read(key)
+        elif key in self._recent_ghosts:
+            ratio = len(self._frequent_ghosts) / len(self._recent_ghosts)
+            self._target = min(float(self._capacity), self._target + max(ratio, 1.0))
+            del self._recent_ghosts[key]
+            self._frequent[key] = None
+        elif key in self._frequent_ghosts:
+            ratio = len(self._recent_ghosts) / len(self._frequent_ghosts)
+            self._target = max(0.0, self._target - max(ratio, 1.0))
+            del self._frequent_ghosts[key]
+            self._frequent[key] = None
+            self._frequent_ghost_hit = True
+        else:
+            self._recent[key] = None
+
+    def mark_released(self, key: CacheKey) -> None:
+        # ghosts are kept, as strategy is informed also about releases of keys it returned
+        self._recent.pop(key, None)
+        self._frequent.pop(key, None)
+
+    def next_to_release(self) -> Optional[CacheKey]:
+        if len(self._recent) + len(self._frequent) <= self._capacity:
+            return None
+        recent_count = len(self._recent)
+        if recent_count > 0 and (recent_count > self._target
+                                 or (self._frequent_ghost_hit and recent_count >= self._target)
+                                 or not self._frequent):
+            key, _ = self._recent.popitem(last=False)
+            self._recent_ghosts[key] = None
+        else:
+            key, _ = self._frequent.popitem(last=False)
+            self._frequent_ghosts[key] = None
+        self._frequent_ghost_hit = False
+        while self._recent_ghosts and len(self._recent) + len(self._recent_ghosts) > self._capacity:
+            self._recent_ghosts.popitem(last=False)
+        while self._frequent_ghosts and len(self._recent) + len(self._frequent) + len(self._recent_ghosts) \
+                + len(self._frequent_ghosts) > 2 * self._capacity:
+            self._frequent_ghosts.popitem(last=False)
+        return key
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[capacity={capacity}]".format(name=self.__class__, capacity=self._capacity)
+
+
+class GreedyDualSizeFrequencyEvictionStrategy(EvictionStrategy):
+    """GDSF - cost-aware strategy keeping entries that are expensive to recompute, small & frequently used.
+    Each entry has priority: clock + frequency * cost / size, where cost is time it took to compute its value
+    (see CacheEntry.computation_time) and size is determined by an (optional) Sizer. Entry of the lowest priority
+    is released and its priority becomes the clock, so priorities of entries not used for long age.
+
+    Priorities are kept in a heap with lazy removal of outdated items (compacted once they prevail)."""
+
+    _MIN_COST = 1e-6  # used for entries of unknown (or zero) computation time, so their frequency still matters
+
+    def __init__(self, capacity: int = 4096, sizer: Optional[Sizer] = None) -> None:
+        """
+        :param int capacity:                            max number of entries; default = 4096
+        :param Sizer sizer:                             determines sizes of entries;
+                                                        default = None (sizes are not taken into account)
+        """
+        self._capacity = capacity
+        self._sizer = sizer
+        self._clock = 0.0
+        self._entries: Dict[CacheKey, List[Any]] = {}  # key -> [priority, frequency, cost per size, sequence]
+        self._heap: List[Tuple[float, int, CacheKey]] = []  # (priority, sequence, key)
+        self._sequence = itertools.count()
+
+    def _push(self, key: CacheKey, state: List[Any]) -> None:
+        priority = state[0] = self._clock + state[1] * state[2]
+        sequence = state[3] = next(self._sequence)
+        heapq.heappush(self._heap, (priority, sequence, key))
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(state[0], state[3], key) for key, state in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def mark_read(self, key: CacheKey) -> None:
+        state = self._entries.get(key)
+        if state is not None:
+            state[1] += 1
+            self._push(key, state)
+
+    def mark_written(self, key: CacheKey, entry: CacheEntry) -> None:
+        cost = max(entry.computation_time or 0.0, self._MIN_COST)
+        size = max(self._sizer.size(key, entry), 1) if self._sizer is not None else 1
+        state = self._entries.get(key)
+        if state is None:
+            state = self._entries[key] = [0.0, 1, cost / size, 0]
+        else:
+            state[1] += 1
+            state[2] = cost / size
+        self._push(key, state)
+
+    def mark_released(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+
+    def next_to_release(self) -> Optional[CacheKey]:
+        if len(self._entries) <= self._capacity:
+            return None
+        while True:
+            priority, sequence, key = heapq.heappop(self._heap)
+            state = self._entries.get(key)
+            if state is not None and state[3] == sequence:
+                self._clock = priority
+                del self._entries[key]
+                return key
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[capacity={capacity},sizer={sizer}]".format(
+            name=self.__class__, capacity=self._capacity, sizer=self._sizer)
+
+
+class SizeWeightedEvictionStrategy(EvictionStrategy):
+    """Keeps total size of entries (determined by a Sizer) within a budget, releasing least recently used
+    (read or updated) entries once it is exceeded. Entries larger than 'max_entry_size' are not cached at all."""
+
+    def __init__(self, max_size: int = 64 * 1024 * 1024, max_entry_size: Optional[int] = None,
+                 sizer: Optional[Sizer] = None) -> None:
+        """
+        :param int max_size:                            budget (in bytes) for all entries; default = 64 MiB
+        :param int max_entry_size:                      size (in bytes) of entries too large to be cached;
+                                                        default = None (entries are limited only by budget)
+        :param Sizer sizer:                             determines sizes of entries; default = EstimatingSizer
+        """
+        self._max_size = max_size
+        self._max_entry_size = max_entry_size
+        self._sizer = sizer if sizer is not None else EstimatingSizer()
+        self._data: collections.OrderedDict = collections.OrderedDict()  # key -> size
+        self._size = 0
+        self._rejected: Deque[CacheKey] = collections.deque()
+        self._last_sized: Tuple[Optional[CacheEntry], int] = (None, 0)  # entry sized by 'admits' & its size
+
+    @property
+    def size(self) -> int:
+        """Total size (in bytes) of tracked entries."""
+        return self._size
+
+    def _size_of(self, key: CacheKey, entry: CacheEntry) -> int:
+        sized_entry, size = self._last_sized
+        if sized_entry is entry:
+            return size
+        size = self._sizer.size(key, entry)
+        self._last_sized = (entry, size)
+        return size
+
+    def admits(self, key: CacheKey, entry: CacheEntry) -> bool:
+        if self._max_entry_size is None or self._size_of(key, entry) <= self._max_entry_size:
+            return True
+        self._last_sized = (None, 0)  # rejected entry is not kept alive
+        return False
+
+    def mark_read(self, key: CacheKey) -> None:
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            pass
+
+    def mark_released(self, key: CacheKey) -> None:
+        self._size -= self._data.pop(key, 0)
+
+    def mark_written(self, key: CacheKey, entry: CacheEntry) -> None:
+        size = self._size_of(key, entry)
+        self._last_sized = (None, 0)
+        self._size += size - self._data.pop(key, 0)
+        self._data[key] = size
+        if self._max_entry_size is not None and size > self._max_entry_size:
+            # written without being admitted (by a client not asking for admission)
+            self._rejected.append(key)
+
+    def next_to_release(self) -> Optional[CacheKey]:
+        while self._rejected:
+            key = self._rejected.popleft()
+            if key in self._data:
+                self._size -= self._data.pop(key)
+                return key
+        if self._size > self._max_size and self._data:
+            key, size = self._data.popitem(last=False)
+            self._size -= size
+            return key
+        return None
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[max_size={max_size},max_entry_size={max_entry_size},sizer={sizer}]".format(
+            name=self.__class__, max_size=self._max_size, max_entry_size=self._max_entry_size, sizer=self._sizer)
+
+
+class FrequencySketch:
+    """Count-min sketch estimating how often keys were accessed (by their hashes) with periodic aging
+    (all counters are halved once number of recorded accesses reaches sample size).
+    Counters are saturating bytes (up to 15) kept in a single bytearray (4 rows, each twice as wide as expected
+    capacity to limit collisions), so it takes 8 bytes per key of the expected capacity."""
+
+    _DEPTH = 4
+    _HALVED = bytes(count >> 1 for count in range(256))
+    _MIXER = 0x9E3779B97F4A7C15  # spreads hashes of consecutive ints (which are the ints themselves)
+
+    def __init__(self, capacity: int) -> None:
+        """
+        :param int capacity:                            expected number of distinct keys (sizes the sketch)
+        """
+        self._width = 1 << max(2 * capacity - 1, 1).bit_length()  # power of two, so indices are masked
+        self._table = bytearray(self._DEPTH * self._width)
+        self._sample_size = 10 * self._width
+        self._additions = 0
+
+    def _indices(self, key: CacheKey) -> Tuple[int, int, int, int]:
+        # double hashing - index in each row is derived from a (mixed) hash of the key & a step
+        width = self._width
+        mask = width - 1
+        mixed = (hash(key) * self._MIXER) & 0xFFFFFFFFFFFFFFFF
+        mixed ^= mixed >> 32  # low bits of the product alone are weak (repeat for keys differing in high bits)
+        first = mixed & mask
+        step = (mixed >> 32) | 1
+        return (first, width + ((first + step) & mask),
+                2 * width + ((first + 2 * step) & mask), 3 * width + ((first + 3 * step) & mask))
+
+    def frequency(self, key: CacheKey) -> int:
+        table = self._table
+        first, second, third, fourth = self._indices(key)
+        return min(table[first], table[second], table[third], table[fourth])
+
+    def increment(self, key: CacheKey) -> None:
+        # unrolled, as it is called on every access
+        table = self._table
+        first, second, third, fourth = self._indices(key)
+        if table[first] < 15:
+            table[first] += 1
+        if table[second] < 15:
+            table[second] += 1
+        if table[third] < 15:
+            table[third] += 1
+        if table[fourth] < 15:
+            table[fourth] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._table = table.translate(self._HALVED)
+            self._additions //= 2
+
+
+class WindowTinyLfuEvictionStrategy(EvictionStrategy):
+    """W-TinyLFU: new entries land in a small LRU window; entries leaving the window compete for the main
+    (segmented LRU) region with its least recently used entry - the one accessed more frequently (according to
+    FrequencySketch) stays. Keeps frequently used entries despite scans & bursts of one-time keys.
+
+    Main region consists of probation (entries admitted or demoted) and protected segments (entries
+    accessed again while on probation)."""
+
+    def __init__(self, capacity: int = 4096, window_ratio: float = 0.01, protected_ratio: float = 0.8) -> None:
+        """
+        :param int capacity:                            max number of entries; default = 4096
+        :param float window_ratio:                      part of capacity taken by window; default = 0.01
+        :param float protected_ratio:                   part of main region taken by protected segment;
+                                                        default = 0.8
+        """
+        if not 0.0 < window_ratio <= 1.0 or not 0.0 <= protected_ratio <= 1.0:
+            raise ValueError('Ratios have to be in range (0, 1] (window) & [0, 1] (protected)')
+        self._capacity = capacity
+        self._window_capacity = max(1, int(capacity * window_ratio))
+        self._protected_capacity = int((capacity - self._window_capacity) * protected_ratio)
+        self._window: collections.OrderedDict = collections.OrderedDict()
+        self._probation: collections.OrderedDict = collections.OrderedDict()
+        self._protected: collections.OrderedDict = collections.OrderedDict()
+        self._candidate: Optional[CacheKey] = None  # last entry moved from window to main region
+        self._sketch = FrequencySketch(capacity)
+
+    def mark_read(self, key: CacheKey) -> None:
+        self._sketch.increment(key)
+        self._promote(key)
+
+    def mark_written(self, key: CacheKey, entry: CacheEntry) -> None:
+        self._sketch.increment(key)
+        if self._promote(key):
+            return
+        self._window[key] = None
+        if len(self._window) > self._window_capacity:
+            candidate, _ = self._window.popitem(last=False)
+            self._probation[candidate] = None
+            self._candidate = candidate
+
+    def _promote(self, key: CacheKey) -> bool:
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+        elif key in self._probation:
+            del self._probation[key]
+            self._protected[key] = None
+            if len(self._protected) > self._protected_capacity:
+                demoted, _ = self._protected.popitem(last=False)
+                self._probation[demoted] = None
+        else:
+            return False
+        return True
+
+    def mark_released(self, key: CacheKey) -> None:
+        self._window.pop(key, None)
+        self._probation.pop(key, None)
+        self._protected.pop(key, None)
+        if key == self._candidate:
+            self._candidate = None
+
+    def next_to_release(self) -> Optional[CacheKey]:
+        if len(self._window) + len(self._probation) + len(self._protected) <= self._capacity:
+            return None
+        if not self._probation:
+            key, _ = (self._protected or self._window).popitem(last=False)
+            return key
+        victim = next(iter(self._probation))
+        candidate = self._candidate
+        self._candidate = None
+        if candidate is not None and candidate != victim and candidate in self._probation \
+                and self._sketch.frequency(candidate) <= self._sketch.frequency(victim):
+            del self._probation[candidate]
+            return candidate
+        del self._probation[victim]
+        return victim
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[capacity={capacity},window_capacity={window_capacity}," \
+               "protected_capacity={protected_capacity}]".format(
+                name=self.__class__, capacity=self._capacity, window_capacity=self._window_capacity,
+                protected_capacity=self._protected_capacity)
+
+
 class NoEvictionStrategy(EvictionStrategy):
     """
     Strategy to be used when delegating eviction to cache itself.
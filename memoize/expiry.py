@@ -0,0 +1,198 @@
+"""
+[API] Provides proactive expiry - releasing expired entries in background (before they are read again
+or pushed out by eviction strategy), scheduled with a hierarchical timer wheel.
+"""
+
+import asyncio
+import datetime
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from memoize.entry import CacheKey
+
+_OVERFLOW = -1  # level of keys due beyond the span of the wheel
+
+
+class TimerWheel:
+    """Hierarchical timer wheel - schedules keys (by deadline, in seconds since the epoch) with given resolution.
+
+    Level 0 has a slot per tick, each higher level has a slot per full rotation of the level below it.
+    Keys are moved (cascaded) to lower levels once their slot is reached, so scheduling, rescheduling
+    & cancelling are O(1) and each key is moved at most once per level (amortized O(1) per key).
+    Keys due beyond the span of all levels are kept aside & rescheduled once per rotation of the top level.
+
+    Keys are never returned before their deadline, but up to one tick after it."""
+
+    def __init__(self, tick: float, now: float, slots: int = 64, levels: int = 4) -> None:
+        """
+        :param float tick:                              resolution (in seconds)
+        :param float now:                               current time (in seconds since the epoch)
+        :param int slots:                               slots per level; default = 64
+        :param int levels:                              number of levels; default = 4 (64**4 ticks)
+        """
+        if tick <= 0:
+            raise ValueError('Tick has to be positive')
+        self._tick = tick
+        self._slots = slots
+        self._levels = levels
+        self._spans = [slots ** level for level in range(levels + 1)]  # ticks covered by a slot of each level
+        self._wheels: List[List[Set[CacheKey]]] = [[set() for _ in range(slots)] for _ in range(levels)]
+        self._overflow: Set[CacheKey] = set()
+        self._scheduled: Dict[CacheKey, Tuple[float, int, int]] = {}  # key -> (deadline, level, slot)
+        self._current = int(now // tick)  # first tick that has not been processed yet
+
+    def schedule(self, key: CacheKey, deadline: float) -> None:
+        """Schedules (or reschedules) given key."""
+        self.cancel(key)
+        self._place(key, deadline)
+
+    def cancel(self, key: CacheKey) -> None:
+        scheduled = self._scheduled.pop(key, None)
+        if scheduled is not None:
+            _, level, slot = scheduled
+            self._bucket(level, slot).discard(key)
+
+    def advance(self, now: float, limit: int) -> List[CacheKey]:
+        """Returns (at most limit) keys that are due at given time. Remaining ones are returned by next calls."""
+        target = int(now // self._tick)
+        self.fast_forward(now)
+        due: List[CacheKey] = []
+        while self._current < target:
+            bucket = self._wheels[0][self._current % self._slots]
+            while bucket and len(due) < limit:
+                key = bucket.pop()
+                del self._scheduled[key]
+                due.append(key)
+            if bucket:
+                break
+            self._current += 1
+            self._cascade()
+        return due
+
+    def fast_forward(self, now: float) -> None:
+        """Skips ticks passed while no key was scheduled (so they are not processed one by one later)."""
+        if not self._scheduled:
+            self._current = max(self._current, int(now // self._tick))
+
+    def _place(self, key: CacheKey, deadline: float) -> None:
+        due_tick = max(int(deadline // self._tick), self._current)
+        delay = due_tick - self._current
+        for level in range(self._levels):
+            if delay < self._spans[level + 1]:
+                slot = (due_tick // self._spans[level]) % self._slots
+                self._wheels[level][slot].add(key)
+                self._scheduled[key] = (deadline, level, slot)
+                return
+        self._overflow.add(key)
+        self._scheduled[key] = (deadline, _OVERFLOW, 0)
+
+    def _cascade(self) -> None:
+        for level in range(1, self._levels):
+            if self._current % self._spans[level]:
+                return
+            slot = (self._current // self._spans[level]) % self._slots
+            self._replace(self._wheels[level], slot)
+        if self._current % self._spans[self._levels] == 0:
+            overflow, self._overflow = self._overflow, set()
+            for key in overflow:
+                self._place(key, self._scheduled[key][0])
+
+    def _replace(self, wheel: List[Set[CacheKey]], slot: int) -> None:
+        keys, wheel[slot] = wheel[slot], set()
+        for key in keys:
+            self._place(key, self._scheduled[key][0])
+
+    def _bucket(self, level: int, slot: int) -> Set[CacheKey]:
+        return self._overflow if level == _OVERFLOW else self._wheels[level][slot]
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return key in self._scheduled
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[tick={tick},slots={slots},levels={levels}]".format(
+            name=self.__class__, tick=self._tick, slots=self._slots, levels=self._levels)
+
+
+class ExpirySweeper:
+    """Releases expired entries (from storage & eviction strategy) in background, so entries of keys that are
+    not read anymore do not occupy storage until eviction strategy pushes them out.
+
+    Entries are scheduled once written (with a TimerWheel) and checked every tick. Due entries are released
+    in batches of limited size (IO-loop is given a chance to run other tasks between batches).
+    Entries that may still be served when their refresh fails (see `stale_if_error` in configuration)
+    are released once that period passes too.
+
+        @memoize(configuration=..., expiry_sweeper=ExpirySweeper())
+        async def get_user(user_id):
+            return await backend.get_user(user_id)
+
+    Note: Each memoized function should have its own instance.
+    Note: Expired entries are not returned after their refresh exceeds `max_blocking_wait` once they are released.
+    Note: Background task is running only while there are entries scheduled.
+    """
+
+    def __init__(self, tick: datetime.timedelta = datetime.timedelta(seconds=1), batch_size: int = 256) -> None:
+        """
+        :param datetime.timedelta tick:                 how often expired entries are released; default = 1 second
+        :param int batch_size:                          max number of entries released at once; default = 256
+        """
+        if batch_size < 1:
+            raise ValueError('Batch size has to be positive')
+        self.logger = logging.getLogger(__name__)
+        self._tick = tick.total_seconds()
+        self._batch_size = batch_size
+        self._wheel = TimerWheel(self._tick, time.time())
+        self._release: Optional[Callable[[List[CacheKey]], Awaitable[None]]] = None
+        self._task: Optional[asyncio.Future] = None
+
+    def _initialized(self) -> bool:
+        """ Executed internally by the library. """
+        return self._release is not None
+
+    def _initialize(self, release: Callable[[List[CacheKey]], Awaitable[None]]) -> None:
+        """ Executed internally by the library. """
+        self._release = release
+
+    def schedule(self, key: CacheKey, expires_at: float) -> None:
+        """Schedules release of entry for given key at given time (in seconds since the epoch).
+        Replaces time scheduled previously for the key."""
+        self._wheel.fast_forward(time.time())
+        self._wheel.schedule(key, expires_at)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._sweep())
+
+    def cancel(self, key: CacheKey) -> None:
+        """Cancels scheduled release (for instance if entry was released by other means)."""
+        self._wheel.cancel(key)
+
+    async def _sweep(self) -> None:
+        while self._wheel:
+            await asyncio.sleep(self._tick)
+            expired = self._wheel.advance(time.time(), self._batch_size)
+            while expired:
+                try:
+                    if self._release is not None:
+                        await self._release(expired)
+                except Exception as e:
+                    self.logger.error('Failed to release expired entries: %s', e)
+                if len(expired) < self._batch_size:
+                    break
+                await asyncio.sleep(0)
+                expired = self._wheel.advance(time.time(), self._batch_size)
+
+    def __len__(self) -> int:
+        return len(self._wheel)
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[tick={tick},batch_size={batch_size}]".format(
+            name=self.__class__, tick=self._tick, batch_size=self._batch_size)
@@ -28,4 +28,5 @@ class InvalidationSupport(object):
             raise RuntimeError("Uninitialized: InvalidationSupport should be passed to @memoize to have it initialized")
         key = self.__key_extractor.format_key(self.__method_reference, call_args, call_kwargs)
         await self.__cache_storage.release(key)
+        self.__key_extractor.on_released([key])
 
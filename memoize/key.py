@@ -4,19 +4,38 @@ how cache keys are constructed.
 This interface is used in cache configuration.
 """
 
+import dataclasses
+import datetime
+import decimal
+import enum
+import hashlib
+import inspect
+import itertools
+import uuid
+import weakref
 from abc import abstractmethod, ABCMeta
 
-from typing import Tuple, Any, Dict
+from typing import Tuple, Any, Dict, Optional, Callable, List, Iterable, Set
+
+from memoize.entry import CacheKey
 
 
 class KeyExtractor(metaclass=ABCMeta):
     """ Provides logic of cache key construction. """
 
     @abstractmethod
-    def format_key(self, method_reference, call_args: Tuple[Any, ...], call_kwargs: Dict[str, Any]) -> str:
+    def format_key(self, method_reference, call_args: Tuple[Any, ...], call_kwargs: Dict[str, Any]) -> CacheKey:
         """Using wrapped method object, call args and call keyword args, prepare cache entry key."""
         raise NotImplementedError()
 
+    def on_written(self, key: CacheKey) -> None:
+        """Called by wrappers once entry for given key is written to storage. By default does nothing."""
+        return None
+
+    def on_released(self, keys: Iterable[CacheKey]) -> None:
+        """Called by wrappers once entries for given keys are released from storage. By default does nothing."""
+        return None
+
 
 class EncodedMethodReferenceAndArgsKeyExtractor(KeyExtractor):
     """Encodes method reference, args & kwargs to string and uses that as cache entry key.
@@ -54,3 +73,399 @@ class EncodedMethodNameAndArgsKeyExtractor(KeyExtractor):
     def __repr__(self) -> str:
         return "{name}[skip_first_arg_as_self={skip_first_arg_as_self}]".format(
             name=self.__class__, skip_first_arg_as_self=self._skip_first_arg_as_self)
+
+
+class HashedArgsKeyExtractor(KeyExtractor):
+    """Uses fixed-size digest (blake2b) of args & kwargs as cache entry key, optionally prefixed with (readable)
+    qualified name of the method. Keys are compact (cheap to hash and to send to remote storage)
+    and stable - same for the same arguments across processes and restarts.
+
+    Arguments are digested using a canonical encoding (kwargs are sorted, so their order does not matter)
+    which supports: None, bool, int, float, str, bytes, tuples, lists, dicts, sets, enums, dataclasses
+    and date/time, Decimal & UUID values. Other arguments have to be converted by provided 'encoder'
+    (to a supported value), otherwise TypeError is raised (their representation could be process-specific).
+
+    Note: If wrapped function is a method (has 'self' as first positional arg) you may want to exclude 'self' from key
+    by setting 'skip_first_arg_as_self' flag.
+
+    Warning: Without name prefix, keys of different functions called with the same arguments are the same."""
+
+    _ENCODING_VERSION = '1'
+    _STR_ENCODED = (datetime.datetime, datetime.date, datetime.time, datetime.timedelta, decimal.Decimal, uuid.UUID)
+
+    def __init__(self, digest_size: int = 16, include_name: bool = True, skip_first_arg_as_self: bool = False,
+                 encoder: Optional[Callable[[Any], Any]] = None) -> None:
+        """
+        :param int digest_size:                         size of the digest in bytes (1-64); default = 16
+        :param bool include_name:                       prefix keys with qualified name of the method; default = True
+        :param bool skip_first_arg_as_self:             exclude first positional arg from key; default = False
+        :param encoder:                                 converts arguments of unsupported types to supported ones
+        """
+        if not 1 <= digest_size <= hashlib.blake2b.MAX_DIGEST_SIZE:
+            raise ValueError('Digest size has to be in range [1, {}]'.format(hashlib.blake2b.MAX_DIGEST_SIZE))
+        self._digest_size = digest_size
+        self._include_name = include_name
+        self._skip_first_arg_as_self = skip_first_arg_as_self
+        self._encoder = encoder
+
+    def format_key(self, method_reference, call_args: Tuple[Any, ...], call_kwargs: Dict[str, Any]) -> str:
+        if self._skip_first_arg_as_self:
+            call_args = call_args[1:]
+
+        parts = [self._ENCODING_VERSION]
+        self._encode(call_args, parts)
+        self._encode(call_kwargs, parts)
+        encoded = ''.join(parts).encode('utf-8', 'surrogatepass')
+        digest = hashlib.blake2b(encoded, digest_size=self._digest_size).hexdigest()
+        if not self._include_name:
+            return digest
+        return '{}.{}:{}'.format(method_reference.__module__, method_reference.__qualname__, digest)
+
+    def _encode(self, value: Any, parts: List[str]) -> None:
+        # every value is encoded as a type tag followed by either a terminated/length-prefixed payload
+        # or a number of items followed by encoded items; scalars in containers are encoded inline (for speed)
+        value_type = type(value)
+        if value_type is str:
+            parts.append('s%d:%s' % (len(value), value))
+        elif value_type is int:
+            parts.append('i%d;' % value)
+        elif value is None:
+            parts.append('N')
+        elif value_type is bool:
+            parts.append('T' if value else 'F')
+        elif value_type is float:
+            parts.append('f%r;' % value)
+        elif value_type is bytes:
+            parts.append('b%d:%s' % (len(value), value.hex()))
+        elif value_type is tuple or value_type is list:
+            parts.append('%s%d:' % ('t' if value_type is tuple else 'l', len(value)))
+            append = parts.append
+            for item in value:
+                item_type = type(item)
+                if item_type is str:
+                    append('s%d:%s' % (len(item), item))
+                elif item_type is int:
+                    append('i%d;' % item)
+                else:
+                    self._encode(item, parts)
+        elif isinstance(value, dict):
+            parts.append('d%d:' % len(value))
+            if all(type(key) is str for key in value):
+                # order of (unique) string keys is well-defined, so they may be sorted directly (e.g. kwargs)
+                for key in sorted(value):
+                    parts.append('s%d:%s' % (len(key), key))
+                    self._encode(value[key], parts)
+            else:
+                parts.extend(sorted(self._encoded(key) + self._encoded(item) for key, item in value.items()))
+        elif isinstance(value, enum.Enum):
+            parts.append('e%s' % self._name_of(value_type))
+            self._encode(value.value, parts)
+        elif isinstance(value, (set, frozenset)):
+            parts.append('S%d:' % len(value))
+            parts.extend(sorted(self._encoded(item) for item in value))
+        elif isinstance(value, tuple):
+            # named tuples & other tuple subclasses
+            parts.append('o%s' % self._name_of(value_type))
+            self._encode(tuple(value), parts)
+        elif isinstance(value, self._STR_ENCODED):
+            parts.append('o%s' % self._name_of(value_type))
+            self._encode(str(value), parts)
+        elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+            parts.append('c%s' % self._name_of(value_type))
+            self._encode(tuple(getattr(value, field.name) for field in dataclasses.fields(value)), parts)
+        elif self._encoder is not None:
+            parts.append('x%s' % self._name_of(value_type))
+            self._encode(self._encoder(value), parts)
+        else:
+            raise TypeError('Cannot create stable cache key from argument of type {} '
+                            '(provide encoder converting it to a supported type)'.format(value_type))
+
+    def _encoded(self, value: Any) -> str:
+        parts: List[str] = []
+        self._encode(value, parts)
+        return ''.join(parts)
+
+    @staticmethod
+    def _name_of(value_type: type) -> str:
+        name = '{}.{}'.format(value_type.__module__, value_type.__qualname__)
+        return '%d:%s' % (len(name), name)
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[digest_size={digest_size},include_name={include_name}," \
+               "skip_first_arg_as_self={skip_first_arg_as_self},encoder={encoder}]".format(
+                name=self.__class__, digest_size=self._digest_size, include_name=self._include_name,
+                skip_first_arg_as_self=self._skip_first_arg_as_self, encoder=self._encoder)
+
+
+class TupleKeyExtractor(KeyExtractor):
+    """Uses method reference, args & kwargs themselves (in a tuple) as cache entry key.
+    Avoids costs of formatting args as strings (and of hashing these strings), so it is suited for local
+    (in-memory) storages only - keys are neither strings nor stable across processes.
+
+    Calls with a single int or str positional arg use a cheap two-element tuple as a key. If any arg is unhashable,
+    key falls back to the string form used by EncodedMethodReferenceAndArgsKeyExtractor.
+
+    Note: Like functools.lru_cache, args that compare equal (for instance 1 and 1.0) share key unless 'typed' flag
+    is set. Order of kwargs matters (calls with differently ordered kwargs use different keys).
+
+    Note: If wrapped function is a method (has 'self' as first positional arg) you may want to exclude 'self' from key
+    by setting 'skip_first_arg_as_self' flag."""
+
+    _FAST_TYPES = frozenset((int, str))
+    _KWARGS_MARK = (object(),)
+
+    def __init__(self, typed: bool = False, skip_first_arg_as_self: bool = False) -> None:
+        """
+        :param bool typed:                              distinguish args of different types; default = False
+        :param bool skip_first_arg_as_self:             exclude first positional arg from key; default = False
+        """
+        self._typed = typed
+        self._skip_first_arg_as_self = skip_first_arg_as_self
+
+    def format_key(self, method_reference, call_args: Tuple[Any, ...], call_kwargs: Dict[str, Any]) -> CacheKey:
+        if self._skip_first_arg_as_self:
+            call_args = call_args[1:]
+
+        if not call_kwargs and len(call_args) == 1 and type(call_args[0]) in self._FAST_TYPES:
+            return method_reference, call_args[0]
+
+        items = (method_reference,) + call_args
+        if call_kwargs:
+            items += self._KWARGS_MARK
+            for item in call_kwargs.items():
+                items += item
+        if self._typed:
+            items += tuple(type(arg) for arg in call_args)
+            if call_kwargs:
+                items += tuple(type(arg) for arg in call_kwargs.values())
+        try:
+            hash(items)
+        except TypeError:
+            return str((method_reference, call_args, call_kwargs,))
+        return items
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[typed={typed},skip_first_arg_as_self={skip_first_arg_as_self}]".format(
+            name=self.__class__, typed=self._typed, skip_first_arg_as_self=self._skip_first_arg_as_self)
+
+
+class _CallNormalizer:
+    """Binds call args & kwargs to parameters of a method (using its signature inspected once)."""
+
+    _MISSING = inspect.Parameter.empty
+
+    def __init__(self, method_reference, include: Optional[frozenset], exclude: frozenset) -> None:
+        parameters = inspect.signature(method_reference).parameters.values()
+        names = {parameter.name for parameter in parameters}
+        var_keyword = any(parameter.kind is inspect.Parameter.VAR_KEYWORD for parameter in parameters)
+        unknown = ((include or frozenset()) | exclude) - names
+        if unknown and not var_keyword:
+            raise ValueError('Parameters {} not found in signature of {}'.format(sorted(unknown), method_reference))
+
+        self._include = include
+        self._exclude = exclude
+        kept = self._is_kept
+        # (name, default, may be passed by keyword, kept in key)
+        self._positional: List[Tuple[str, Any, bool, bool]] = []
+        self._keyword_only: List[Tuple[str, Any, bool]] = []
+        self._keywords = set()  # names of parameters that may be passed by keyword
+        self._positional_only = set()  # names that may still be passed in **kwargs (as extra kwargs)
+        self._var_positional: Optional[bool] = None  # None if method does not take *args; whether they are kept
+        self._var_keyword = var_keyword
+        for parameter in parameters:
+            if parameter.kind is inspect.Parameter.VAR_POSITIONAL:
+                self._var_positional = kept(parameter.name)
+            elif parameter.kind is inspect.Parameter.KEYWORD_ONLY:
+                self._keyword_only.append((parameter.name, parameter.default, kept(parameter.name)))
+                self._keywords.add(parameter.name)
+            elif parameter.kind is not inspect.Parameter.VAR_KEYWORD:
+                by_keyword = parameter.kind is inspect.Parameter.POSITIONAL_OR_KEYWORD
+                self._positional.append((parameter.name, parameter.default, by_keyword, kept(parameter.name)))
+                if by_keyword:
+                    self._keywords.add(parameter.name)
+                else:
+                    self._positional_only.add(parameter.name)
+
+    def normalize(self, call_args: Tuple[Any, ...],
+                  call_kwargs: Dict[str, Any]) -> Optional[Tuple[Tuple[Any, ...], Dict[str, Any]]]:
+        """Returns extra positional args (passed as *args) & values of named parameters (in order of signature,
+        with defaults applied). Returns None if call does not match the signature."""
+        args_count = len(call_args)
+        if args_count > len(self._positional) and self._var_positional is None:
+            return None
+        normalized = {}
+        consumed = 0
+        for index, (name, default, by_keyword, kept) in enumerate(self._positional):
+            if index < args_count:
+                value = call_args[index]
+            elif by_keyword and name in call_kwargs:
+                value = call_kwargs[name]
+                consumed += 1
+            elif default is not self._MISSING:
+                value = default
+            else:
+                return None
+            if kept:
+                normalized[name] = value
+        for name, default, kept in self._keyword_only:
+            if name in call_kwargs:
+                value = call_kwargs[name]
+                consumed += 1
+            elif default is not self._MISSING:
+                value = default
+            else:
+                return None
+            if kept:
+                normalized[name] = value
+        if consumed < len(call_kwargs):
+            if not self._var_keyword:
+                return None
+            if not self._positional_only.isdisjoint(call_kwargs):
+                # extra kwarg named like a positional-only parameter - names would collide in normalized kwargs
+                return None
+            for name in sorted(name for name in call_kwargs if name not in self._keywords):
+                if self._is_kept(name):
+                    normalized[name] = call_kwargs[name]
+        extra_args = call_args[len(self._positional):] if self._var_positional else ()
+        return extra_args, normalized
+
+    def _is_kept(self, name: str) -> bool:
+        return (self._include is None or name in self._include) and name not in self._exclude
+
+
+class NormalizedArgsKeyExtractor(KeyExtractor):
+    """Binds args & kwargs to parameters of the method (applying defaults) before passing them to another
+    KeyExtractor, so calls like f(1, 2), f(1, b=2) & f(a=1, b=2) share the same key.
+    Signature of each method is inspected once (on its first call), not on every call.
+
+    Values of named parameters are passed as kwargs (in order of signature; extra **kwargs sorted by name)
+    and only extra *args are passed as args. Calls not matching the signature are passed as they are
+    (wrapped method raises TypeError anyway).
+
+    Parameters may be included or excluded from keys by name (for instance 'self', loggers or request context).
+    """
+
+    def __init__(self, key_extractor: Optional[KeyExtractor] = None, include: Optional[Iterable[str]] = None,
+                 exclude: Iterable[str] = ()) -> None:
+        """
+        :param KeyExtractor key_extractor:              formats key of normalized args;
+                                                        default = EncodedMethodReferenceAndArgsKeyExtractor
+        :param include:                                 names of the only parameters used in keys; default = all
+        :param exclude:                                 names of parameters not used in keys; default = none
+        """
+        self._key_extractor = key_extractor if key_extractor is not None \
+            else EncodedMethodReferenceAndArgsKeyExtractor()
+        self._include = frozenset(include) if include is not None else None
+        self._exclude = frozenset(exclude)
+        self._normalizers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()  # method -> normalizer
+        self._normalizer: Optional[Tuple[Any, _CallNormalizer]] = None  # normalizer of the last method used
+
+    def format_key(self, method_reference, call_args: Tuple[Any, ...], call_kwargs: Dict[str, Any]) -> CacheKey:
+        normalizer = self._normalizer
+        if normalizer is None or normalizer[0] is not method_reference:
+            normalizer = self._normalizer = (method_reference, self._normalizer_of(method_reference))
+        normalized = normalizer[1].normalize(call_args, call_kwargs)
+        if normalized is None:
+            return self._key_extractor.format_key(method_reference, call_args, call_kwargs)
+        return self._key_extractor.format_key(method_reference, normalized[0], normalized[1])
+
+    def _normalizer_of(self, method_reference) -> _CallNormalizer:
+        # configuration (so this KeyExtractor) is often shared by multiple methods
+        try:
+            normalizer = self._normalizers.get(method_reference)
+        except TypeError:  # method does not support weak references (only the last one used is kept)
+            return _CallNormalizer(method_reference, self._include, self._exclude)
+        if normalizer is None:
+            normalizer = self._normalizers[method_reference] = \
+                _CallNormalizer(method_reference, self._include, self._exclude)
+        return normalizer
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[key_extractor={key_extractor},include={include},exclude={exclude}]".format(
+            name=self.__class__, key_extractor=self._key_extractor,
+            include=sorted(self._include) if self._include is not None else None, exclude=sorted(self._exclude))
+
+
+class InstanceScopedKeyExtractor(KeyExtractor):
+    """Scopes keys of methods to instances owning them (passed as the first positional arg, 'self'), so entries
+    of an instance may be released once it is garbage collected (instead of waiting for expiration or eviction).
+    Instances are tracked with weak references (so they have to support them).
+
+    Wrappers (memoize, memoize_sync & memoize_batch) release from storage & eviction strategy keys of collected
+    instances (keys reported to listeners registered with 'add_release_listener').
+    Keys are tracked per instance only while their entries are stored (wrappers report writes & releases).
+
+    Keys consist of a process-local token of the instance & a key of remaining args (formatted by another
+    KeyExtractor), so this KeyExtractor is suited for local (in-memory) storages only."""
+
+    def __init__(self, key_extractor: Optional[KeyExtractor] = None) -> None:
+        """
+        :param KeyExtractor key_extractor:              formats key of args (without the instance);
+                                                        default = TupleKeyExtractor
+        """
+        self._key_extractor = key_extractor if key_extractor is not None else TupleKeyExtractor()
+        self._tokens = itertools.count()
+        self._owners: Dict[int, Tuple[weakref.ref, int]] = {}  # id of instance -> (reference, token)
+        self._keys: Dict[int, Set[CacheKey]] = {}  # token -> keys of instance
+        self._listeners: List[Callable[[List[CacheKey]], None]] = []
+
+    def add_release_listener(self, listener: Callable[[List[CacheKey]], None]) -> None:
+        """Listener is called with keys of each collected instance. It is called by the garbage collector
+        (at any point of execution, in any thread), so it should only schedule releasing of these keys."""
+        self._listeners.append(listener)
+
+    def format_key(self, method_reference, call_args: Tuple[Any, ...], call_kwargs: Dict[str, Any]) -> CacheKey:
+        if not call_args:
+            raise TypeError('{} requires instance (self) as the first positional arg of {}'.format(
+                self.__class__.__name__, method_reference))
+        token = self._token_of(call_args[0])
+        return token, self._key_extractor.format_key(method_reference, call_args[1:], call_kwargs)
+
+    def on_written(self, key: CacheKey) -> None:
+        if type(key) is tuple:
+            keys = self._keys.get(key[0])  # None once the instance is collected
+            if keys is not None:
+                keys.add(key)
+
+    def on_released(self, keys: Iterable[CacheKey]) -> None:
+        for key in keys:
+            if type(key) is tuple:
+                tracked = self._keys.get(key[0])
+                if tracked is not None:
+                    tracked.discard(key)
+
+    def _token_of(self, owner: Any) -> int:
+        owner_id = id(owner)
+        tracked = self._owners.get(owner_id)
+        if tracked is not None and tracked[0]() is owner:
+            return tracked[1]
+        reference = weakref.ref(owner)
+        token = next(self._tokens)
+        self._keys[token] = set()
+        self._owners[owner_id] = (reference, token)
+        weakref.finalize(owner, self._on_collected, owner_id, token).atexit = False
+        return token
+
+    def _on_collected(self, owner_id: int, token: int) -> None:
+        tracked = self._owners.get(owner_id)
+        if tracked is not None and tracked[1] == token:
+            del self._owners[owner_id]
+        keys = self._keys.pop(token, None)
+        if keys:
+            for listener in self._listeners:
+                listener(list(keys))
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[key_extractor={key_extractor}]".format(name=self.__class__, key_extractor=self._key_extractor)
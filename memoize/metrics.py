@@ -0,0 +1,153 @@
+"""
+[API] Provides interface (and built-in implementations)
+of metrics listener - receives events of cache operations and their latencies.
+This interface is used in cache configuration.
+"""
+
+import bisect
+import enum
+from abc import ABCMeta, abstractmethod
+from typing import Dict, List, Sequence, Tuple
+
+from memoize.entry import CacheKey
+
+
+class CacheEvent(enum.Enum):
+    HIT = 'hit'  # entry served from cache (without waiting for a refresh)
+    MISS = 'miss'  # entry missing in cache, expired or its refresh forced
+    STALE_SERVED = 'stale_served'  # expired entry served (see stale_if_error & max_blocking_wait in configuration)
+    BACKGROUND_REFRESH = 'background_refresh'  # refresh started in background (current entry was served)
+    BLOCKING_REFRESH = 'blocking_refresh'  # refresh started while caller waits for its result
+    DOGPILE_WAIT = 'dogpile_wait'  # caller waits for a concurrent refresh instead of starting its own
+    RELEASE = 'release'  # entry released from storage (by eviction strategy)
+    EXPIRE = 'expire'  # expired entry released from storage (by expiry sweeper)
+    FAILURE = 'failure'  # refresh failed, timed-out or its failure was served from cache
+
+
+class Latency(enum.Enum):
+    METHOD = 'method'  # computation of a value by wrapped method
+    STORAGE_GET = 'storage_get'
+    STORAGE_OFFER = 'storage_offer'
+
+
+class MetricsListener(metaclass=ABCMeta):
+    """Receives metrics of cache operations. Called synchronously on cache paths, so has to be cheap."""
+
+    @abstractmethod
+    def on_event(self, event: CacheEvent, key: CacheKey) -> None:
+        """Called once per occurrence of given event."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def on_latency(self, latency: Latency, seconds: float) -> None:
+        """Called with duration of a completed operation."""
+        raise NotImplementedError()
+
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Counts observations in buckets (upper bounds, in seconds) - same way Prometheus histograms do."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last one counts observations exceeding all buckets
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[Tuple[float, int]]:
+        """Returns (upper bound, number of observations not exceeding it) pairs, including +Inf bound."""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class InMemoryMetrics(MetricsListener):
+    """Aggregates metrics in memory (counters & latency histograms).
+
+    Updates are not synchronized - under heavy use from multiple threads (see memoize_sync)
+    some of them may be lost, which is acceptable for monitoring purposes."""
+
+    def __init__(self, name: str = 'default', buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """
+        :param str name:                                identifies cache in exported metrics; default = 'default'
+        :param buckets:                                 upper bounds (in seconds) of latency histogram buckets
+        """
+        self.name = name
+        self.events: Dict[CacheEvent, int] = {event: 0 for event in CacheEvent}
+        self.latencies: Dict[Latency, Histogram] = {latency: Histogram(buckets) for latency in Latency}
+
+    def on_event(self, event: CacheEvent, key: CacheKey) -> None:
+        self.events[event] += 1
+
+    def on_latency(self, latency: Latency, seconds: float) -> None:
+        self.latencies[latency].observe(seconds)
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[name={metrics_name}]".format(name=self.__class__, metrics_name=self.name)
+
+
+class PrometheusTextExporter:
+    """Exports metrics aggregated by InMemoryMetrics in Prometheus text format (version 0.0.4),
+    for instance to be served by a /metrics HTTP endpoint. Caches are distinguished by 'cache' label."""
+
+    def __init__(self, *metrics: InMemoryMetrics, prefix: str = 'memoize') -> None:
+        """
+        :param InMemoryMetrics metrics:                 aggregated metrics of caches to be exported
+        :param str prefix:                              prefix of names of exported metrics; default = 'memoize'
+        """
+        self._metrics = list(metrics)
+        self._prefix = prefix
+
+    def register(self, metrics: InMemoryMetrics) -> None:
+        self._metrics.append(metrics)
+
+    def export(self) -> str:
+        events = '{}_events_total'.format(self._prefix)
+        latency = '{}_latency_seconds'.format(self._prefix)
+        lines = [
+            '# HELP {} Number of cache events.'.format(events),
+            '# TYPE {} counter'.format(events),
+        ]
+        for metrics in self._metrics:
+            for event, count in metrics.events.items():
+                lines.append('{}{{cache="{}",event="{}"}} {}'.format(
+                    events, _escape(metrics.name), event.value, count))
+        lines += [
+            '# HELP {} Latency of cache operations.'.format(latency),
+            '# TYPE {} histogram'.format(latency),
+        ]
+        for metrics in self._metrics:
+            for operation, histogram in metrics.latencies.items():
+                labels = 'cache="{}",operation="{}"'.format(_escape(metrics.name), operation.value)
+                for bound, count in histogram.cumulative_counts():
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(latency, labels, _format_bound(bound), count))
+                lines.append('{}_sum{{{}}} {}'.format(latency, labels, repr(histogram.sum)))
+                lines.append('{}_count{{{}}} {}'.format(latency, labels, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[prefix={prefix}]".format(name=self.__class__, prefix=self._prefix)
+
+
+def _escape(label_value: str) -> str:
+    return label_value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(bound)
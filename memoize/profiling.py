@@ -0,0 +1,149 @@
+"""
+[API] Provides interface (and built-in implementations)
+of profiling - timing of stages of (sampled) cached calls.
+This interface is used in cache configuration.
+"""
+
+import enum
+import random
+import time
+from abc import ABCMeta, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Stage(enum.Enum):
+    CALL = 'call'  # whole call of cached method (parent of the other stages)
+    KEY_EXTRACTION = 'key_extraction'
+    STORAGE_GET = 'storage_get'
+    METHOD = 'method'  # computation of a value by wrapped method (only if caller waited for it)
+    STORAGE_OFFER = 'storage_offer'
+    POSTPROCESSING = 'postprocessing'
+
+
+class Span:
+    """Timing of a single stage. May be used as a context manager (it is finished on exit).
+    Spans of stages of a call are children of the span of the whole call (see Stage.CALL)."""
+
+    def __init__(self, stage: Stage, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.stage = stage
+        self.attributes: Dict[str, Any] = attributes if attributes is not None else {}
+        self.children: List['Span'] = []
+        self.start_time = time.time()  # seconds since the epoch (for tracing backends)
+        self.duration: Optional[float] = None  # seconds (measured with a monotonic clock); None until finished
+        self.error: Optional[BaseException] = None
+        self._started = time.perf_counter()
+
+    def child(self, stage: Stage) -> 'Span':
+        """Starts span of a stage (to be finished by the caller, for instance with a with-statement)."""
+        span = Span(stage)
+        self.children.append(span)
+        return span
+
+    def record(self, stage: Stage, duration: float) -> 'Span':
+        """Adds (already finished) span of a stage that has just taken given number of seconds."""
+        span = self.child(stage)
+        span.start_time -= duration
+        span.duration = duration
+        return span
+
+    def finish(self) -> None:
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+
+    def __enter__(self) -> 'Span':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_value is not None and self.error is None:
+            self.error = exc_value
+        self.finish()
+
+    def __repr__(self) -> str:
+        return "Span[stage={stage},duration={duration},children={children}]".format(
+            stage=self.stage.value, duration=self.duration, children=self.children)
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+
+StageTimings = Dict[Stage, float]
+
+
+class SpanExporter(metaclass=ABCMeta):
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        """Receives finished span of a whole call (spans of its stages are its children).
+        Implement to forward spans to a tracing backend."""
+        raise NotImplementedError()
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps exported spans in memory (for instance to inspect them in tests)."""
+
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def clear(self) -> None:
+        self.spans = []
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[]".format(name=self.__class__)
+
+
+class Profiler(metaclass=ABCMeta):
+    @abstractmethod
+    def start(self, attributes: Dict[str, Any]) -> Optional[Span]:
+        """Called on start of each call. Returns span of the call if it is to be profiled (None otherwise).
+        Attributes describe the call (for instance name of cached method)."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def finish(self, span: Span) -> None:
+        """Called with span returned by 'start' once the call (and all of its stages) is finished."""
+        raise NotImplementedError()
+
+
+class SamplingProfiler(Profiler):
+    """Profiles randomly sampled calls (so profiling may be kept enabled in production).
+    Timings of stages are passed to the hook and whole spans to the exporter (both optional)."""
+
+    def __init__(self, rate: float = 0.01, hook: Optional[Callable[[StageTimings, Span], None]] = None,
+                 exporter: Optional[SpanExporter] = None) -> None:
+        """
+        :param float rate:                              fraction of profiled calls; default = 0.01 (1%)
+        :param hook:                                    called with seconds spent in each stage (by stage) & call span
+        :param SpanExporter exporter:                   receives spans of profiled calls
+        """
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError('Rate has to be in range [0, 1]')
+        self._rate = rate
+        self._hook = hook
+        self._exporter = exporter
+
+    def start(self, attributes: Dict[str, Any]) -> Optional[Span]:
+        if self._rate < 1.0 and random.random() >= self._rate:
+            return None
+        return Span(Stage.CALL, dict(attributes))
+
+    def finish(self, span: Span) -> None:
+        span.finish()
+        if self._hook is not None:
+            timings = {Stage.CALL: span.duration or 0.0}
+            for child in span.children:
+                timings[child.stage] = timings.get(child.stage, 0.0) + (child.duration or 0.0)
+            self._hook(timings, span)
+        if self._exporter is not None:
+            self._exporter.export(span)
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[rate={rate},hook={hook},exporter={exporter}]".format(
+            name=self.__class__, rate=self._rate, hook=self._hook, exporter=self._exporter)
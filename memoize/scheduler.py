@@ -0,0 +1,111 @@
+"""
+[API] Provides interface (and built-in implementations)
+of scheduling background refreshes (refreshes of entries that reached update point but are not expired yet).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from abc import ABCMeta, abstractmethod
+from typing import Callable, Awaitable, Any, Dict, List, Set, Tuple
+
+from memoize.entry import CacheKey
+
+Refresh = Callable[[], Awaitable[Any]]
+
+
+class RefreshScheduler(metaclass=ABCMeta):
+    @abstractmethod
+    def schedule(self, key: CacheKey, refresh: Refresh) -> None:
+        """Requests background refresh of entry for given key. Refresh is started by calling provided function.
+        Scheduler may postpone or even drop the refresh (current entry is still served in such case)."""
+        raise NotImplementedError()
+
+
+class ImmediateRefreshScheduler(RefreshScheduler):
+    """Starts every refresh in the next IO-loop iteration, without any limits."""
+
+    def schedule(self, key: CacheKey, refresh: Refresh) -> None:
+        asyncio.get_event_loop().call_soon(lambda: asyncio.ensure_future(refresh()))
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[]".format(name=self.__class__)
+
+
+class BoundedRefreshScheduler(RefreshScheduler):
+    """Limits number of refreshes running concurrently. Refreshes exceeding the limit are queued.
+
+    Queue is deduplicated by key and ordered by priority - number of times the refresh was requested
+    (so keys read more frequently are refreshed first).
+    If queue is full, newly requested refreshes are dropped.
+
+    May be shared by multiple cached methods to limit the total load they put on a backend
+    (keys have to be unique across these methods, which is the case for the default KeyExtractor)."""
+
+    def __init__(self, max_concurrency: int = 16, max_queued: int = 1024) -> None:
+        """
+        :param int max_concurrency:                     how many refreshes may run concurrently; default = 16
+        :param int max_queued:                          how many refreshes may wait for start; default = 1024
+        """
+        self.logger = logging.getLogger(__name__)
+        self._max_concurrency = max_concurrency
+        self._max_queued = max_queued
+        self._running: Set[CacheKey] = set()
+        self._queued: Dict[CacheKey, List[Any]] = {}  # key -> [priority, refresh]
+        self._heap: List[Tuple[int, int, CacheKey]] = []  # lazily invalidated entries: (-priority, order, key)
+        self._order = itertools.count()
+
+    def schedule(self, key: CacheKey, refresh: Refresh) -> None:
+        if key in self._running:
+            return
+
+        queued = self._queued.get(key)
+        if queued is not None:
+            queued[0] += 1
+            self._push(queued[0], key)
+            return
+
+        if len(self._running) < self._max_concurrency:
+            self._start(key, refresh)
+        elif len(self._queued) < self._max_queued:
+            self._queued[key] = [1, refresh]
+            self._push(1, key)
+        else:
+            self.logger.debug('Refresh queue is full - dropped refresh of key %s', key)
+
+    def _push(self, priority: int, key: CacheKey) -> None:
+        heapq.heappush(self._heap, (-priority, next(self._order), key))
+        if len(self._heap) > 4 * len(self._queued) + 64:
+            self._heap = [(-queued[0], next(self._order), queued_key) for queued_key, queued in self._queued.items()]
+            heapq.heapify(self._heap)
+
+    def _start(self, key: CacheKey, refresh: Refresh) -> None:
+        self._running.add(key)
+        task = asyncio.ensure_future(refresh())
+        task.add_done_callback(lambda finished: self._on_finished(key, finished))
+
+    def _on_finished(self, key: CacheKey, task: asyncio.Future) -> None:
+        self._running.discard(key)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.debug('Background refresh of key %s failed: %s', key, task.exception())
+        self._start_queued()
+
+    def _start_queued(self) -> None:
+        while self._heap and len(self._running) < self._max_concurrency:
+            negated_priority, _, key = heapq.heappop(self._heap)
+            queued = self._queued.get(key)
+            if queued is None or queued[0] != -negated_priority:
+                continue
+            del self._queued[key]
+            self._start(key, queued[1])
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[max_concurrency={max_concurrency},max_queued={max_queued}]".format(
+            name=self.__class__, max_concurrency=self._max_concurrency, max_queued=self._max_queued)
@@ -12,7 +12,6 @@ except:
     # ignoring type error as mypy falsely reports json is already imported
     import json  # type: ignore
 from abc import ABCMeta, abstractmethod
-from datetime import datetime, timezone
 
 from typing import Callable, Any
 
@@ -62,19 +61,23 @@ class JsonSerDe(SerDe):
     def deserialize(self, data: bytes) -> CacheEntry:
         as_dict = json.loads(codecs.decode(data, self.__string_encoding))
         return CacheEntry(
-            created=datetime.fromtimestamp(as_dict['created'], timezone.utc),
-            update_after=datetime.fromtimestamp(as_dict['update_after'], timezone.utc),
-            expires_after=datetime.fromtimestamp(as_dict['expires_after'], timezone.utc),
+            created=as_dict['created'],
+            update_after=as_dict['update_after'],
+            expires_after=as_dict['expires_after'],
             value=self.__reversible_repr_to_value(as_dict['value']),
+            computation_time=as_dict.get('computation_time'),
         )
 
     def serialize(self, entry: CacheEntry) -> bytes:
-        return codecs.encode(json.dumps({
-            'created': entry.created.timestamp(),
-            'update_after': entry.update_after.timestamp(),
-            'expires_after': entry.expires_after.timestamp(),
+        as_dict = {
+            'created': entry.created_timestamp,
+            'update_after': entry.update_after_timestamp,
+            'expires_after': entry.expires_after_timestamp,
             'value': self.__value_to_reversible_repr(entry.value),
-        }), self.__string_encoding)
+        }
+        if entry.computation_time is not None:
+            as_dict['computation_time'] = entry.computation_time
+        return codecs.encode(json.dumps(as_dict), self.__string_encoding)
 
 
 # types are ignored as everything works just fine with bytes instead of strings
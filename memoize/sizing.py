@@ -0,0 +1,94 @@
+"""
+[API] Provides interface (and built-in implementations)
+of sizers - estimating how much memory cache entries take.
+This interface is used by size-aware eviction strategies.
+"""
+
+import sys
+from abc import ABCMeta, abstractmethod
+
+from memoize.entry import CacheKey, CacheEntry
+from memoize.serde import SerDe
+
+
+class Sizer(metaclass=ABCMeta):
+    @abstractmethod
+    def size(self, key: CacheKey, entry: CacheEntry) -> int:
+        """Returns size (in bytes) of given entry. Called once for each entry written to cache."""
+        raise NotImplementedError()
+
+
+class EstimatingSizer(Sizer):
+    """Estimates size of cached value with sys.getsizeof, following items of containers (lists, tuples, sets, dicts)
+    & attributes of objects. To stay cheap, for large containers only a sample of items is sized (and the result
+    is scaled) and nesting deeper than 'max_depth' is ignored. Shared objects are counted as many times
+    as they are referenced."""
+
+    _CONTAINERS = (list, tuple, set, frozenset)
+
+    def __init__(self, max_depth: int = 4, sampled_items: int = 32) -> None:
+        """
+        :param int max_depth:                           how deep nested containers are followed; default = 4
+        :param int sampled_items:                       max number of sized items of each container; default = 32
+        """
+        self._max_depth = max_depth
+        self._sampled_items = sampled_items
+
+    def size(self, key: CacheKey, entry: CacheEntry) -> int:
+        return self._size_of(entry.value, self._max_depth)
+
+    def _size_of(self, value, depth: int) -> int:
+        size = sys.getsizeof(value)
+        if depth <= 0 or isinstance(value, (str, bytes, bytearray, int, float)):
+            return size
+        if isinstance(value, dict):
+            items = len(value)
+            sampled = 0
+            sampled_size = 0
+            for item_key, item_value in value.items():
+                if sampled == self._sampled_items:
+                    break
+                sampled_size += self._size_of(item_key, depth - 1) + self._size_of(item_value, depth - 1)
+                sampled += 1
+            return size + (sampled_size * items // sampled if sampled else 0)
+        if isinstance(value, self._CONTAINERS):
+            items = len(value)
+            sampled = 0
+            sampled_size = 0
+            for item in value:
+                if sampled == self._sampled_items:
+                    break
+                sampled_size += self._size_of(item, depth - 1)
+                sampled += 1
+            return size + (sampled_size * items // sampled if sampled else 0)
+        attributes = getattr(value, '__dict__', None)
+        if isinstance(attributes, dict):
+            return size + self._size_of(attributes, depth - 1)
+        return size
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[max_depth={max_depth},sampled_items={sampled_items}]".format(
+            name=self.__class__, max_depth=self._max_depth, sampled_items=self._sampled_items)
+
+
+class SerDeSizer(Sizer):
+    """Uses size of entry serialized with given SerDe - exact size of entries kept by storages using the same SerDe
+    (but serializing each entry once more may be costly)."""
+
+    def __init__(self, serde: SerDe) -> None:
+        """
+        :param SerDe serde:                             serializes entries to be sized
+        """
+        self._serde = serde
+
+    def size(self, key: CacheKey, entry: CacheEntry) -> int:
+        return len(self._serde.serialize(entry))
+
+    def __str__(self) -> str:
+        return self.__repr__()
+
+    def __repr__(self) -> str:
+        return "{name}[serde={serde}]".format(name=self.__class__, serde=self._serde)
@@ -2,11 +2,14 @@
 [API] Encapsulates update state management.
 """
 import asyncio
+import concurrent.futures
 import datetime
 import logging
+import threading
+import time
 from abc import ABCMeta, abstractmethod
 from asyncio import Future, CancelledError
-from typing import Dict, Awaitable, Union
+from typing import Dict, Awaitable, Union, Optional, Tuple
 
 from memoize.entry import CacheKey, CacheEntry
 
@@ -89,3 +92,89 @@ class InMemoryLocks(UpdateStatuses):
         if not self.is_being_updated(key):
             raise ValueError('Key {} is not being updated'.format(key))
         return self._updates_in_progress[key]
+
+
+class BlockingUpdateStatuses(UpdateStatuses):
+    """UpdateStatuses that may be shared by multiple threads (used by memoize_sync)."""
+
+    @abstractmethod
+    def try_mark_being_updated(self, key: CacheKey) -> bool:
+        """Atomically checks if update for given key is in progress and if not, marks it as being updated.
+        Returns True if caller is responsible for the update (and has to call 'mark_updated'/'mark_update_aborted')."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def wait_updated(self, key: CacheKey) -> Union[CacheEntry, Exception, None]:
+        """Blocks current thread until update in progress has been finished.
+        Returns the updated entry, an exception if update failed or None if update did not finish in time."""
+        raise NotImplementedError()
+
+
+class ThreadLocks(BlockingUpdateStatuses):
+    """Manages thread-safe locks (for each updated key) to prevent dog-piling across threads. """
+    def __init__(self, update_lock_timeout: datetime.timedelta = datetime.timedelta(minutes=5)) -> None:
+        self.logger = logging.getLogger(__name__)
+        self._update_lock_timeout = update_lock_timeout
+        self._lock = threading.Lock()
+        self._updates_in_progress: Dict[CacheKey, Tuple[concurrent.futures.Future, float]] = {}
+
+    def _in_progress(self, key: CacheKey) -> Optional[concurrent.futures.Future]:
+        # has to be called with self._lock acquired
+        update = self._updates_in_progress.get(key)
+        if update is None:
+            return None
+        future, deadline = update
+        if deadline <= time.monotonic():
+            self.logger.debug('Update task timed out - notifying clients awaiting for key %s', key)
+            self._updates_in_progress.pop(key)
+            future.set_result(None)
+            return None
+        return future
+
+    def is_being_updated(self, key: CacheKey) -> bool:
+        with self._lock:
+            return self._in_progress(key) is not None
+
+    def try_mark_being_updated(self, key: CacheKey) -> bool:
+        with self._lock:
+            if self._in_progress(key) is not None:
+                return False
+            deadline = time.monotonic() + self._update_lock_timeout.total_seconds()
+            self._updates_in_progress[key] = (concurrent.futures.Future(), deadline)
+            return True
+
+    def mark_being_updated(self, key: CacheKey) -> None:
+        if not self.try_mark_being_updated(key):
+            raise ValueError('Key {} is already being updated'.format(key))
+
+    def _complete(self, key: CacheKey, result: Union[CacheEntry, Exception, CancelledError]) -> None:
+        with self._lock:
+            if key not in self._updates_in_progress:
+                raise ValueError('Key {} is not being updated'.format(key))
+            future, _ = self._updates_in_progress.pop(key)
+        future.set_result(result)
+
+    def mark_updated(self, key: CacheKey, entry: CacheEntry) -> None:
+        self._complete(key, entry)
+
+    def mark_update_aborted(self, key: CacheKey, exception: Union[Exception, CancelledError]) -> None:
+        self._complete(key, exception)
+
+    def _future_of(self, key: CacheKey) -> Tuple[concurrent.futures.Future, float]:
+        with self._lock:
+            if self._in_progress(key) is None:
+                raise ValueError('Key {} is not being updated'.format(key))
+            return self._updates_in_progress[key]
+
+    def await_updated(self, key: CacheKey) -> Awaitable[Union[CacheEntry, Exception]]:
+        future, _ = self._future_of(key)
+        return asyncio.wrap_future(future)
+
+    def wait_updated(self, key: CacheKey) -> Union[CacheEntry, Exception, None]:
+        future, deadline = self._future_of(key)
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except concurrent.futures.TimeoutError:
+            with self._lock:
+                self._in_progress(key)
+            return None
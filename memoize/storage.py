@@ -6,7 +6,7 @@ This interface is used in cache configuration.
 
 from abc import ABCMeta, abstractmethod
 
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Sequence
 
 from memoize.entry import CacheKey, CacheEntry
 
@@ -18,6 +18,12 @@ class CacheStorage(metaclass=ABCMeta):
         Has to be async."""
         raise NotImplementedError()
 
+    async def get_many(self, keys: Sequence[CacheKey]) -> List[Optional[CacheEntry]]:
+        """Request values for given keys (returned in the same order). Missing values are returned as None.
+        Default implementation requests keys one by one (override it if storage supports multi-get).
+        Has to be async."""
+        return [await self.get(key) for key in keys]
+
     @abstractmethod
     async def offer(self, key: CacheKey, entry: CacheEntry) -> None:
         """Offer entry to be stored. If storage already has more relevant data, offer may be declined. 
@@ -30,6 +36,13 @@ class CacheStorage(metaclass=ABCMeta):
         Has to be async."""
         raise NotImplementedError()
 
+    async def release_many(self, keys: Sequence[CacheKey]) -> None:
+        """Declare that current client does not need entries determined by given keys.
+        Default implementation releases keys one by one (override it if storage supports multi-delete).
+        Has to be async."""
+        for key in keys:
+            await self.release(key)
+
 
 class LocalInMemoryCacheStorage(CacheStorage):
     """Implementation that stores all entries as-is in a dictionary residing solely in memory."""
@@ -42,5 +55,14 @@ class LocalInMemoryCacheStorage(CacheStorage):
     async def release(self, key: CacheKey) -> None:
         self._data.pop(key, None)
 
+    async def release_many(self, keys: Sequence[CacheKey]) -> None:
+        data = self._data
+        for key in keys:
+            data.pop(key, None)
+
     async def get(self, key: CacheKey) -> Optional[CacheEntry]:
         return self._data.get(key, None)
+
+    async def get_many(self, keys: Sequence[CacheKey]) -> List[Optional[CacheEntry]]:
+        data = self._data
+        return [data.get(key, None) for key in keys]
@@ -0,0 +1,366 @@
+"""
+[API] Provides an entry point to the library for synchronous (blocking) code - a wrapper that is used to cache entries.
+"""
+
+import collections
+import functools
+import logging
+import threading
+import time
+from typing import Optional, Callable, Awaitable, TypeVar, Any, Generator, cast, Deque, List, Union
+
+from memoize.backoff import CachedFailure
+from memoize.configuration import CacheConfiguration, NotConfiguredCacheCalledException, \
+    DefaultInMemoryCacheConfiguration, FrozenCacheConfiguration, LazyCacheConfiguration
+from memoize.entry import CacheKey, CacheEntry, early_refresh_due
+from memoize.exceptions import CachedMethodFailedException
+from memoize.invalidation import InvalidationSupport
+from memoize.key import KeyExtractor, InstanceScopedKeyExtractor
+from memoize.metrics import CacheEvent, Latency
+from memoize.statuses import BlockingUpdateStatuses, ThreadLocks
+
+T = TypeVar('T')
+
+
+def _resolve(awaitable: Awaitable[T]) -> T:
+    """Completes awaitable without an IO-loop. Works only for awaitables that never suspend
+    (like the ones returned by LocalInMemoryCacheStorage)."""
+    steps = cast(Generator[Any, None, T], awaitable.__await__())
+    try:
+        steps.send(None)
+    except StopIteration as result:
+        return result.value
+    steps.close()
+    raise RuntimeError('Storage operation suspended: memoize_sync supports only storages that complete '
+                       'without awaiting IO (like LocalInMemoryCacheStorage)')
+
+
+def memoize_sync(method: Optional[Callable] = None, configuration: Optional[CacheConfiguration] = None,
+                 invalidation: Optional[InvalidationSupport] = None,
+                 update_statuses: Optional[BlockingUpdateStatuses] = None):
+    """Wraps synchronous (blocking) function with memoization. Counterpart of memoize.wrapper.memoize.
+
+    If entry reaches time it should be updated, refresh is performed in a background thread,
+    but current entry is still valid and may be returned.
+    Once expiration time is reached, refresh is blocking and current entry is considered invalid.
+
+    Concurrent threads requesting the same missing/expired entry wait for a single computation.
+
+    Note: Wrapped method cannot be interrupted, so `method_timeout` (see configuration) is not applied.
+    Threads waiting for a concurrent refresh wait at most for the update lock timeout (see ThreadLocks).
+
+    Note: Storage operations are executed without an IO-loop, so only storages that do not await IO are supported
+    (like LocalInMemoryCacheStorage).
+
+    Note: If wrapped method throws an exception the cache will not be populated and failure occurs.
+
+    Note: Failures are indicated by designated exceptions (not original ones).
+
+    Note: If configured (see `failure_backoff` in configuration), failures of blocking refreshes are cached,
+    so subsequent calls fail immediately (without calling the method) until the backoff passes.
+
+    Note: If configured (see `stale_if_error` in configuration), expired entry is returned instead of a failure
+    if its blocking refresh fails (for a limited time after expiration).
+
+    To force refreshing immediately upon call to a cached method, set 'force_refresh_memoized' keyword flag, so
+    the method will block until it's cache is refreshed.
+
+    :param function method:                         function to be decorated
+    :param CacheConfiguration configuration:        cache configuration; default: DefaultInMemoryCacheConfiguration
+    :param InvalidationSupport invalidation:        pass created instance of InvalidationSupport to have it configured
+    :param BlockingUpdateStatuses update_statuses:  allows to override how cache updates are tracked (e.g. lock config);
+                                                    default: ThreadLocks
+
+    :raises: CachedMethodFailedException            upon call: if cached method thrown an exception
+                                                    or concurrent refresh failed/timed-out
+    :raises: NotConfiguredCacheCalledException      upon call: if provided configuration is not ready
+    """
+
+    if method is None:
+        if configuration is None:
+            configuration = DefaultInMemoryCacheConfiguration()
+        return functools.partial(
+            memoize_sync,
+            configuration=configuration,
+            invalidation=invalidation,
+            update_statuses=update_statuses
+        )
+
+    if invalidation is not None and not invalidation._initialized() and configuration is not None:
+        invalidation._initialize(configuration.storage(), configuration.key_extractor(), method)
+
+    logger = logging.getLogger('{}@{}'.format(memoize_sync.__name__, method.__name__))
+    logger.debug('wrapping %s with memoization - configuration: %s', method.__name__, configuration)
+
+    if update_statuses is None:
+        update_statuses = ThreadLocks()
+
+    # eviction strategies are not expected to be thread-safe
+    eviction_lock = threading.Lock()
+    snapshot: Optional[Union[FrozenCacheConfiguration, LazyCacheConfiguration]] = None
+
+    def resolve_configuration(current: CacheConfiguration) -> CacheConfiguration:
+        nonlocal snapshot
+        if snapshot is None or not snapshot.is_up_to_date_with(current):
+            if current.version() is None:
+                # unversioned configuration is resolved on every call (reading only components the call uses)
+                snapshot = LazyCacheConfiguration(current)
+            else:
+                snapshot = FrozenCacheConfiguration.initialized_with(current)
+            track_released_keys(snapshot.key_extractor())
+        return snapshot
+
+    released_keys: Deque[CacheKey] = collections.deque()  # keys of collected instances (InstanceScopedKeyExtractor)
+    tracked_key_extractors: List[KeyExtractor] = []
+    last_key_extractor: Optional[KeyExtractor] = None
+
+    def track_released_keys(key_extractor: KeyExtractor) -> None:
+        nonlocal last_key_extractor
+        if key_extractor is last_key_extractor:
+            return  # unversioned configurations are resolved on every call
+        last_key_extractor = key_extractor
+        if isinstance(key_extractor, InstanceScopedKeyExtractor) and key_extractor not in tracked_key_extractors:
+            tracked_key_extractors.append(key_extractor)
+            # called by garbage collector (possibly while eviction lock is held), so keys are released on next call
+            key_extractor.add_release_listener(released_keys.extend)
+
+    def release_collected(configuration_snapshot: CacheConfiguration) -> None:
+        keys = []
+        while True:
+            try:
+                keys.append(released_keys.popleft())
+            except IndexError:
+                break
+        try_release(keys, configuration_snapshot)
+
+    def try_release(keys: List[CacheKey], configuration_snapshot: CacheConfiguration) -> None:
+        # keys being updated are skipped (their entries are about to be written)
+        releasable = [key for key in keys if not update_statuses.is_being_updated(key)]
+        if not releasable:
+            return
+        try:
+            _resolve(configuration_snapshot.storage().release_many(releasable))
+            configuration_snapshot.key_extractor().on_released(releasable)
+            eviction_strategy = configuration_snapshot.eviction_strategy()
+            with eviction_lock:
+                for key in releasable:
+                    eviction_strategy.mark_released(key)
+            logger.debug('Released cache keys %s', releasable)
+            metrics = configuration_snapshot.metrics_listener()
+            if metrics is not None:
+                for key in releasable:
+                    metrics.on_event(CacheEvent.RELEASE, key)
+        except Exception as e:
+            logger.error('Failed to release cache keys %s: %s', releasable, e)
+
+    def discard(key: CacheKey, configuration_snapshot: CacheConfiguration) -> None:
+        # entry not admitted by eviction strategy - previous one (if any) would be outdated
+        logger.debug('Entry not admitted to cache for key %s', key)
+        _resolve(configuration_snapshot.storage().release(key))
+        with eviction_lock:
+            configuration_snapshot.eviction_strategy().mark_released(key)
+        configuration_snapshot.key_extractor().on_released([key])
+
+    def mark_written(key: CacheKey, entry: CacheEntry, configuration_snapshot: CacheConfiguration) -> None:
+        with eviction_lock:
+            eviction_strategy = configuration_snapshot.eviction_strategy()
+            eviction_strategy.mark_written(key, entry)
+            to_release = eviction_strategy.next_batch_to_release()
+        configuration_snapshot.key_extractor().on_written(key)
+        if to_release:
+            try_release(to_release, configuration_snapshot)
+
+    def cache_failure(key: CacheKey, exception: Exception, failures: int,
+                      configuration_snapshot: CacheConfiguration) -> None:
+        try:
+            backoff = configuration_snapshot.failure_backoff().backoff(failures)
+            if backoff is None:
+                return
+            now = time.time()
+            expires_after = now + backoff.total_seconds()
+            failure_entry = CacheEntry(created=now, update_after=expires_after, expires_after=expires_after,
+                                       value=CachedFailure(exception, failures))
+            _resolve(configuration_snapshot.storage().offer(key, failure_entry))
+            mark_written(key, failure_entry, configuration_snapshot)
+            logger.debug('Cached failure #%s for key %s (for %s)', failures, key, backoff)
+        except Exception as e:
+            logger.error('Failed to cache failure for key %s: %s', key, e)
+
+    def update(key: CacheKey, value_provider: Callable[[], Any], configuration_snapshot: CacheConfiguration,
+               failures: Optional[int] = None) -> CacheEntry:
+        # caller has to mark key as being updated; failures are cached only if their number is provided
+        metrics = configuration_snapshot.metrics_listener()
+        try:
+            started = time.perf_counter()
+            try:
+                value = value_provider()
+            finally:
+                # observed whether method returned or failed
+                computation_time = time.perf_counter() - started
+                if metrics is not None:
+                    metrics.on_latency(Latency.METHOD, computation_time)
+            offered_entry = configuration_snapshot.entry_builder().build(key, value)
+            offered_entry.computation_time = computation_time
+            with eviction_lock:
+                admitted = configuration_snapshot.eviction_strategy().admits(key, offered_entry)
+            if not admitted:
+                discard(key, configuration_snapshot)
+            elif metrics is None:
+                _resolve(configuration_snapshot.storage().offer(key, offered_entry))
+            else:
+                offer_started = time.perf_counter()
+                _resolve(configuration_snapshot.storage().offer(key, offered_entry))
+                metrics.on_latency(Latency.STORAGE_OFFER, time.perf_counter() - offer_started)
+        except Exception as e:
+            logger.debug('Error while refreshing cache for %s: %s', key, e)
+            if metrics is not None:
+                metrics.on_event(CacheEvent.FAILURE, key)
+            try:
+                if failures is not None:
+                    cache_failure(key, e, failures + 1, configuration_snapshot)
+            finally:
+                update_statuses.mark_update_aborted(key, e)
+            raise CachedMethodFailedException('Refresh failed to complete') from e
+        except BaseException as e:
+            # e.g. KeyboardInterrupt - propagated as is, but threads waiting for the update have to be released
+            logger.debug('Refreshing cache for %s interrupted: %r', key, e)
+            interrupted = CachedMethodFailedException('Refresh was interrupted')
+            interrupted.__cause__ = e
+            update_statuses.mark_update_aborted(key, interrupted)
+            raise
+        update_statuses.mark_updated(key, offered_entry)
+        logger.debug('Successfully refreshed cache for key %s', key)
+
+        if admitted:
+            mark_written(key, offered_entry, configuration_snapshot)
+
+        return offered_entry
+
+    def update_in_background(key: CacheKey, value_provider: Callable[[], Any],
+                             configuration_snapshot: CacheConfiguration) -> None:
+        try:
+            update(key, value_provider, configuration_snapshot)
+        except CachedMethodFailedException as e:
+            logger.debug('Background refresh failed for key %s: %s', key, e)
+
+    def refresh_in_background(key: CacheKey, value_provider: Callable[[], Any],
+                              configuration_snapshot: CacheConfiguration) -> None:
+        if update_statuses.try_mark_being_updated(key):
+            metrics = configuration_snapshot.metrics_listener()
+            if metrics is not None:
+                metrics.on_event(CacheEvent.BACKGROUND_REFRESH, key)
+            threading.Thread(
+                target=update_in_background,
+                args=(key, value_provider, configuration_snapshot),
+                daemon=True,
+            ).start()
+
+    def refresh(actual_entry: Optional[CacheEntry], key: CacheKey, value_provider: Callable[[], Any],
+                configuration_snapshot: CacheConfiguration, failures: Optional[int] = 0) -> CacheEntry:
+        metrics = configuration_snapshot.metrics_listener()
+        if update_statuses.try_mark_being_updated(key):
+            if metrics is not None:
+                metrics.on_event(CacheEvent.BLOCKING_REFRESH, key)
+            return update(key, value_provider, configuration_snapshot,
+                          failures if actual_entry is None else None)
+        elif actual_entry is not None:
+            logger.debug('As update point reached but concurrent update already in progress, '
+                         'relying on concurrent refresh to finish %s', key)
+            return actual_entry
+        else:
+            logger.debug('As entry expired, waiting for results of concurrent refresh %s', key)
+            if metrics is not None:
+                metrics.on_event(CacheEvent.DOGPILE_WAIT, key)
+            entry = update_statuses.wait_updated(key)
+            if isinstance(entry, Exception):
+                raise CachedMethodFailedException('Concurrent refresh failed to complete') from entry
+            if entry is None:
+                raise CachedMethodFailedException('Concurrent refresh timed out')
+            return entry
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if configuration is None:
+            raise NotConfiguredCacheCalledException()
+
+        configuration_snapshot = resolve_configuration(configuration)
+        if not configuration_snapshot.configured():
+            raise NotConfiguredCacheCalledException()
+        if released_keys:
+            release_collected(configuration_snapshot)
+
+        force_refresh = kwargs.pop('force_refresh_memoized', False)
+        key = configuration_snapshot.key_extractor().format_key(method, args, kwargs)
+
+        metrics = configuration_snapshot.metrics_listener()
+        current_entry: Optional[CacheEntry]
+        if metrics is None:
+            current_entry = _resolve(configuration_snapshot.storage().get(key))
+        else:
+            get_started = time.perf_counter()
+            current_entry = _resolve(configuration_snapshot.storage().get(key))
+            metrics.on_latency(Latency.STORAGE_GET, time.perf_counter() - get_started)
+        if current_entry is not None:
+            with eviction_lock:
+                configuration_snapshot.eviction_strategy().mark_read(key)
+
+        now = time.time()
+        early_refresh_beta = configuration_snapshot.early_refresh_beta()
+
+        failures = 0
+        if current_entry is not None and isinstance(current_entry.value, CachedFailure):
+            if current_entry.expires_after_timestamp > now and not force_refresh:
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.FAILURE, key)
+                raise CachedMethodFailedException('Refresh failed recently (failure served from cache)') \
+                    from current_entry.value.exception
+            failures = current_entry.value.failures
+            current_entry = None
+
+        def value_provider() -> Any:
+            return method(*args, **kwargs)
+
+        if current_entry is None:
+            logger.debug('Creating (blocking) entry for key %s', key)
+            if metrics is not None:
+                metrics.on_event(CacheEvent.MISS, key)
+            result = refresh(current_entry, key, value_provider, configuration_snapshot, failures)
+        elif force_refresh:
+            logger.debug('Forced entry update (blocking) for key %s', key)
+            if metrics is not None:
+                metrics.on_event(CacheEvent.MISS, key)
+            result = refresh(current_entry, key, value_provider, configuration_snapshot)
+        elif current_entry.expires_after_timestamp <= now:
+            logger.debug('Entry expiration reached - entry update (blocking) for key %s', key)
+            if metrics is not None:
+                metrics.on_event(CacheEvent.MISS, key)
+            stale_if_error = configuration_snapshot.stale_if_error()
+            if stale_if_error is None or \
+                    current_entry.expires_after_timestamp + stale_if_error.total_seconds() <= now:
+                result = refresh(None, key, value_provider, configuration_snapshot)
+            else:
+                try:
+                    result = refresh(None, key, value_provider, configuration_snapshot, None)
+                except CachedMethodFailedException as e:
+                    logger.debug('Refresh failed - stale entry returned (update started in background) '
+                                 'for key %s: %s', key, e)
+                    refresh_in_background(key, value_provider, configuration_snapshot)
+                    if metrics is not None:
+                        metrics.on_event(CacheEvent.STALE_SERVED, key)
+                    result = current_entry
+        elif current_entry.update_after_timestamp <= now or (
+                early_refresh_beta > 0 and early_refresh_due(current_entry, now, early_refresh_beta)):
+            logger.debug('Entry update point expired - entry update (background thread - current entry returned) '
+                         'for key %s', key)
+            if metrics is not None:
+                metrics.on_event(CacheEvent.HIT, key)
+            refresh_in_background(key, value_provider, configuration_snapshot)
+            result = current_entry
+        else:
+            if metrics is not None:
+                metrics.on_event(CacheEvent.HIT, key)
+            result = current_entry
+
+        return configuration_snapshot.postprocessing().apply(result.value)
+
+    return wrapper
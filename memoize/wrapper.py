@@ -3,22 +3,32 @@
 """
 
 import asyncio
-import datetime
+import collections
 import functools
 import logging
+import time
 from asyncio import Future, CancelledError
-from typing import Optional, Callable
+from typing import Optional, Callable, Union, Deque, List
 
+from memoize.backoff import CachedFailure
+from memoize.coalescing import RequestCoalescing
 from memoize.configuration import CacheConfiguration, NotConfiguredCacheCalledException, \
-    DefaultInMemoryCacheConfiguration, MutableCacheConfiguration
-from memoize.entry import CacheKey, CacheEntry
+    DefaultInMemoryCacheConfiguration, FrozenCacheConfiguration, LazyCacheConfiguration
+from memoize.entry import CacheKey, CacheEntry, early_refresh_due
 from memoize.exceptions import CachedMethodFailedException
+from memoize.expiry import ExpirySweeper
 from memoize.invalidation import InvalidationSupport
+from memoize.key import KeyExtractor, InstanceScopedKeyExtractor
+from memoize.metrics import CacheEvent, Latency
+from memoize.profiling import Span, Stage
+from memoize.scheduler import RefreshScheduler, ImmediateRefreshScheduler
 from memoize.statuses import UpdateStatuses, InMemoryLocks
 
 
 def memoize(method: Optional[Callable] = None, configuration: Optional[CacheConfiguration] = None,
-            invalidation: Optional[InvalidationSupport] = None, update_statuses: Optional[UpdateStatuses] = None):
+            invalidation: Optional[InvalidationSupport] = None, update_statuses: Optional[UpdateStatuses] = None,
+            coalescing: Optional[RequestCoalescing] = None, refresh_scheduler: Optional[RefreshScheduler] = None,
+            expiry_sweeper: Optional[ExpirySweeper] = None):
     """Wraps function with memoization.
 
     If entry reaches time it should be updated, refresh is performed in background,
@@ -32,6 +42,20 @@ def memoize(method: Optional[Callable] = None, configuration: Optional[CacheConf
     
     Note: Failures are indicated by designated exceptions (not original ones).
 
+    Note: If configured (see `failure_backoff` in configuration), failures of blocking refreshes are cached,
+    so subsequent calls fail immediately (without calling the method) until the backoff passes.
+
+    Note: If configured (see `stale_if_error` in configuration), expired entry is returned instead of a failure
+    if its blocking refresh fails (for a limited time after expiration).
+
+    Note: If configured (see `max_blocking_wait` in configuration), expired entry is returned if its refresh
+    does not finish in given time (refresh continues in background).
+
+    Note: If configured (see `profiler` in configuration), stages of sampled calls are timed
+    (see memoize.profiling).
+
+    Note: If expiry sweeper is provided, expired entries are released in background (see memoize.expiry).
+
     To force refreshing immediately upon call to a cached method, set 'force_refresh_memoized' keyword flag, so
     the method will block until it's cache is refreshed.
 
@@ -43,6 +67,13 @@ def memoize(method: Optional[Callable] = None, configuration: Optional[CacheConf
     :param InvalidationSupport invalidation:        pass created instance of InvalidationSupport to have it configured
     :param UpdateStatuses update_statuses:          allows to override how cache updates are tracked (e.g. lock config);
                                                     default: InMemoryStatuses
+    :param RequestCoalescing coalescing:            if provided, values missing in cache are loaded in batches
+                                                    (by the batch loader of RequestCoalescing) instead of calling method
+    :param RefreshScheduler refresh_scheduler:      allows to override how background refreshes are started
+                                                    (e.g. to limit their concurrency);
+                                                    default: ImmediateRefreshScheduler
+    :param ExpirySweeper expiry_sweeper:            if provided, expired entries are released in background
+                                                    (instead of waiting to be evicted)
 
     :raises: CachedMethodFailedException            upon call: if cached method timed-out or thrown an exception
     :raises: NotConfiguredCacheCalledException      upon call: if provided configuration is not ready
@@ -55,7 +86,10 @@ def memoize(method: Optional[Callable] = None, configuration: Optional[CacheConf
             memoize,
             configuration=configuration,
             invalidation=invalidation,
-            update_statuses=update_statuses
+            update_statuses=update_statuses,
+            coalescing=coalescing,
+            refresh_scheduler=refresh_scheduler,
+            expiry_sweeper=expiry_sweeper,
         )
 
     if invalidation is not None and not invalidation._initialized() and configuration is not None:
@@ -67,23 +101,158 @@ def memoize(method: Optional[Callable] = None, configuration: Optional[CacheConf
     if update_statuses is None:
         update_statuses = InMemoryLocks()
 
-    async def try_release(key: CacheKey, configuration_snapshot: CacheConfiguration) -> bool:
-        if update_statuses.is_being_updated(key):
-            return False
+    if refresh_scheduler is None:
+        refresh_scheduler = ImmediateRefreshScheduler()
+
+    profiled_call_attributes = {'method': getattr(method, '__qualname__', method.__name__)}
+
+    snapshot: Optional[Union[FrozenCacheConfiguration, LazyCacheConfiguration]] = None
+
+    def resolve_configuration(current: CacheConfiguration) -> CacheConfiguration:
+        nonlocal snapshot
+        if snapshot is None or not snapshot.is_up_to_date_with(current):
+            if current.version() is None:
+                # unversioned configuration is resolved on every call (reading only components the call uses)
+                snapshot = LazyCacheConfiguration(current)
+            else:
+                snapshot = FrozenCacheConfiguration.initialized_with(current)
+            track_released_keys(snapshot.key_extractor())
+        return snapshot
+
+    released_keys: Deque[CacheKey] = collections.deque()  # keys of collected instances (InstanceScopedKeyExtractor)
+    tracked_key_extractors: List[KeyExtractor] = []
+    last_key_extractor: Optional[KeyExtractor] = None
+
+    def track_released_keys(key_extractor: KeyExtractor) -> None:
+        nonlocal last_key_extractor
+        if key_extractor is last_key_extractor:
+            return  # unversioned configurations are resolved on every call
+        last_key_extractor = key_extractor
+        if isinstance(key_extractor, InstanceScopedKeyExtractor) and key_extractor not in tracked_key_extractors:
+            tracked_key_extractors.append(key_extractor)
+            key_extractor.add_release_listener(on_keys_released)
+
+    def on_keys_released(keys: List[CacheKey]) -> None:
+        # called by garbage collector, so releasing is only scheduled (or left for the next call if IO-loop is not
+        # running in current thread)
+        released_keys.extend(keys)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.call_soon(asyncio.ensure_future, release_collected())
+
+    async def release_collected() -> None:
+        if snapshot is None:
+            return
+        configuration_snapshot = snapshot
+        # popped one by one, as garbage collector may add keys meanwhile
+        keys = [released_keys.popleft() for _ in range(len(released_keys))]
+        await try_release(keys, configuration_snapshot)
+
+    async def try_release(keys: List[CacheKey], configuration_snapshot: CacheConfiguration,
+                          event: CacheEvent = CacheEvent.RELEASE) -> List[CacheKey]:
+        # keys being updated are skipped (their entries are about to be written); returns released keys
+        releasable = [key for key in keys if not update_statuses.is_being_updated(key)]
+        if not releasable:
+            return releasable
+        try:
+            await configuration_snapshot.storage().release_many(releasable)
+            configuration_snapshot.key_extractor().on_released(releasable)
+            eviction_strategy = configuration_snapshot.eviction_strategy()
+            metrics = configuration_snapshot.metrics_listener()
+            for key in releasable:
+                eviction_strategy.mark_released(key)
+                if expiry_sweeper is not None:
+                    expiry_sweeper.cancel(key)
+                if metrics is not None:
+                    metrics.on_event(event, key)
+            logger.debug('Released cache keys %s', releasable)
+            return releasable
+        except Exception as e:
+            logger.error('Failed to release cache keys %s: %s', releasable, e)
+            return []
+
+    def released_after(entry: CacheEntry, configuration_snapshot: CacheConfiguration) -> float:
+        # expired entry may still be served if its refresh fails (see stale_if_error)
+        stale_if_error = configuration_snapshot.stale_if_error()
+        if stale_if_error is None:
+            return entry.expires_after_timestamp
+        return entry.expires_after_timestamp + stale_if_error.total_seconds()
+
+    async def release_expired(keys: List[CacheKey]) -> None:
+        if snapshot is None or expiry_sweeper is None:
+            return
+        configuration_snapshot = snapshot
+        now = time.time()
+        expired = []
+        for key, entry in zip(keys, await configuration_snapshot.storage().get_many(keys)):
+            if entry is None:
+                # already released (e.g. invalidated)
+                configuration_snapshot.eviction_strategy().mark_released(key)
+                configuration_snapshot.key_extractor().on_released([key])
+            elif released_after(entry, configuration_snapshot) > now:
+                # written by another client of the storage
+                expiry_sweeper.schedule(key, released_after(entry, configuration_snapshot))
+            else:
+                expired.append(key)
+        released = await try_release(expired, configuration_snapshot, CacheEvent.EXPIRE)
+        if len(released) < len(expired):
+            # being updated (so rescheduled once written) or release failed - checked on next tick
+            for key in set(expired).difference(released):
+                expiry_sweeper.schedule(key, now)
+
+    if expiry_sweeper is not None and not expiry_sweeper._initialized():
+        expiry_sweeper._initialize(release_expired)
+
+    async def discard(key: CacheKey, configuration_snapshot: CacheConfiguration) -> None:
+        # entry not admitted by eviction strategy - previous one (if any) would be outdated
+        logger.debug('Entry not admitted to cache for key %s', key)
+        await configuration_snapshot.storage().release(key)
+        configuration_snapshot.eviction_strategy().mark_released(key)
+        configuration_snapshot.key_extractor().on_released([key])
+        if expiry_sweeper is not None:
+            expiry_sweeper.cancel(key)
+
+    def mark_written(key: CacheKey, entry: CacheEntry, configuration_snapshot: CacheConfiguration) -> None:
+        eviction_strategy = configuration_snapshot.eviction_strategy()
+        eviction_strategy.mark_written(key, entry)
+        configuration_snapshot.key_extractor().on_written(key)
+        if expiry_sweeper is not None:
+            expiry_sweeper.schedule(key, released_after(entry, configuration_snapshot))
+        to_release = eviction_strategy.next_batch_to_release()
+        if to_release:
+            asyncio.get_event_loop().call_soon(
+                asyncio.ensure_future,
+                try_release(to_release, configuration_snapshot)
+            )
+
+    async def cache_failure(key: CacheKey, exception: Union[Exception, CancelledError], failures: int,
+                            configuration_snapshot: CacheConfiguration) -> None:
         try:
-            await configuration_snapshot.storage().release(key)
-            configuration_snapshot.eviction_strategy().mark_released(key)
-            logger.debug('Released cache key %s', key)
-            return True
+            backoff = configuration_snapshot.failure_backoff().backoff(failures)
+            if backoff is None:
+                return
+            now = time.time()
+            expires_after = now + backoff.total_seconds()
+            failure_entry = CacheEntry(created=now, update_after=expires_after, expires_after=expires_after,
+                                       value=CachedFailure(exception, failures))
+            await configuration_snapshot.storage().offer(key, failure_entry)
+            mark_written(key, failure_entry, configuration_snapshot)
+            logger.debug('Cached failure #%s for key %s (for %s)', failures, key, backoff)
         except Exception as e:
-            logger.error('Failed to release cache key %s', key, e)
-            return False
+            logger.error('Failed to cache failure for key %s: %s', key, e)
 
     async def refresh(actual_entry: Optional[CacheEntry], key: CacheKey,
                       value_future_provider: Callable[[], asyncio.Future],
-                      configuration_snapshot: CacheConfiguration):
+                      configuration_snapshot: CacheConfiguration, failures: Optional[int] = 0,
+                      background: bool = False, call_span: Optional[Span] = None):
+        # failures of blocking refreshes are cached only if number of preceding failures is provided
+        metrics = configuration_snapshot.metrics_listener()
         if actual_entry is None and update_statuses.is_being_updated(key):
             logger.debug('As entry expired, waiting for results of concurrent refresh %s', key)
+            if metrics is not None:
+                metrics.on_event(CacheEvent.DOGPILE_WAIT, key)
             entry = await update_statuses.await_updated(key)
             if isinstance(entry, Exception):
                 raise CachedMethodFailedException('Concurrent refresh failed to complete') from entry
@@ -94,75 +263,210 @@ def memoize(method: Optional[Callable] = None, configuration: Optional[CacheConf
             return actual_entry
         elif not update_statuses.is_being_updated(key):
             update_statuses.mark_being_updated(key)
+            if metrics is not None:
+                metrics.on_event(CacheEvent.BACKGROUND_REFRESH if background else CacheEvent.BLOCKING_REFRESH, key)
             try:
-                value_future = value_future_provider()
-                value = await value_future
+                started = time.perf_counter()
+                try:
+                    value_future = value_future_provider()
+                    value = await value_future
+                finally:
+                    # observed whether method returned, failed or timed out
+                    computation_time = time.perf_counter() - started
+                    if metrics is not None:
+                        metrics.on_latency(Latency.METHOD, computation_time)
+                    if call_span is not None:
+                        call_span.record(Stage.METHOD, computation_time)
                 offered_entry = configuration_snapshot.entry_builder().build(key, value)
-                await configuration_snapshot.storage().offer(key, offered_entry)
+                offered_entry.computation_time = computation_time
+                admitted = configuration_snapshot.eviction_strategy().admits(key, offered_entry)
+                if not admitted:
+                    await discard(key, configuration_snapshot)
+                elif metrics is None and call_span is None:
+                    await configuration_snapshot.storage().offer(key, offered_entry)
+                else:
+                    offer_started = time.perf_counter()
+                    await configuration_snapshot.storage().offer(key, offered_entry)
+                    offer_duration = time.perf_counter() - offer_started
+                    if metrics is not None:
+                        metrics.on_latency(Latency.STORAGE_OFFER, offer_duration)
+                    if call_span is not None:
+                        call_span.record(Stage.STORAGE_OFFER, offer_duration)
                 update_statuses.mark_updated(key, offered_entry)
                 logger.debug('Successfully refreshed cache for key %s', key)
 
-                eviction_strategy = configuration_snapshot.eviction_strategy()
-                eviction_strategy.mark_written(key, offered_entry)
-                to_release = eviction_strategy.next_to_release()
-                if to_release is not None:
-                    asyncio.get_event_loop().call_soon(
-                        asyncio.ensure_future,
-                        try_release(to_release, configuration_snapshot)
-                    )
+                if admitted:
+                    mark_written(key, offered_entry, configuration_snapshot)
 
                 return offered_entry
             except asyncio.TimeoutError as e:
                 logger.debug('Timeout for %s: %s', key, e)
-                update_statuses.mark_update_aborted(key, e)
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.FAILURE, key)
+                try:
+                    if actual_entry is None and failures is not None:
+                        await cache_failure(key, e, failures + 1, configuration_snapshot)
+                finally:
+                    update_statuses.mark_update_aborted(key, e)
                 raise CachedMethodFailedException('Refresh timed out') from e
             except (Exception, CancelledError) as e:
                 logger.debug('Error while refreshing cache for %s: %s', key, e)
-                update_statuses.mark_update_aborted(key, e)
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.FAILURE, key)
+                try:
+                    if actual_entry is None and failures is not None:
+                        await cache_failure(key, e, failures + 1, configuration_snapshot)
+                finally:
+                    update_statuses.mark_update_aborted(key, e)
                 raise CachedMethodFailedException('Refresh failed to complete') from e
 
+    def on_refresh_left_in_background(key: CacheKey, refresh_task: asyncio.Future) -> None:
+        if not refresh_task.cancelled() and refresh_task.exception() is not None:
+            logger.debug('Refresh left in background failed for key %s: %s', key, refresh_task.exception())
+
+    async def refresh_expired(expired_entry: CacheEntry, key: CacheKey,
+                              value_future_provider: Callable[[], asyncio.Future],
+                              configuration_snapshot: CacheConfiguration, now: float,
+                              call_span: Optional[Span]) -> CacheEntry:
+        stale_if_error = configuration_snapshot.stale_if_error()
+        stale_on_error = stale_if_error is not None and \
+            expired_entry.expires_after_timestamp + stale_if_error.total_seconds() > now
+        max_blocking_wait = configuration_snapshot.max_blocking_wait()
+        try:
+            if max_blocking_wait is None:
+                return await refresh(None, key, value_future_provider, configuration_snapshot,
+                                     None if stale_on_error else 0, call_span=call_span)
+
+            # stages are recorded aside and attached to the call only if it waits for the refresh
+            refresh_span = Span(Stage.CALL) if call_span is not None else None
+            refresh_task = asyncio.ensure_future(refresh(None, key, value_future_provider, configuration_snapshot,
+                                                         None if stale_on_error else 0, call_span=refresh_span))
+            done, _ = await asyncio.wait({refresh_task}, timeout=max_blocking_wait.total_seconds())
+            if refresh_task in done:
+                if call_span is not None and refresh_span is not None:
+                    call_span.children.extend(refresh_span.children)
+                return refresh_task.result()
+            logger.debug('Max blocking wait exceeded - stale entry returned (update continues in background) '
+                         'for key %s', key)
+            refresh_task.add_done_callback(functools.partial(on_refresh_left_in_background, key))
+        except CachedMethodFailedException as e:
+            if not stale_on_error:
+                raise
+            logger.debug('Refresh failed - stale entry returned (update scheduled) for key %s: %s', key, e)
+            refresh_scheduler.schedule(
+                key,
+                functools.partial(refresh, expired_entry, key, value_future_provider, configuration_snapshot,
+                                  background=True)
+            )
+        metrics = configuration_snapshot.metrics_listener()
+        if metrics is not None:
+            metrics.on_event(CacheEvent.STALE_SERVED, key)
+        return expired_entry
+
     @functools.wraps(method)
     async def wrapper(*args, **kwargs):
-        if configuration is None or not configuration.configured():
+        if configuration is None:
             raise NotConfiguredCacheCalledException()
 
-        configuration_snapshot = MutableCacheConfiguration.initialized_with(configuration)
-
-        force_refresh = kwargs.pop('force_refresh_memoized', False)
-        key = configuration_snapshot.key_extractor().format_key(method, args, kwargs)
-
-        current_entry: Optional[CacheEntry] = await configuration_snapshot.storage().get(key)
-        if current_entry is not None:
-            configuration_snapshot.eviction_strategy().mark_read(key)
-
-        now = datetime.datetime.now(datetime.timezone.utc)
-
-        def value_future_provider() -> Future:
-            # applying timeout to the method call
-            return asyncio.ensure_future(asyncio.wait_for(
-                method(*args, **kwargs),
-                configuration_snapshot.method_timeout().total_seconds()
-            ))
-
-        if current_entry is None:
-            logger.debug('Creating (blocking) entry for key %s', key)
-            result = await refresh(current_entry, key, value_future_provider, configuration_snapshot)
-        elif force_refresh:
-            logger.debug('Forced entry update (blocking) for key %s', key)
-            result = await refresh(current_entry, key, value_future_provider, configuration_snapshot)
-        elif current_entry.expires_after <= now:
-            logger.debug('Entry expiration reached - entry update (blocking) for key %s', key)
-            result = await refresh(None, key, value_future_provider, configuration_snapshot)
-        elif current_entry.update_after <= now:
-            logger.debug('Entry update point expired - entry update (async - current entry returned) for key %s', key)
-            asyncio.get_event_loop().call_soon(
-                asyncio.ensure_future,
-                refresh(current_entry, key, value_future_provider, configuration_snapshot)
-            )
-            result = current_entry
-        else:
-            result = current_entry
+        configuration_snapshot = resolve_configuration(configuration)
+        if not configuration_snapshot.configured():
+            raise NotConfiguredCacheCalledException()
+        if released_keys:
+            await release_collected()
+
+        profiler = configuration_snapshot.profiler()
+        call_span = profiler.start(profiled_call_attributes) if profiler is not None else None
+        try:
+            force_refresh = kwargs.pop('force_refresh_memoized', False)
+            if call_span is None:
+                key = configuration_snapshot.key_extractor().format_key(method, args, kwargs)
+            else:
+                with call_span.child(Stage.KEY_EXTRACTION):
+                    key = configuration_snapshot.key_extractor().format_key(method, args, kwargs)
+
+            metrics = configuration_snapshot.metrics_listener()
+            current_entry: Optional[CacheEntry]
+            if metrics is None and call_span is None:
+                current_entry = await configuration_snapshot.storage().get(key)
+            else:
+                get_started = time.perf_counter()
+                current_entry = await configuration_snapshot.storage().get(key)
+                get_duration = time.perf_counter() - get_started
+                if metrics is not None:
+                    metrics.on_latency(Latency.STORAGE_GET, get_duration)
+                if call_span is not None:
+                    call_span.record(Stage.STORAGE_GET, get_duration)
+            if current_entry is not None:
+                configuration_snapshot.eviction_strategy().mark_read(key)
+
+            now = time.time()
+            early_refresh_beta = configuration_snapshot.early_refresh_beta()
+
+            failures = 0
+            if current_entry is not None and isinstance(current_entry.value, CachedFailure):
+                if current_entry.expires_after_timestamp > now and not force_refresh:
+                    if metrics is not None:
+                        metrics.on_event(CacheEvent.FAILURE, key)
+                    raise CachedMethodFailedException('Refresh failed recently (failure served from cache)') \
+                        from current_entry.value.exception
+                failures = current_entry.value.failures
+                current_entry = None
+
+            def value_future_provider() -> Future:
+                if coalescing is not None:
+                    return coalescing.load(key, args, kwargs,
+                                           configuration_snapshot.method_timeout().total_seconds())
+                # applying timeout to the method call
+                return asyncio.ensure_future(asyncio.wait_for(
+                    method(*args, **kwargs),
+                    configuration_snapshot.method_timeout().total_seconds()
+                ))
+
+            if current_entry is None:
+                logger.debug('Creating (blocking) entry for key %s', key)
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.MISS, key)
+                result = await refresh(current_entry, key, value_future_provider, configuration_snapshot, failures,
+                                       call_span=call_span)
+            elif force_refresh:
+                logger.debug('Forced entry update (blocking) for key %s', key)
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.MISS, key)
+                result = await refresh(current_entry, key, value_future_provider, configuration_snapshot,
+                                       call_span=call_span)
+            elif current_entry.expires_after_timestamp <= now:
+                logger.debug('Entry expiration reached - entry update (blocking) for key %s', key)
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.MISS, key)
+                result = await refresh_expired(current_entry, key, value_future_provider, configuration_snapshot,
+                                               now, call_span)
+            elif current_entry.update_after_timestamp <= now or (
+                    early_refresh_beta > 0 and early_refresh_due(current_entry, now, early_refresh_beta)):
+                logger.debug('Entry update point expired - entry update (async - current entry returned) '
+                             'for key %s', key)
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.HIT, key)
+                refresh_scheduler.schedule(
+                    key,
+                    functools.partial(refresh, current_entry, key, value_future_provider, configuration_snapshot,
+                                      background=True)
+                )
+                result = current_entry
+            else:
+                if metrics is not None:
+                    metrics.on_event(CacheEvent.HIT, key)
+                result = current_entry
 
-        return configuration_snapshot.postprocessing().apply(result.value)
+            if call_span is None:
+                return configuration_snapshot.postprocessing().apply(result.value)
+            with call_span.child(Stage.POSTPROCESSING):
+                return configuration_snapshot.postprocessing().apply(result.value)
+        except BaseException as e:
+            if call_span is not None:
+                call_span.error = e
+            raise
+        finally:
+            if profiler is not None and call_span is not None:
+                profiler.finish(call_span)
 
     return wrapper
@@ -0,0 +1,245 @@
+import asyncio
+import gc
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from memoize.batch import memoize_batch
+from memoize.configuration import MutableCacheConfiguration, DefaultInMemoryCacheConfiguration
+from memoize.eviction import LeastRecentlyUpdatedEvictionStrategy
+from memoize.exceptions import CachedMethodFailedException
+from memoize.invalidation import InvalidationSupport
+from memoize.key import InstanceScopedKeyExtractor
+from memoize.metrics import InMemoryMetrics, Latency
+from memoize.storage import LocalInMemoryCacheStorage
+from tests import _ensure_background_tasks_finished
+
+
+@pytest.mark.asyncio(scope="class")
+class TestBatchWrapper:
+
+    async def test_should_request_only_missing_ids(self):
+        # given
+        requested = []
+
+        @memoize_batch(configuration=DefaultInMemoryCacheConfiguration())
+        async def get_values(ids):
+            requested.append(list(ids))
+            return {i: 'value-{}'.format(i) for i in ids}
+
+        # when
+        res1 = await get_values([1, 2])
+        res2 = await get_values([2, 1, 3])
+
+        # then
+        assert {1: 'value-1', 2: 'value-2'} == res1
+        assert {1: 'value-1', 2: 'value-2', 3: 'value-3'} == res2
+        assert [[1, 2], [3]] == requested
+
+    async def test_should_not_call_method_when_all_ids_cached(self):
+        # given
+        requested = []
+
+        @memoize_batch(configuration=DefaultInMemoryCacheConfiguration())
+        async def get_values(ids):
+            requested.append(list(ids))
+            return {i: i for i in ids}
+
+        # when
+        await get_values([1, 2, 3])
+        res = await get_values([3, 1])
+
+        # then
+        assert {3: 3, 1: 1} == res
+        assert [[1, 2, 3]] == requested
+
+    async def test_should_use_single_multi_get(self):
+        # given
+        storage = LocalInMemoryCacheStorage()
+        storage.get = Mock(wraps=storage.get)
+        storage.get_many = Mock(wraps=storage.get_many)
+
+        @memoize_batch(configuration=MutableCacheConfiguration
+                       .initialized_with(DefaultInMemoryCacheConfiguration())
+                       .set_storage(storage))
+        async def get_values(ids):
+            return {i: i for i in ids}
+
+        # when
+        await get_values([1, 2, 3])
+
+        # then
+        storage.get_many.assert_called_once()
+        storage.get.assert_not_called()
+
+    async def test_should_skip_ids_absent_in_results(self):
+        # given
+        requested = []
+
+        @memoize_batch(configuration=DefaultInMemoryCacheConfiguration())
+        async def get_values(ids):
+            requested.append(list(ids))
+            return {i: i for i in ids if i != 2}
+
+        # when
+        res1 = await get_values([1, 2])
+        res2 = await get_values([1, 2])
+
+        # then
+        assert {1: 1} == res1
+        assert {1: 1} == res2
+        assert [[1, 2], [2]] == requested
+
+    async def test_should_request_concurrently_missing_ids_once(self):
+        # given
+        requested = []
+
+        @memoize_batch(configuration=DefaultInMemoryCacheConfiguration())
+        async def get_values(ids):
+            requested.append(list(ids))
+            await asyncio.sleep(0.05)
+            return {i: i for i in ids}
+
+        # when
+        res1, res2 = await asyncio.gather(get_values([1, 2]), get_values([2, 3]))
+
+        # then
+        assert {1: 1, 2: 2} == res1
+        assert {2: 2, 3: 3} == res2
+        assert [[1, 2], [3]] == requested
+
+    async def test_should_pass_other_arguments_and_skip_self(self):
+        # given
+        class Repository:
+            @memoize_batch(configuration=DefaultInMemoryCacheConfiguration(), ids_position=1)
+            async def get_values(self, ids, prefix):
+                return {i: prefix + str(i) for i in ids}
+
+        repository = Repository()
+
+        # when
+        res1 = await repository.get_values([1, 2], prefix='a-')
+        res2 = await repository.get_values([1, 2], prefix='b-')
+
+        # then
+        assert {1: 'a-1', 2: 'a-2'} == res1
+        assert {1: 'b-1', 2: 'b-2'} == res2
+
+    async def test_should_refresh_expired_ids(self):
+        # given
+        value = 'a'
+
+        @memoize_batch(configuration=DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=50),
+                                                                       expire_after=timedelta(milliseconds=100)))
+        async def get_values(ids):
+            return {i: value for i in ids}
+
+        # when
+        res1 = await get_values([1])
+        await asyncio.sleep(0.150)
+        value = 'b'
+        res2 = await get_values([1])
+
+        # then
+        assert {1: 'a'} == res1
+        assert {1: 'b'} == res2
+
+    async def test_should_refresh_in_background_on_update_time_reached(self):
+        # given
+        value = 'a'
+
+        @memoize_batch(configuration=DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=50),
+                                                                       expire_after=timedelta(minutes=5)))
+        async def get_values(ids):
+            return {i: value for i in ids}
+
+        # when
+        res1 = await get_values([1])
+        await asyncio.sleep(0.100)
+        value = 'b'
+        res2 = await get_values([1])
+        await _ensure_background_tasks_finished()
+        res3 = await get_values([1])
+
+        # then
+        assert {1: 'a'} == res1
+        assert {1: 'a'} == res2
+        assert {1: 'b'} == res3
+
+    async def test_should_throw_exception_on_wrapped_method_failure(self):
+        # given
+        @memoize_batch(configuration=DefaultInMemoryCacheConfiguration())
+        async def get_values(ids):
+            raise ValueError('Get lost')
+
+        # when/then
+        with pytest.raises(CachedMethodFailedException) as context:
+            await get_values([1, 2])
+        assert str(context.value.__cause__) == 'Get lost'
+
+    async def test_should_report_method_latency_of_failed_calls(self):
+        # given
+        metrics = InMemoryMetrics()
+
+        @memoize_batch(configuration=MutableCacheConfiguration
+                       .initialized_with(DefaultInMemoryCacheConfiguration())
+                       .set_metrics_listener(metrics))
+        async def get_values(ids):
+            raise ValueError('Get lost')
+
+        # when
+        with pytest.raises(CachedMethodFailedException):
+            await get_values([1, 2])
+
+        # then
+        assert metrics.latencies[Latency.METHOD].count == 1
+
+    async def test_should_invalidate_single_id(self):
+        # given
+        requested = []
+        invalidation = InvalidationSupport()
+
+        @memoize_batch(configuration=DefaultInMemoryCacheConfiguration(), invalidation=invalidation)
+        async def get_values(ids):
+            requested.append(list(ids))
+            return {i: i for i in ids}
+
+        # when
+        await get_values([1, 2])
+        await invalidation.invalidate_for_arguments((2,), {})
+        await get_values([1, 2])
+
+        # then
+        assert [[1, 2], [2]] == requested
+
+    async def test_should_release_entries_of_collected_instance(self):
+        # given
+        storage = LocalInMemoryCacheStorage()
+        eviction_strategy = LeastRecentlyUpdatedEvictionStrategy()
+
+        class Client:
+            @memoize_batch(configuration=MutableCacheConfiguration
+                           .initialized_with(DefaultInMemoryCacheConfiguration())
+                           .set_storage(storage)
+                           .set_eviction_strategy(eviction_strategy)
+                           .set_key_extractor(InstanceScopedKeyExtractor()),
+                           ids_position=1)
+            async def get_values(self, ids):
+                return {i: i for i in ids}
+
+        client, other_client = Client(), Client()
+
+        # when
+        await client.get_values([1, 2])
+        await other_client.get_values([1])
+        entries_before = len(storage._data)
+        del client
+        gc.collect()
+        await _ensure_background_tasks_finished()
+
+        # then
+        assert 3 == entries_before
+        assert 1 == len(storage._data)
+        assert 1 == len(eviction_strategy._data)
+        assert {1: 1} == await other_client.get_values([1])
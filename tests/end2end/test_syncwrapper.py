@@ -0,0 +1,259 @@
+import asyncio
+import gc
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from memoize.configuration import MutableCacheConfiguration, DefaultInMemoryCacheConfiguration, \
+    NotConfiguredCacheCalledException
+from memoize.eviction import LeastRecentlyUpdatedEvictionStrategy
+from memoize.exceptions import CachedMethodFailedException
+from memoize.key import InstanceScopedKeyExtractor
+from memoize.statuses import ThreadLocks
+from memoize.storage import CacheStorage, LocalInMemoryCacheStorage
+from memoize.syncwrapper import memoize_sync
+
+
+class TestSyncWrapper:
+
+    def test_should_return_cached_value_on_expiration_time_not_reached(self):
+        # given
+        value = 0
+
+        @memoize_sync(configuration=DefaultInMemoryCacheConfiguration(update_after=timedelta(minutes=1),
+                                                                      expire_after=timedelta(minutes=2)))
+        def get_value(arg, kwarg=None):
+            return value
+
+        # when
+        res1 = get_value('test', kwarg='args')
+        value = 1
+        res2 = get_value('test', kwarg='args')
+
+        # then
+        assert 0 == res1
+        assert 0 == res2
+
+    def test_should_return_updated_value_on_expiration_time_reached(self):
+        # given
+        value = 0
+
+        @memoize_sync(configuration=DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=50),
+                                                                      expire_after=timedelta(milliseconds=100)))
+        def get_value(arg, kwarg=None):
+            return value
+
+        # when
+        res1 = get_value('test', kwarg='args')
+        time.sleep(.200)
+        value = 1
+        res2 = get_value('test', kwarg='args')
+
+        # then
+        assert 0 == res1
+        assert 1 == res2
+
+    def test_should_refresh_in_background_on_update_time_reached(self):
+        # given
+        value = 0
+        refreshed = threading.Event()
+
+        @memoize_sync(configuration=DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=50),
+                                                                      expire_after=timedelta(minutes=5)))
+        def get_value(arg, kwarg=None):
+            if value == 1:
+                refreshed.set()
+            return value
+
+        # when
+        res1 = get_value('test', kwarg='args')
+        time.sleep(.100)
+        value = 1
+        res2 = get_value('test', kwarg='args')
+        refreshed.wait(timeout=1)
+        time.sleep(.050)
+        res3 = get_value('test', kwarg='args')
+
+        # then
+        assert 0 == res1
+        assert 0 == res2
+        assert 1 == res3
+
+    def test_should_compute_value_once_for_concurrent_threads(self):
+        # given
+        calls = 0
+        calls_lock = threading.Lock()
+
+        @memoize_sync(configuration=DefaultInMemoryCacheConfiguration())
+        def get_value(arg):
+            nonlocal calls
+            with calls_lock:
+                calls += 1
+            time.sleep(.100)
+            return arg
+
+        # when
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: get_value('test'), range(8)))
+
+        # then
+        assert ['test'] * 8 == results
+        assert 1 == calls
+
+    def test_should_throw_exception_on_wrapped_method_failure(self):
+        # given
+        @memoize_sync(configuration=DefaultInMemoryCacheConfiguration())
+        def get_value(arg):
+            raise ValueError('Get lost')
+
+        # when/then
+        with pytest.raises(CachedMethodFailedException) as context:
+            get_value('test')
+        assert str(context.value.__cause__) == 'Get lost'
+
+    def test_should_release_key_when_wrapped_method_is_interrupted(self):
+        # given
+        interrupt = True
+
+        @memoize_sync(configuration=DefaultInMemoryCacheConfiguration(),
+                      update_statuses=ThreadLocks(update_lock_timeout=timedelta(seconds=2)))
+        def get_value(arg):
+            if interrupt:
+                raise KeyboardInterrupt()
+            return arg
+
+        # when
+        with pytest.raises(KeyboardInterrupt):
+            get_value('test')
+        interrupt = False
+        started = time.monotonic()
+        result = get_value('test')
+
+        # then
+        assert 'test' == result
+        assert time.monotonic() - started < 1
+
+    def test_should_refresh_on_force_refresh_flag(self):
+        # given
+        value = 0
+
+        @memoize_sync(configuration=DefaultInMemoryCacheConfiguration())
+        def get_value(arg):
+            return value
+
+        # when
+        res1 = get_value('test')
+        value = 1
+        res2 = get_value('test', force_refresh_memoized=True)
+
+        # then
+        assert 0 == res1
+        assert 1 == res2
+
+    def test_should_release_entries_pointed_by_eviction_strategy(self):
+        # given
+        eviction_strategy = Mock()
+        eviction_strategy.next_batch_to_release = Mock(return_value=["('a',)"])
+        configuration = MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration())
+
+        @memoize_sync(configuration=configuration.set_eviction_strategy(eviction_strategy))
+        def get_value(arg):
+            return arg
+
+        # when
+        get_value('b')
+
+        # then
+        eviction_strategy.mark_released.assert_called_once_with("('a',)")
+
+    def test_should_raise_exception_on_configuration_not_ready(self):
+        # given
+        @memoize_sync(configuration=MutableCacheConfiguration
+                      .initialized_with(DefaultInMemoryCacheConfiguration())
+                      .set_configured(False))
+        def get_value(arg):
+            return arg
+
+        # when/then
+        with pytest.raises(NotConfiguredCacheCalledException):
+            get_value('test')
+
+    def test_should_reject_storage_awaiting_io(self):
+        # given
+        class RemoteStorage(CacheStorage):
+            async def get(self, key):
+                await asyncio.sleep(0.01)
+                return None
+
+            async def offer(self, key, entry):
+                pass
+
+            async def release(self, key):
+                pass
+
+        @memoize_sync(configuration=MutableCacheConfiguration
+                      .initialized_with(DefaultInMemoryCacheConfiguration())
+                      .set_storage(RemoteStorage()))
+        def get_value(arg):
+            return arg
+
+        # when/then
+        with pytest.raises(RuntimeError):
+            get_value('test')
+
+    def test_should_return_stale_entry_on_refresh_failure_within_stale_if_error(self):
+        # given
+        fail = False
+
+        @memoize_sync(configuration=MutableCacheConfiguration
+                      .initialized_with(DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=50),
+                                                                          expire_after=timedelta(milliseconds=50)))
+                      .set_stale_if_error(timedelta(minutes=1)))
+        def get_value(arg):
+            if fail:
+                raise ValueError('backend down')
+            return arg
+
+        # when
+        res1 = get_value('test')
+        time.sleep(0.1)
+        fail = True
+        res2 = get_value('test')
+
+        # then
+        assert 'test' == res1
+        assert 'test' == res2
+
+    def test_should_release_entries_of_collected_instance_on_next_call(self):
+        # given
+        storage = LocalInMemoryCacheStorage()
+        eviction_strategy = LeastRecentlyUpdatedEvictionStrategy()
+
+        class Client:
+            @memoize_sync(configuration=MutableCacheConfiguration
+                          .initialized_with(DefaultInMemoryCacheConfiguration())
+                          .set_storage(storage)
+                          .set_eviction_strategy(eviction_strategy)
+                          .set_key_extractor(InstanceScopedKeyExtractor()))
+            def get_value(self, arg):
+                return arg
+
+        client, other_client = Client(), Client()
+
+        # when
+        client.get_value('test')
+        other_client.get_value('test')
+        entries_before = len(storage._data)
+        del client
+        gc.collect()
+        res = other_client.get_value('test')
+
+        # then
+        assert 2 == entries_before
+        assert 1 == len(storage._data)
+        assert 1 == len(eviction_strategy._data)
+        assert 'test' == res
@@ -1,8 +1,9 @@
 import asyncio
+import gc
 import time
 from asyncio import CancelledError
 from datetime import timedelta
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 import pytest
 
@@ -10,6 +11,7 @@ from memoize.configuration import MutableCacheConfiguration, NotConfiguredCacheC
     DefaultInMemoryCacheConfiguration
 from memoize.eviction import LeastRecentlyUpdatedEvictionStrategy
 from memoize.exceptions import CachedMethodFailedException
+from memoize.key import InstanceScopedKeyExtractor
 from memoize.storage import LocalInMemoryCacheStorage
 from memoize.wrapper import memoize
 from tests import _ensure_background_tasks_finished
@@ -351,3 +353,210 @@ class TestWrapper:
     @staticmethod
     async def _call_thrice(call):
         return await asyncio.gather(call(), call(), call())
+
+    async def test_should_record_computation_time_of_entry(self):
+        # given
+        storage = LocalInMemoryCacheStorage()
+
+        @memoize(configuration=MutableCacheConfiguration
+                 .initialized_with(DefaultInMemoryCacheConfiguration())
+                 .set_storage(storage))
+        async def get_value(arg):
+            await asyncio.sleep(0.05)
+            return arg
+
+        # when
+        await get_value('test')
+
+        # then
+        entry, = storage._data.values()
+        assert entry.computation_time >= 0.05
+
+    async def test_should_refresh_early_on_early_refresh_beta_set(self):
+        # given
+        calls = 0
+
+        @memoize(configuration=MutableCacheConfiguration
+                 .initialized_with(DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=300),
+                                                                     expire_after=timedelta(minutes=1)))
+                 .set_early_refresh_beta(1000.0))
+        async def get_value(arg):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        # when
+        with patch('memoize.entry.random.random', return_value=0.5):
+            res1 = await get_value('test')
+            res2 = await get_value('test')
+            await asyncio.sleep(0.05)
+            res3 = await get_value('test')
+
+        # then
+        assert 1 == res1
+        assert 1 == res2
+        assert 2 == res3
+
+    async def test_should_return_stale_entry_on_refresh_failure_within_stale_if_error(self):
+        # given
+        fail = False
+        calls = 0
+
+        @memoize(configuration=MutableCacheConfiguration
+                 .initialized_with(DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=50),
+                                                                     expire_after=timedelta(milliseconds=50)))
+                 .set_stale_if_error(timedelta(minutes=1)))
+        async def get_value(arg):
+            nonlocal calls
+            calls += 1
+            if fail:
+                raise ValueError('backend down')
+            return calls
+
+        # when
+        res1 = await get_value('test')
+        await asyncio.sleep(0.1)
+        fail = True
+        res2 = await get_value('test')
+        await _ensure_background_tasks_finished()
+        fail = False
+        await _ensure_background_tasks_finished()
+        res3 = await get_value('test')
+
+        # then
+        assert 1 == res1
+        assert 1 == res2
+        # initial call, failed blocking refresh, failed background retry, successful blocking refresh
+        assert 4 == calls
+        assert 4 == res3
+
+    async def test_should_fail_on_refresh_failure_after_stale_if_error(self):
+        # given
+        fail = False
+
+        @memoize(configuration=MutableCacheConfiguration
+                 .initialized_with(DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=50),
+                                                                     expire_after=timedelta(milliseconds=50)))
+                 .set_stale_if_error(timedelta(milliseconds=50)))
+        async def get_value(arg):
+            if fail:
+                raise ValueError('backend down')
+            return arg
+
+        # when
+        await get_value('test')
+        await asyncio.sleep(0.15)
+        fail = True
+
+        # then
+        with pytest.raises(CachedMethodFailedException):
+            await get_value('test')
+
+    async def test_should_return_stale_entry_on_max_blocking_wait_exceeded(self):
+        # given
+        delay = 0
+        calls = 0
+
+        @memoize(configuration=MutableCacheConfiguration
+                 .initialized_with(DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=50),
+                                                                     expire_after=timedelta(milliseconds=50)))
+                 .set_max_blocking_wait(timedelta(milliseconds=20)))
+        async def get_value(arg):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(delay)
+            return calls
+
+        # when
+        res1 = await get_value('test')
+        await asyncio.sleep(0.1)
+        delay = 0.1
+        start = time.monotonic()
+        res2 = await get_value('test')
+        blocked_for = time.monotonic() - start
+        await asyncio.sleep(0.15)
+        res3 = await get_value('test')
+
+        # then
+        assert 1 == res1
+        assert 1 == res2
+        assert blocked_for < 0.1
+        assert 2 == res3
+
+    async def test_should_return_refreshed_entry_on_max_blocking_wait_not_exceeded(self):
+        # given
+        calls = 0
+
+        @memoize(configuration=MutableCacheConfiguration
+                 .initialized_with(DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=50),
+                                                                     expire_after=timedelta(milliseconds=50)))
+                 .set_max_blocking_wait(timedelta(seconds=1)))
+        async def get_value(arg):
+            nonlocal calls
+            calls += 1
+            return calls
+
+        # when
+        res1 = await get_value('test')
+        await asyncio.sleep(0.1)
+        res2 = await get_value('test')
+
+        # then
+        assert 1 == res1
+        assert 2 == res2
+
+    async def test_should_release_entries_of_collected_instance(self):
+        # given
+        storage = LocalInMemoryCacheStorage()
+        eviction_strategy = LeastRecentlyUpdatedEvictionStrategy()
+
+        class Client:
+            @memoize(configuration=MutableCacheConfiguration
+                     .initialized_with(DefaultInMemoryCacheConfiguration())
+                     .set_storage(storage)
+                     .set_eviction_strategy(eviction_strategy)
+                     .set_key_extractor(InstanceScopedKeyExtractor()))
+            async def get_value(self, arg):
+                return arg
+
+        client, other_client = Client(), Client()
+
+        # when
+        res1 = await client.get_value('test')
+        res2 = await client.get_value('other')
+        res3 = await other_client.get_value('test')
+        await _ensure_background_tasks_finished()
+        entries_before = len(storage._data)
+        del client
+        gc.collect()
+        await _ensure_background_tasks_finished()
+
+        # then
+        assert ('test', 'other', 'test') == (res1, res2, res3)
+        assert 3 == entries_before
+        assert 1 == len(storage._data)
+        assert 1 == len(eviction_strategy._data)
+        assert 'test' == await other_client.get_value('test')
+
+    async def test_should_track_keys_of_instance_only_while_stored(self):
+        # given
+        key_extractor = InstanceScopedKeyExtractor()
+
+        class Client:
+            @memoize(configuration=MutableCacheConfiguration
+                     .initialized_with(DefaultInMemoryCacheConfiguration())
+                     .set_eviction_strategy(LeastRecentlyUpdatedEvictionStrategy(capacity=10))
+                     .set_key_extractor(key_extractor))
+            async def get_value(self, arg):
+                return arg
+
+        client = Client()
+
+        # when
+        for arg in range(100):
+            await client.get_value(arg)
+        await _ensure_background_tasks_finished()
+
+        # then
+        assert 10 == sum(len(keys) for keys in key_extractor._keys.values())
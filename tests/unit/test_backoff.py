@@ -0,0 +1,191 @@
+import asyncio
+from datetime import timedelta
+from typing import Optional
+
+import pytest
+
+from memoize.backoff import ExponentialFailureBackoff, NoFailureBackoff, CachedFailure, FailureBackoff
+from memoize.configuration import DefaultInMemoryCacheConfiguration, MutableCacheConfiguration
+from memoize.exceptions import CachedMethodFailedException
+from memoize.statuses import ThreadLocks
+from memoize.syncwrapper import memoize_sync
+from memoize.wrapper import memoize
+
+
+class TestExponentialFailureBackoff:
+
+    def test_should_grow_exponentially_up_to_maximum(self):
+        # given
+        backoff = ExponentialFailureBackoff(initial=timedelta(seconds=1), maximum=timedelta(seconds=10))
+
+        # when
+        backoffs = [backoff.backoff(failures) for failures in range(1, 7)]
+
+        # then
+        assert backoffs == [timedelta(seconds=1), timedelta(seconds=2), timedelta(seconds=4), timedelta(seconds=8),
+                            timedelta(seconds=10), timedelta(seconds=10)]
+
+    def test_should_not_overflow_for_huge_number_of_failures(self):
+        # given
+        backoff = ExponentialFailureBackoff(maximum=timedelta(minutes=5))
+
+        # when
+        result = backoff.backoff(10 ** 6)
+
+        # then
+        assert result == timedelta(minutes=5)
+
+    def test_no_backoff_should_not_cache_failures(self):
+        assert NoFailureBackoff().backoff(1) is None
+
+
+def _configuration(backoff):
+    return MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration()) \
+        .set_failure_backoff(backoff)
+
+
+@pytest.mark.asyncio(scope="class")
+class TestNegativeCaching:
+
+    async def test_should_serve_failure_from_cache_until_backoff_passes(self):
+        # given
+        configuration = _configuration(ExponentialFailureBackoff(initial=timedelta(minutes=1)))
+        calls = []
+
+        @memoize(configuration=configuration)
+        async def get_value(arg):
+            calls.append(arg)
+            raise ValueError('backend down')
+
+        # when
+        with pytest.raises(CachedMethodFailedException) as first:
+            await get_value('test')
+        with pytest.raises(CachedMethodFailedException) as second:
+            await get_value('test')
+
+        # then
+        assert calls == ['test']
+        assert isinstance(first.value.__cause__, ValueError)
+        assert second.value.__cause__ is first.value.__cause__
+
+    async def test_should_retry_after_backoff_and_count_consecutive_failures(self):
+        # given
+        configuration = _configuration(ExponentialFailureBackoff(initial=timedelta(milliseconds=-1)))
+        calls = []
+
+        @memoize(configuration=configuration)
+        async def get_value(arg):
+            calls.append(arg)
+            raise ValueError('backend down')
+
+        # when
+        for _ in range(3):
+            with pytest.raises(CachedMethodFailedException):
+                await get_value('test')
+        key = configuration.key_extractor().format_key(get_value.__wrapped__, ('test',), {})
+        entry = await configuration.storage().get(key)
+
+        # then
+        assert calls == ['test', 'test', 'test']
+        assert isinstance(entry.value, CachedFailure)
+        assert entry.value.failures == 3
+
+    async def test_should_replace_cached_failure_with_value_on_forced_refresh(self):
+        # given
+        configuration = _configuration(ExponentialFailureBackoff(initial=timedelta(minutes=1)))
+        fail = True
+
+        @memoize(configuration=configuration)
+        async def get_value(arg):
+            if fail:
+                raise ValueError('backend down')
+            return arg
+
+        # when
+        with pytest.raises(CachedMethodFailedException):
+            await get_value('test')
+        fail = False
+        forced = await get_value('test', force_refresh_memoized=True)
+        cached = await get_value('test')
+
+        # then
+        assert forced == 'test'
+        assert cached == 'test'
+
+    async def test_should_not_cache_failures_by_default(self):
+        # given
+        calls = []
+
+        @memoize(configuration=DefaultInMemoryCacheConfiguration())
+        async def get_value(arg):
+            calls.append(arg)
+            raise ValueError('backend down')
+
+        # when
+        for _ in range(2):
+            with pytest.raises(CachedMethodFailedException):
+                await get_value('test')
+
+        # then
+        assert calls == ['test', 'test']
+
+    async def test_should_not_block_next_calls_if_backoff_fails(self):
+        # given
+        calls = []
+
+        @memoize(configuration=_configuration(FailingBackoff()))
+        async def get_value(arg):
+            calls.append(arg)
+            raise ValueError('backend down')
+
+        # when
+        for _ in range(2):
+            with pytest.raises(CachedMethodFailedException):
+                await asyncio.wait_for(get_value('test'), timeout=1)
+
+        # then
+        assert calls == ['test', 'test']
+
+
+class FailingBackoff(FailureBackoff):
+    def backoff(self, failures: int) -> Optional[timedelta]:
+        raise RuntimeError('misconfigured')
+
+
+class TestNegativeCachingSync:
+
+    def test_should_serve_failure_from_cache_until_backoff_passes(self):
+        # given
+        configuration = _configuration(ExponentialFailureBackoff(initial=timedelta(minutes=1)))
+        calls = []
+
+        @memoize_sync(configuration=configuration)
+        def get_value(arg):
+            calls.append(arg)
+            raise ValueError('backend down')
+
+        # when
+        for _ in range(2):
+            with pytest.raises(CachedMethodFailedException):
+                get_value('test')
+
+        # then
+        assert calls == ['test']
+
+    def test_should_not_block_next_calls_if_backoff_fails(self):
+        # given
+        calls = []
+
+        @memoize_sync(configuration=_configuration(FailingBackoff()),
+                      update_statuses=ThreadLocks(update_lock_timeout=timedelta(seconds=1)))
+        def get_value(arg):
+            calls.append(arg)
+            raise ValueError('backend down')
+
+        # when
+        for _ in range(2):
+            with pytest.raises(CachedMethodFailedException):
+                get_value('test')
+
+        # then
+        assert calls == ['test', 'test']
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from memoize.coalescing import RequestCoalescing
+from memoize.configuration import DefaultInMemoryCacheConfiguration
+from memoize.exceptions import CachedMethodFailedException
+from memoize.wrapper import memoize
+
+
+@pytest.mark.asyncio(scope="class")
+class TestRequestCoalescing:
+
+    async def test_should_load_calls_within_loop_iteration_with_single_batch(self):
+        # given
+        batches = []
+
+        async def load(calls):
+            batches.append([args[0] for args, _ in calls])
+            return ['value-{}'.format(args[0]) for args, _ in calls]
+
+        @memoize(configuration=DefaultInMemoryCacheConfiguration(), coalescing=RequestCoalescing(load))
+        async def get_value(arg):
+            raise AssertionError('should not be called')
+
+        # when
+        results = await asyncio.gather(*[get_value(i) for i in [1, 2, 3, 2, 1]])
+
+        # then
+        assert ['value-1', 'value-2', 'value-3', 'value-2', 'value-1'] == results
+        assert [[1, 2, 3]] == batches
+
+    async def test_should_collect_calls_within_window(self):
+        # given
+        batches = []
+
+        async def load(calls):
+            batches.append([args[0] for args, _ in calls])
+            return [args[0] for args, _ in calls]
+
+        @memoize(configuration=DefaultInMemoryCacheConfiguration(),
+                 coalescing=RequestCoalescing(load, window=timedelta(milliseconds=50)))
+        async def get_value(arg):
+            return arg
+
+        async def delayed(arg):
+            await asyncio.sleep(0.01)
+            return await get_value(arg)
+
+        # when
+        results = await asyncio.gather(get_value(1), delayed(2))
+
+        # then
+        assert [1, 2] == results
+        assert [[1, 2]] == batches
+
+    async def test_should_split_batches_exceeding_max_size(self):
+        # given
+        batches = []
+
+        async def load(calls):
+            batches.append([args[0] for args, _ in calls])
+            return [args[0] for args, _ in calls]
+
+        @memoize(configuration=DefaultInMemoryCacheConfiguration(),
+                 coalescing=RequestCoalescing(load, max_batch_size=2))
+        async def get_value(arg):
+            return arg
+
+        # when
+        results = await asyncio.gather(*[get_value(i) for i in [1, 2, 3]])
+
+        # then
+        assert [1, 2, 3] == results
+        assert [[1, 2], [3]] == batches
+
+    async def test_should_fail_all_callers_on_batch_failure(self):
+        # given
+        async def load(calls):
+            raise ValueError('Get lost')
+
+        @memoize(configuration=DefaultInMemoryCacheConfiguration(), coalescing=RequestCoalescing(load))
+        async def get_value(arg):
+            return arg
+
+        # when
+        results = await asyncio.gather(get_value(1), get_value(2), return_exceptions=True)
+
+        # then
+        for result in results:
+            assert isinstance(result, CachedMethodFailedException)
+            assert str(result.__cause__) == 'Get lost'
+
+    async def test_should_fail_all_callers_on_mismatched_batch_size(self):
+        # given
+        async def load(calls):
+            return []
+
+        @memoize(configuration=DefaultInMemoryCacheConfiguration(), coalescing=RequestCoalescing(load))
+        async def get_value(arg):
+            return arg
+
+        # when/then
+        with pytest.raises(CachedMethodFailedException):
+            await get_value(1)
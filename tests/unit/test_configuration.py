@@ -0,0 +1,209 @@
+import pytest
+
+from tests.py310workaround import fix_python_3_10_compatibility
+
+fix_python_3_10_compatibility()
+
+from datetime import timedelta
+from unittest.mock import Mock
+
+from memoize.configuration import MutableCacheConfiguration, DefaultInMemoryCacheConfiguration, \
+    FrozenCacheConfiguration, LazyCacheConfiguration, CacheConfiguration, NotConfiguredCacheCalledException
+from memoize.storage import LocalInMemoryCacheStorage
+from memoize.wrapper import memoize
+
+
+class TestMutableCacheConfigurationVersioning:
+
+    def test_should_not_change_version_when_setter_does_not_change_anything(self):
+        # given
+        configuration = MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration())
+        version = configuration.version()
+
+        # when
+        configuration.set_method_timeout(configuration.method_timeout())
+        configuration.set_storage(configuration.storage())
+        configuration.set_configured(True)
+
+        # then
+        assert configuration.version() == version
+
+    def test_should_change_version_when_setter_changes_configuration(self):
+        # given
+        configuration = MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration())
+        version = configuration.version()
+
+        # when
+        configuration.set_method_timeout(timedelta(seconds=1))
+
+        # then
+        assert configuration.version() != version
+
+
+class TestFrozenCacheConfiguration:
+
+    def test_should_resolve_all_components_once(self):
+        # given
+        source = MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration())
+
+        # when
+        frozen = FrozenCacheConfiguration.initialized_with(source)
+        source.set_storage(LocalInMemoryCacheStorage())
+
+        # then
+        assert frozen.storage() is not source.storage()
+        assert frozen.key_extractor() is source.key_extractor()
+        assert frozen.method_timeout() == source.method_timeout()
+
+    def test_should_be_up_to_date_until_versioned_source_changes(self):
+        # given
+        source = MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration())
+        frozen = FrozenCacheConfiguration.initialized_with(source)
+
+        # when
+        before = frozen.is_up_to_date_with(source)
+        source.set_method_timeout(timedelta(seconds=1))
+        after = frozen.is_up_to_date_with(source)
+
+        # then
+        assert before
+        assert not after
+
+    def test_should_never_be_up_to_date_with_unversioned_source(self):
+        # given
+        source = Mock(spec=CacheConfiguration)
+        source.version.return_value = None
+
+        # when
+        frozen = FrozenCacheConfiguration.initialized_with(source)
+
+        # then
+        assert not frozen.is_up_to_date_with(source)
+
+
+class TestLazyCacheConfiguration:
+
+    def test_should_resolve_components_once_on_first_use(self):
+        # given
+        source = Mock(spec=CacheConfiguration)
+
+        # when
+        lazy = LazyCacheConfiguration(source)
+        first = lazy.storage()
+        second = lazy.storage()
+
+        # then
+        assert first is second
+        source.storage.assert_called_once_with()
+        source.method_timeout.assert_not_called()
+
+    def test_should_never_be_up_to_date(self):
+        # given
+        source = Mock(spec=CacheConfiguration)
+        source.version.return_value = None
+
+        # when
+        lazy = LazyCacheConfiguration(source)
+
+        # then
+        assert not lazy.is_up_to_date_with(source)
+
+
+@pytest.mark.asyncio(scope="class")
+class TestConfigurationSnapshotInteractions:
+
+    async def test_should_not_resolve_versioned_configuration_on_cache_hit(self):
+        # given
+        configuration = MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration())
+        storage = configuration.storage()
+        configuration.storage = Mock(return_value=storage)
+
+        @memoize(configuration=configuration)
+        async def sample_method(arg):
+            return arg
+
+        await sample_method('test')
+        configuration.storage.reset_mock()
+
+        # when
+        await sample_method('test')
+
+        # then
+        configuration.storage.assert_not_called()
+
+    async def test_should_resolve_only_components_used_on_cache_hit_of_unversioned_configuration(self):
+        # given
+        configuration = Mock(wraps=DefaultInMemoryCacheConfiguration())
+        configuration.version.return_value = None
+
+        @memoize(configuration=configuration)
+        async def sample_method(arg):
+            return arg
+
+        await sample_method('test')
+        configuration.reset_mock()
+
+        # when
+        await sample_method('test')
+
+        # then
+        configuration.storage.assert_called_once_with()
+        configuration.method_timeout.assert_not_called()
+        configuration.entry_builder.assert_not_called()
+        configuration.failure_backoff.assert_not_called()
+
+    async def test_should_apply_runtime_changes_of_mutable_configuration(self):
+        # given
+        configuration = MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration())
+
+        @memoize(configuration=configuration)
+        async def sample_method(arg):
+            return arg
+
+        await sample_method('test')
+
+        # when
+        configuration.set_configured(False)
+
+        # then
+        with pytest.raises(NotConfiguredCacheCalledException):
+            await sample_method('test')
+
+    async def test_should_apply_runtime_changes_of_subclassed_configurations(self):
+        # given
+        class ToggledDefaultConfiguration(DefaultInMemoryCacheConfiguration):
+            enabled = True
+
+            def configured(self) -> bool:
+                return self.enabled
+
+        class ToggledMutableConfiguration(MutableCacheConfiguration):
+            enabled = True
+
+            def configured(self) -> bool:
+                return self.enabled
+
+        default = DefaultInMemoryCacheConfiguration()
+        configurations = [
+            ToggledDefaultConfiguration(),
+            ToggledMutableConfiguration(configured=True, storage=default.storage(),
+                                        key_extractor=default.key_extractor(),
+                                        eviction_strategy=default.eviction_strategy(),
+                                        entry_builder=default.entry_builder(), postprocessing=default.postprocessing(),
+                                        method_timeout=default.method_timeout()),
+        ]
+
+        for configuration in configurations:
+            @memoize(configuration=configuration)
+            async def sample_method(arg):
+                return arg
+
+            await sample_method('test')
+
+            # when
+            configuration.enabled = False
+
+            # then
+            assert configuration.version() is None
+            with pytest.raises(NotConfiguredCacheCalledException):
+                await sample_method('test')
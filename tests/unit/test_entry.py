@@ -0,0 +1,108 @@
+import base64
+import pickle
+import time
+from datetime import datetime, timedelta, timezone
+
+from memoize.entry import CacheEntry, early_refresh_due
+
+# pickled (with DEFAULT_PROTOCOL) by memoize 3.1 - before CacheEntry had __slots__ and numeric timestamps
+LEGACY_PICKLED_ENTRY = base64.b64decode(
+    'gASV/gAAAAAAAACMDW1lbW9pemUuZW50cnmUjApDYWNoZUVudHJ5lJOUKYGUfZQojAV2YWx1ZZRoBYwHY3JlYXRlZJSMCGRhdGV0aW1llIwIZGF0'
+    'ZXRpbWWUk5RDCgeyAQEAAAEAAACUaAeMCHRpbWV6b25llJOUaAeMCXRpbWVkZWx0YZSTlEsASwBLAIeUUpSFlFKUhpRSlIwMdXBkYXRlX2FmdGVy'
+    'lGgJQwoHsgEBAAACAAAAlGgShpRSlIwNZXhwaXJlc19hZnRlcpRoCUMKB7IBAQAAAwAAAJRoEoaUUpSMFV9DYWNoZUVudHJ5X19oYXNoYWJsZZQo'
+    'aAVoFGgYaBx0lHViLg=='
+)
+
+
+class TestCacheEntry:
+
+    def test_should_keep_times_as_timestamps_and_expose_them_as_datetimes(self):
+        # given
+        created = datetime.fromtimestamp(1, timezone.utc)
+
+        # when
+        entry = CacheEntry(created=created, update_after=2.0, expires_after=created + timedelta(seconds=2),
+                           value='value')
+
+        # then
+        assert (1.0, 2.0, 3.0) == (entry.created_timestamp, entry.update_after_timestamp,
+                                   entry.expires_after_timestamp)
+        assert created == entry.created
+        assert datetime.fromtimestamp(2, timezone.utc) == entry.update_after
+        assert datetime.fromtimestamp(3, timezone.utc) == entry.expires_after
+
+    def test_should_not_have_instance_dict(self):
+        # given
+        entry = CacheEntry(created=1.0, update_after=2.0, expires_after=3.0, value='value')
+
+        # when/then
+        assert not hasattr(entry, '__dict__')
+
+    def test_should_be_equal_to_entry_created_with_datetimes(self):
+        # given
+        as_timestamps = CacheEntry(created=1.0, update_after=2.0, expires_after=3.0, value='value')
+        as_datetimes = CacheEntry(created=datetime.fromtimestamp(1, timezone.utc),
+                                  update_after=datetime.fromtimestamp(2, timezone.utc),
+                                  expires_after=datetime.fromtimestamp(3, timezone.utc), value='value')
+
+        # when/then
+        assert as_timestamps == as_datetimes
+        assert hash(as_timestamps) == hash(as_datetimes)
+
+    def test_should_survive_pickling(self):
+        # given
+        entry = CacheEntry(created=1.0, update_after=2.0, expires_after=3.0, value='value', computation_time=0.5)
+
+        # when
+        unpickled = [pickle.loads(pickle.dumps(entry, protocol=protocol))
+                     for protocol in range(pickle.HIGHEST_PROTOCOL + 1)]
+
+        # then
+        for unpickled_entry in unpickled:
+            assert entry == unpickled_entry
+            assert 0.5 == unpickled_entry.computation_time
+
+    def test_should_unpickle_entry_pickled_by_previous_versions(self):
+        # when
+        entry = pickle.loads(LEGACY_PICKLED_ENTRY)
+
+        # then
+        assert CacheEntry(created=1.0, update_after=2.0, expires_after=3.0, value='value') == entry
+        assert entry.computation_time is None
+
+
+class TestEarlyRefresh:
+
+    def setup_method(self):
+        self.now = time.time()
+
+    def _entry(self, update_in: float, computation_time):
+        return CacheEntry(created=self.now, update_after=self.now + update_in,
+                          expires_after=self.now + update_in * 2, value='value', computation_time=computation_time)
+
+    def test_should_not_refresh_early_if_computation_time_unknown(self):
+        # given
+        entry = self._entry(0.001, None)
+
+        # when/then
+        assert not early_refresh_due(entry, self.now, beta=1000.0)
+
+    def test_should_refresh_early_if_computation_is_long_compared_to_remaining_time(self):
+        # given
+        entry = self._entry(0.001, 60.0)
+
+        # when
+        decisions = [early_refresh_due(entry, self.now, beta=1.0) for _ in range(100)]
+
+        # then
+        assert sum(decisions) > 90
+
+    def test_should_not_refresh_early_if_computation_is_short_compared_to_remaining_time(self):
+        # given
+        entry = self._entry(3600.0, 0.001)
+
+        # when
+        decisions = [early_refresh_due(entry, self.now, beta=1.0) for _ in range(100)]
+
+        # then
+        assert not any(decisions)
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+import pytest
+
+from memoize.entrybuilder import ProvidedLifeSpanCacheEntryBuilder
+
+
+class TestProvidedLifeSpanCacheEntryBuilder:
+
+    def test_should_use_provided_delays(self):
+        # given
+        builder = ProvidedLifeSpanCacheEntryBuilder(update_after=timedelta(minutes=1),
+                                                    expire_after=timedelta(minutes=2))
+
+        # when
+        entry = builder.build('key', 'value')
+
+        # then
+        assert entry.update_after - entry.created == timedelta(minutes=1)
+        assert entry.expires_after - entry.created == timedelta(minutes=2)
+
+    def test_should_shorten_delays_within_jitter(self):
+        # given
+        builder = ProvidedLifeSpanCacheEntryBuilder(update_after=timedelta(minutes=1),
+                                                    expire_after=timedelta(minutes=2), jitter=0.5)
+
+        # when
+        entries = [builder.build('key', 'value') for _ in range(100)]
+
+        # then
+        for entry in entries:
+            assert timedelta(seconds=30) <= entry.update_after - entry.created <= timedelta(minutes=1)
+            assert timedelta(minutes=1) <= entry.expires_after - entry.created <= timedelta(minutes=2)
+            assert entry.update_after <= entry.expires_after
+        assert len({entry.update_after - entry.created for entry in entries}) > 1
+
+    def test_should_reject_jitter_out_of_range(self):
+        # given/when/then
+        with pytest.raises(ValueError):
+            ProvidedLifeSpanCacheEntryBuilder(jitter=1.0)
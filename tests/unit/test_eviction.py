@@ -1,12 +1,20 @@
 import asyncio
+import gc
 import time
+import weakref
 from datetime import timedelta
 from unittest.mock import Mock
 
 import pytest
 
 from memoize.configuration import MutableCacheConfiguration, DefaultInMemoryCacheConfiguration
+from memoize.entry import CacheEntry
 from memoize.entrybuilder import ProvidedLifeSpanCacheEntryBuilder
+from memoize.sizing import Sizer
+from memoize.storage import LocalInMemoryCacheStorage
+from memoize.eviction import LeastRecentlyUsedEvictionStrategy, LeastRecentlyUpdatedEvictionStrategy, \
+    FrequencySketch, WindowTinyLfuEvictionStrategy, SizeWeightedEvictionStrategy, ClockEvictionStrategy, \
+    AdaptiveReplacementEvictionStrategy, GreedyDualSizeFrequencyEvictionStrategy
 from memoize.wrapper import memoize
 from tests import _assert_called_once_with, AnyObject, _as_future, _ensure_background_tasks_finished, \
     _ensure_background_tasks_finished
@@ -93,7 +101,7 @@ class TestEvictionStrategyInteractions:
         key_extractor.format_key = Mock(side_effect=lambda method, args, kwargs: str((args, kwargs)))
 
         eviction_strategy = Mock()
-        eviction_strategy.next_to_release = Mock(return_value='release-test')
+        eviction_strategy.next_batch_to_release = Mock(return_value=['release-test'])
 
         @memoize(
             configuration=MutableCacheConfiguration
@@ -117,12 +125,12 @@ class TestEvictionStrategyInteractions:
         key_extractor.format_key = Mock(side_effect=lambda method, args, kwargs: str((args, kwargs)))
 
         eviction_strategy = Mock()
-        eviction_strategy.next_to_release = Mock(return_value='release-test')
+        eviction_strategy.next_batch_to_release = Mock(return_value=['release-test'])
 
         storage = Mock()
         storage.get = Mock(return_value=_as_future(None))
         storage.offer = Mock(return_value=_as_future(None))
-        storage.release = Mock(return_value=_as_future(None))
+        storage.release_many = Mock(return_value=_as_future(None))
 
         @memoize(
             configuration=MutableCacheConfiguration
@@ -139,8 +147,8 @@ class TestEvictionStrategyInteractions:
         await _ensure_background_tasks_finished()
 
         # then
-        eviction_strategy.next_to_release.assert_called_once_with()
-        storage.release.assert_called_once_with('release-test')
+        eviction_strategy.next_batch_to_release.assert_called_once_with()
+        storage.release_many.assert_called_once_with(['release-test'])
 
     async def test_should_retrieve_entry_to_release_on_entry_updated(self):
         # given
@@ -148,12 +156,12 @@ class TestEvictionStrategyInteractions:
         key_extractor.format_key = Mock(side_effect=lambda method, args, kwargs: str((args, kwargs)))
 
         eviction_strategy = Mock()
-        eviction_strategy.next_to_release = Mock(return_value='release-test')
+        eviction_strategy.next_batch_to_release = Mock(return_value=['release-test'])
 
         storage = Mock()
         storage.get = Mock(return_value=_as_future(None))
         storage.offer = Mock(return_value=_as_future(None))
-        storage.release = Mock(return_value=_as_future(None))
+        storage.release_many = Mock(return_value=_as_future(None))
 
         @memoize(
             configuration=MutableCacheConfiguration
@@ -169,13 +177,593 @@ class TestEvictionStrategyInteractions:
         await sample_method('test', kwarg='args')
         await _ensure_background_tasks_finished()
         time.sleep(.200)
-        eviction_strategy.next_to_release.reset_mock()
-        storage.release.reset_mock()
+        eviction_strategy.next_batch_to_release.reset_mock()
+        storage.release_many.reset_mock()
 
         # when
         await sample_method('test', kwarg='args')
         await _ensure_background_tasks_finished()
 
         # then
-        eviction_strategy.next_to_release.assert_called_once_with()
-        storage.release.assert_called_once_with('release-test')
+        eviction_strategy.next_batch_to_release.assert_called_once_with()
+        storage.release_many.assert_called_once_with(['release-test'])
+
+
+    async def test_should_not_store_entry_not_admitted(self):
+        # given
+        eviction_strategy = Mock()
+        eviction_strategy.admits = Mock(return_value=False)
+        eviction_strategy.next_batch_to_release = Mock(return_value=[])
+        storage = LocalInMemoryCacheStorage()
+        calls = 0
+
+        @memoize(
+            configuration=MutableCacheConfiguration
+            .initialized_with(DefaultInMemoryCacheConfiguration())
+            .set_eviction_strategy(eviction_strategy)
+            .set_storage(storage)
+        )
+        async def sample_method(arg):
+            nonlocal calls
+            calls += 1
+            return arg
+
+        # when
+        res1 = await sample_method('test')
+        res2 = await sample_method('test')
+
+        # then
+        assert ('test', 'test') == (res1, res2)
+        assert 2 == calls
+        assert {} == storage._data
+        eviction_strategy.mark_written.assert_not_called()
+
+    async def test_should_release_all_entries_over_capacity_at_once(self):
+        # given
+        storage = LocalInMemoryCacheStorage()
+        storage.release_many = Mock(wraps=storage.release_many)
+
+        @memoize(
+            configuration=MutableCacheConfiguration
+            .initialized_with(DefaultInMemoryCacheConfiguration())
+            .set_eviction_strategy(SizeWeightedEvictionStrategy(max_size=10, sizer=LengthSizer()))
+            .set_storage(storage)
+        )
+        async def sample_method(arg, size):
+            return 'x' * size
+
+        for arg in ['a', 'b', 'c']:
+            await sample_method(arg, 3)
+        await _ensure_background_tasks_finished()
+
+        # when
+        await sample_method('large', 9)
+        await _ensure_background_tasks_finished()
+
+        # then
+        assert 1 == len(storage._data)
+        storage.release_many.assert_called_once()
+        assert 3 == len(storage.release_many.call_args[0][0])
+
+
+CACHE_SAMPLE_ENTRY = CacheEntry(0.0, 0.0, 0.0, "value")
+
+
+class TestEvictionStrategy:
+
+    def test_should_return_all_entries_over_capacity_in_batch(self):
+        # given
+        strategy = LeastRecentlyUsedEvictionStrategy(capacity=2)
+        for key in ['a', 'b', 'c', 'd', 'e']:
+            strategy.mark_written(key, CACHE_SAMPLE_ENTRY)
+
+        # when
+        batch = strategy.next_batch_to_release()
+
+        # then
+        assert ['a', 'b', 'c'] == batch
+        assert [] == strategy.next_batch_to_release()
+
+    def test_should_return_element_once_if_strategy_keeps_returning_it(self):
+        # given
+        class StickyEvictionStrategy(LeastRecentlyUsedEvictionStrategy):
+            def next_to_release(self):
+                return 'a'
+
+        strategy = StickyEvictionStrategy()
+
+        # when
+        batch = strategy.next_batch_to_release()
+
+        # then
+        assert ['a'] == batch
+
+
+class TestLeastRecentlyUsedEvictionStrategy:
+
+    def test_should_release_least_recently_read_entry_on_capacity_exceeded(self):
+        # given
+        strategy = LeastRecentlyUsedEvictionStrategy(capacity=2)
+        strategy.mark_written('a', CACHE_SAMPLE_ENTRY)
+        strategy.mark_written('b', CACHE_SAMPLE_ENTRY)
+        strategy.mark_read('a')
+
+        # when
+        strategy.mark_written('c', CACHE_SAMPLE_ENTRY)
+        released = strategy.next_to_release()
+
+        # then
+        assert 'b' == released
+        assert strategy.next_to_release() is None
+
+    def test_should_release_nothing_on_capacity_not_exceeded(self):
+        # given
+        strategy = LeastRecentlyUsedEvictionStrategy(capacity=2)
+
+        # when
+        strategy.mark_written('a', CACHE_SAMPLE_ENTRY)
+        strategy.mark_written('b', CACHE_SAMPLE_ENTRY)
+        strategy.mark_written('a', CACHE_SAMPLE_ENTRY)
+
+        # then
+        assert strategy.next_to_release() is None
+
+    def test_should_ignore_reads_and_releases_of_unknown_keys(self):
+        # given
+        strategy = LeastRecentlyUsedEvictionStrategy(capacity=1)
+        strategy.mark_written('a', CACHE_SAMPLE_ENTRY)
+
+        # when
+        strategy.mark_read('unknown')
+        strategy.mark_released('unknown')
+        strategy.mark_written('b', CACHE_SAMPLE_ENTRY)
+
+        # then
+        assert 'a' == strategy.next_to_release()
+
+    def test_should_differ_from_least_recently_updated_on_reads(self):
+        # given
+        lru = LeastRecentlyUsedEvictionStrategy(capacity=1)
+        least_recently_updated = LeastRecentlyUpdatedEvictionStrategy(capacity=1)
+
+        # when
+        for strategy in (lru, least_recently_updated):
+            strategy.mark_written('a', CACHE_SAMPLE_ENTRY)
+            strategy.mark_written('b', CACHE_SAMPLE_ENTRY)
+            strategy.mark_released(strategy.next_to_release())
+            strategy.mark_written('a', CACHE_SAMPLE_ENTRY)
+            strategy.mark_read('b')
+
+        # then
+        assert 'a' == lru.next_to_release()
+        assert 'b' == least_recently_updated.next_to_release()
+
+
+class TestFrequencySketch:
+
+    def test_should_estimate_frequency_of_keys(self):
+        # given
+        sketch = FrequencySketch(capacity=1024)
+
+        # when
+        for _ in range(5):
+            sketch.increment('hot')
+        sketch.increment('cold')
+
+        # then
+        assert 5 == sketch.frequency('hot')
+        assert 1 == sketch.frequency('cold')
+        assert 0 == sketch.frequency('unknown')
+
+    def test_should_saturate_counters(self):
+        # given
+        sketch = FrequencySketch(capacity=1024)
+
+        # when
+        for _ in range(100):
+            sketch.increment(1)
+
+        # then
+        assert 15 == sketch.frequency(1)
+
+    def test_should_halve_counters_once_sample_size_reached(self):
+        # given
+        sketch = FrequencySketch(capacity=16)
+        for _ in range(8):
+            sketch.increment(1)
+
+        # when
+        for _ in range(320 - 8):
+            sketch.increment(2)
+
+        # then
+        assert sketch.frequency(1) == 4
+
+    def test_should_take_eight_bytes_per_key(self):
+        # given
+        sketch = FrequencySketch(capacity=1_000_000)
+
+        # then
+        assert len(sketch._table) == 4 * 2 ** 21
+
+
+class TestWindowTinyLfuEvictionStrategy:
+
+    def test_should_keep_capacity(self):
+        # given
+        strategy = WindowTinyLfuEvictionStrategy(capacity=10)
+        entries = set()
+
+        # when
+        for key in range(100):
+            entries.add(key)
+            strategy.mark_written(key, CACHE_SAMPLE_ENTRY)
+            entries.discard(strategy.next_to_release())
+
+        # then
+        assert 10 == len(entries)
+        assert strategy.next_to_release() is None
+
+    def test_should_keep_frequently_used_entries_despite_scan(self):
+        # given
+        hot_keys = set(range(50))
+        scan_keys = range(1000, 2000)
+        kept = {}
+
+        # when
+        for strategy in (WindowTinyLfuEvictionStrategy(capacity=100), LeastRecentlyUsedEvictionStrategy(capacity=100)):
+            entries = set()
+            for key in hot_keys:
+                entries.add(key)
+                strategy.mark_written(key, CACHE_SAMPLE_ENTRY)
+                entries.discard(strategy.next_to_release())
+            for _ in range(10):
+                for key in hot_keys:
+                    strategy.mark_read(key)
+            for key in scan_keys:
+                entries.add(key)
+                strategy.mark_written(key, CACHE_SAMPLE_ENTRY)
+                entries.discard(strategy.next_to_release())
+            kept[strategy.__class__] = len(hot_keys & entries)
+
+        # then
+        assert kept[WindowTinyLfuEvictionStrategy] >= 45
+        assert kept[LeastRecentlyUsedEvictionStrategy] == 0
+
+    def test_should_forget_released_entries(self):
+        # given
+        strategy = WindowTinyLfuEvictionStrategy(capacity=2)
+        strategy.mark_written('a', CACHE_SAMPLE_ENTRY)
+        strategy.mark_written('b', CACHE_SAMPLE_ENTRY)
+
+        # when
+        strategy.mark_released('a')
+        strategy.mark_written('c', CACHE_SAMPLE_ENTRY)
+
+        # then
+        assert strategy.next_to_release() is None
+
+    def test_should_reject_invalid_ratios(self):
+        # when
+        with pytest.raises(ValueError):
+            WindowTinyLfuEvictionStrategy(window_ratio=0.0)
+
+
+class LengthSizer(Sizer):
+    def size(self, key, entry):
+        return len(entry.value)
+
+
+def entry_of(value) -> CacheEntry:
+    return CacheEntry(0.0, 0.0, 0.0, value)
+
+
+class TestSizeWeightedEvictionStrategy:
+
+    def test_should_release_least_recently_used_entries_on_budget_exceeded(self):
+        # given
+        strategy = SizeWeightedEvictionStrategy(max_size=10, sizer=LengthSizer())
+        strategy.mark_written('a', entry_of('x' * 4))
+        strategy.mark_written('b', entry_of('x' * 4))
+        strategy.mark_read('a')
+
+        # when
+        strategy.mark_written('c', entry_of('x' * 4))
+        released = strategy.next_to_release()
+
+        # then
+        assert 'b' == released
+        assert strategy.next_to_release() is None
+        assert 8 == strategy.size
+
+    def test_should_track_size_of_updated_and_released_entries(self):
+        # given
+        strategy = SizeWeightedEvictionStrategy(max_size=10, sizer=LengthSizer())
+        strategy.mark_written('a', entry_of('x' * 4))
+        strategy.mark_written('b', entry_of('x' * 4))
+
+        # when
+        strategy.mark_written('a', entry_of('x' * 2))
+        strategy.mark_released('b')
+        strategy.mark_released('unknown')
+
+        # then
+        assert 2 == strategy.size
+        assert strategy.next_to_release() is None
+
+    def test_should_not_admit_entries_larger_than_max_entry_size(self):
+        # given
+        strategy = SizeWeightedEvictionStrategy(max_size=100, max_entry_size=5, sizer=LengthSizer())
+
+        # then
+        assert strategy.admits('a', entry_of('x' * 5))
+        assert not strategy.admits('a', entry_of('x' * 6))
+
+    def test_should_release_entries_larger_than_max_entry_size_written_without_admission(self):
+        # given
+        strategy = SizeWeightedEvictionStrategy(max_size=100, max_entry_size=5, sizer=LengthSizer())
+
+        # when
+        strategy.mark_written('a', entry_of('x' * 6))
+
+        # then
+        assert 'a' == strategy.next_to_release()
+        assert 0 == strategy.size
+
+    def test_should_not_keep_reference_to_entry_not_admitted(self):
+        # given
+        strategy = SizeWeightedEvictionStrategy(max_size=100, max_entry_size=5, sizer=LengthSizer())
+        value = Mock(__len__=Mock(return_value=6))
+        reference = weakref.ref(value)
+        entry = entry_of(value)
+
+        # when
+        admitted = strategy.admits('a', entry)
+        del entry, value
+        gc.collect()
+
+        # then
+        assert not admitted
+        assert reference() is None
+
+    def test_should_size_entry_once(self):
+        # given
+        sizer = Mock()
+        sizer.size = Mock(return_value=1)
+        strategy = SizeWeightedEvictionStrategy(max_entry_size=5, sizer=sizer)
+        entry = entry_of('value')
+
+        # when
+        strategy.admits('a', entry)
+        strategy.mark_written('a', entry)
+
+        # then
+        sizer.size.assert_called_once_with('a', entry)
+
+
+class TestClockEvictionStrategy:
+
+    def test_should_release_entry_not_visited_since_last_sweep(self):
+        # given
+        strategy = ClockEvictionStrategy(capacity=3)
+        for key in ('a', 'b', 'c'):
+            strategy.mark_written(key, CACHE_SAMPLE_ENTRY)
+        strategy.mark_read('a')
+        strategy.mark_read('c')
+
+        # when
+        strategy.mark_written('d', CACHE_SAMPLE_ENTRY)
+        released = strategy.next_to_release()
+
+        # then
+        assert 'b' == released
+        assert strategy.next_to_release() is None
+
+    def test_should_give_visited_entries_second_chance(self):
+        # given
+        strategy = ClockEvictionStrategy(capacity=2)
+        strategy.mark_written('a', CACHE_SAMPLE_ENTRY)
+        strategy.mark_written('b', CACHE_SAMPLE_ENTRY)
+        strategy.mark_read('a')
+        strategy.mark_read('b')
+
+        # when
+        strategy.mark_written('c', CACHE_SAMPLE_ENTRY)
+        released1 = strategy.next_to_release()
+        strategy.mark_written('d', CACHE_SAMPLE_ENTRY)
+        released2 = strategy.next_to_release()
+
+        # then
+        assert 'c' == released1  # visited flags of 'a' & 'b' got cleared by the sweep
+        assert 'a' == released2
+
+    def test_should_reuse_slots_of_released_entries(self):
+        # given
+        strategy = ClockEvictionStrategy(capacity=2)
+        entries = set()
+
+        # when
+        for key in range(100):
+            entries.add(key)
+            strategy.mark_written(key, CACHE_SAMPLE_ENTRY)
+            entries.discard(strategy.next_to_release())
+        strategy.mark_released(99)
+        strategy.mark_released('unknown')
+
+        # then
+        assert {98, 99} == entries
+        assert 3 == len(strategy._keys)
+        assert strategy.next_to_release() is None
+
+    def test_should_keep_capacity(self):
+        # given
+        strategy = ClockEvictionStrategy(capacity=10)
+        entries = set()
+
+        # when
+        for key in range(100):
+            entries.add(key)
+            strategy.mark_written(key, CACHE_SAMPLE_ENTRY)
+            if key % 3 == 0:
+                strategy.mark_read(key - 1)
+            entries.discard(strategy.next_to_release())
+
+        # then
+        assert 10 == len(entries)
+
+
+class TestAdaptiveReplacementEvictionStrategy:
+
+    @staticmethod
+    def _write(strategy, key, entries):
+        entries.add(key)
+        strategy.mark_written(key, CACHE_SAMPLE_ENTRY)
+        released = strategy.next_to_release()
+        if released is not None:
+            entries.discard(released)
+            strategy.mark_released(released)  # as wrappers do
+
+    def test_should_keep_capacity(self):
+        # given
+        strategy = AdaptiveReplacementEvictionStrategy(capacity=10)
+        entries = set()
+
+        # when
+        for key in range(100):
+            self._write(strategy, key % 30, entries)
+            strategy.mark_read(key % 7)
+
+        # then
+        assert 10 == len(entries)
+        assert strategy.next_to_release() is None
+
+    def test_should_release_entries_used_once_before_entries_used_again(self):
+        # given
+        strategy = AdaptiveReplacementEvictionStrategy(capacity=2)
+        entries = set()
+        self._write(strategy, 'a', entries)
+        self._write(strategy, 'b', entries)
+        strategy.mark_read('a')
+
+        # when
+        self._write(strategy, 'c', entries)
+
+        # then
+        assert {'a', 'c'} == entries
+
+    def test_should_adapt_target_on_writes_of_keys_remembered_by_ghost_lists(self):
+        # given
+        strategy = AdaptiveReplacementEvictionStrategy(capacity=2)
+        entries = set()
+        self._write(strategy, 'a', entries)
+        strategy.mark_read('a')
+        self._write(strategy, 'b', entries)
+        self._write(strategy, 'c', entries)  # 'b' released from recency list
+
+        # when
+        self._write(strategy, 'b', entries)  # 'a' released from frequency list
+        target_after_recent_ghost_hit = strategy.target
+        released_after_recent_ghost_hit = {'a', 'b', 'c'} - entries
+        self._write(strategy, 'a', entries)
+        target_after_frequent_ghost_hit = strategy.target
+
+        # then
+        assert {'a'} == released_after_recent_ghost_hit
+        assert 1.0 == target_after_recent_ghost_hit
+        assert 0.0 == target_after_frequent_ghost_hit
+
+    def test_should_forget_released_entries(self):
+        # given
+        strategy = AdaptiveReplacementEvictionStrategy(capacity=2)
+        strategy.mark_written('a', CACHE_SAMPLE_ENTRY)
+        strategy.mark_written('b', CACHE_SAMPLE_ENTRY)
+        strategy.mark_read('b')
+
+        # when
+        strategy.mark_released('a')
+        strategy.mark_released('b')
+        strategy.mark_written('c', CACHE_SAMPLE_ENTRY)
+
+        # then
+        assert strategy.next_to_release() is None
+
+
+def entry_computed_in(seconds, value='value') -> CacheEntry:
+    return CacheEntry(0.0, 0.0, 0.0, value, computation_time=seconds)
+
+
+class TestGreedyDualSizeFrequencyEvictionStrategy:
+
+    def test_should_release_entry_cheapest_to_recompute(self):
+        # given
+        strategy = GreedyDualSizeFrequencyEvictionStrategy(capacity=2)
+        strategy.mark_written('expensive', entry_computed_in(20.0))
+        strategy.mark_written('cheap', entry_computed_in(0.005))
+
+        # when
+        strategy.mark_written('medium', entry_computed_in(1.0))
+        released = strategy.next_to_release()
+
+        # then
+        assert 'cheap' == released
+        assert strategy.next_to_release() is None
+
+    def test_should_keep_frequently_read_entries(self):
+        # given
+        strategy = GreedyDualSizeFrequencyEvictionStrategy(capacity=2)
+        strategy.mark_written('a', entry_computed_in(1.0))
+        strategy.mark_written('b', entry_computed_in(1.0))
+        for _ in range(3):
+            strategy.mark_read('a')
+
+        # when
+        strategy.mark_written('c', entry_computed_in(2.0))
+        released = strategy.next_to_release()
+
+        # then
+        assert 'b' == released
+
+    def test_should_prefer_small_entries(self):
+        # given
+        strategy = GreedyDualSizeFrequencyEvictionStrategy(capacity=2, sizer=LengthSizer())
+        strategy.mark_written('large', entry_computed_in(1.0, 'x' * 1000))
+        strategy.mark_written('small', entry_computed_in(1.0, 'x'))
+
+        # when
+        strategy.mark_written('medium', entry_computed_in(1.0, 'x' * 10))
+        released = strategy.next_to_release()
+
+        # then
+        assert 'large' == released
+
+    def test_should_age_entries_not_used_for_long(self):
+        # given
+        strategy = GreedyDualSizeFrequencyEvictionStrategy(capacity=2)
+        entries = set()
+        strategy.mark_written('old', entry_computed_in(3.0))
+        entries.add('old')
+
+        # when
+        for key in range(10):
+            entries.add(key)
+            strategy.mark_written(key, entry_computed_in(1.0))
+            entries.discard(strategy.next_to_release())
+
+        # then
+        assert 'old' not in entries
+        assert 2 == len(entries)
+
+    def test_should_forget_released_entries(self):
+        # given
+        strategy = GreedyDualSizeFrequencyEvictionStrategy(capacity=1)
+        strategy.mark_written('a', entry_computed_in(1.0))
+        for _ in range(100):
+            strategy.mark_read('a')
+
+        # when
+        strategy.mark_released('a')
+        strategy.mark_written('b', entry_computed_in(None))
+
+        # then
+        assert strategy.next_to_release() is None
+        assert len(strategy._heap) < 100
@@ -0,0 +1,242 @@
+import asyncio
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from memoize.configuration import MutableCacheConfiguration, DefaultInMemoryCacheConfiguration
+from memoize.entrybuilder import ProvidedLifeSpanCacheEntryBuilder
+from memoize.eviction import LeastRecentlyUsedEvictionStrategy
+from memoize.expiry import ExpirySweeper, TimerWheel
+from memoize.key import TupleKeyExtractor
+from memoize.metrics import CacheEvent, InMemoryMetrics
+from memoize.storage import LocalInMemoryCacheStorage
+from memoize.wrapper import memoize
+
+
+class TestTimerWheel:
+
+    def test_should_return_keys_once_their_deadline_passes(self):
+        # given
+        wheel = TimerWheel(tick=1.0, now=100.0)
+        wheel.schedule('a', 102.5)
+        wheel.schedule('b', 104.0)
+
+        # when
+        before = wheel.advance(102.9, limit=10)
+        first = wheel.advance(103.0, limit=10)
+        second = wheel.advance(105.0, limit=10)
+
+        # then
+        assert [] == before
+        assert ['a'] == first
+        assert ['b'] == second
+        assert 0 == len(wheel)
+
+    def test_should_cascade_keys_from_higher_levels(self):
+        # given
+        wheel = TimerWheel(tick=1.0, now=0.0, slots=4, levels=3)
+        deadlines = {key: float(key) for key in range(1, 64)}
+        for key, deadline in deadlines.items():
+            wheel.schedule(key, deadline)
+
+        # when
+        returned_at = {}
+        for now in range(1, 66):
+            for key in wheel.advance(float(now), limit=100):
+                returned_at[key] = now
+
+        # then
+        assert {key: int(deadline) + 1 for key, deadline in deadlines.items()} == returned_at
+
+    def test_should_keep_keys_due_beyond_span_of_wheel(self):
+        # given
+        wheel = TimerWheel(tick=1.0, now=0.0, slots=2, levels=2)
+        wheel.schedule('far', 10.0)
+
+        # when
+        early = [key for now in range(1, 11) for key in wheel.advance(float(now), limit=10)]
+        due = wheel.advance(11.0, limit=10)
+
+        # then
+        assert [] == early
+        assert ['far'] == due
+
+    def test_should_reschedule_and_cancel_keys(self):
+        # given
+        wheel = TimerWheel(tick=1.0, now=0.0)
+        wheel.schedule('rescheduled', 1.0)
+        wheel.schedule('cancelled', 1.0)
+
+        # when
+        wheel.schedule('rescheduled', 5.0)
+        wheel.cancel('cancelled')
+        first = wheel.advance(3.0, limit=10)
+        second = wheel.advance(6.0, limit=10)
+
+        # then
+        assert [] == first
+        assert ['rescheduled'] == second
+        assert 'cancelled' not in wheel
+
+    def test_should_return_due_keys_in_limited_batches(self):
+        # given
+        wheel = TimerWheel(tick=1.0, now=0.0)
+        for key in range(5):
+            wheel.schedule(key, 1.0)
+
+        # when
+        batches = [wheel.advance(3.0, limit=2) for _ in range(4)]
+
+        # then
+        assert [2, 2, 1, 0] == [len(batch) for batch in batches]
+        assert {0, 1, 2, 3, 4} == set(key for batch in batches for key in batch)
+
+    def test_should_skip_ticks_passed_while_empty(self):
+        # given
+        wheel = TimerWheel(tick=1.0, now=0.0)
+
+        # when
+        wheel.fast_forward(3600.0)
+        wheel.schedule('a', 3601.5)
+        with patch.object(TimerWheel, '_cascade', autospec=True, side_effect=TimerWheel._cascade) as cascade:
+            due = wheel.advance(3602.0, limit=10)
+
+        # then
+        assert ['a'] == due
+        assert 2 == cascade.call_count
+
+    def test_should_not_accept_non_positive_tick(self):
+        # when
+        with pytest.raises(ValueError):
+            TimerWheel(tick=0.0, now=0.0)
+
+
+@pytest.mark.asyncio(scope="class")
+class TestExpirySweeper:
+
+    @staticmethod
+    def _configuration(expire_after: timedelta) -> MutableCacheConfiguration:
+        return MutableCacheConfiguration \
+            .initialized_with(DefaultInMemoryCacheConfiguration()) \
+            .set_storage(LocalInMemoryCacheStorage()) \
+            .set_eviction_strategy(LeastRecentlyUsedEvictionStrategy()) \
+            .set_entry_builder(ProvidedLifeSpanCacheEntryBuilder(update_after=expire_after, expire_after=expire_after))
+
+    async def test_should_release_expired_entries_from_storage_and_eviction_strategy(self):
+        # given
+        configuration = self._configuration(expire_after=timedelta(milliseconds=20))
+        metrics = InMemoryMetrics()
+        configuration.set_metrics_listener(metrics)
+        sweeper = ExpirySweeper(tick=timedelta(milliseconds=10))
+
+        @memoize(configuration=configuration, expiry_sweeper=sweeper)
+        async def get_value(arg):
+            return arg
+
+        # when
+        for arg in range(10):
+            await get_value(arg)
+        stored_before = len(configuration.storage()._data)
+        await asyncio.sleep(0.1)
+
+        # then
+        assert 10 == stored_before
+        assert {} == configuration.storage()._data
+        assert 0 == len(configuration.eviction_strategy()._data)
+        assert 0 == len(sweeper)
+        assert 10 == metrics.events[CacheEvent.EXPIRE]
+
+    async def test_should_not_release_refreshed_entries(self):
+        # given
+        configuration = self._configuration(expire_after=timedelta(milliseconds=100))
+        configuration.set_key_extractor(TupleKeyExtractor())
+        sweeper = ExpirySweeper(tick=timedelta(milliseconds=10))
+
+        @memoize(configuration=configuration, expiry_sweeper=sweeper)
+        async def get_value(arg):
+            return arg
+
+        # when
+        await get_value('refreshed')
+        await get_value('abandoned')
+        await asyncio.sleep(0.06)
+        await get_value('refreshed', force_refresh_memoized=True)
+        await asyncio.sleep(0.07)
+        stored = [key for _, key in configuration.storage()._data]
+        await asyncio.sleep(0.1)
+
+        # then
+        assert ['refreshed'] == stored
+        assert {} == configuration.storage()._data
+
+    async def test_should_keep_entries_that_may_be_served_if_refresh_fails(self):
+        # given
+        configuration = self._configuration(expire_after=timedelta(milliseconds=20))
+        configuration.set_stale_if_error(timedelta(milliseconds=80))
+        sweeper = ExpirySweeper(tick=timedelta(milliseconds=10))
+
+        @memoize(configuration=configuration, expiry_sweeper=sweeper)
+        async def get_value(arg):
+            return arg
+
+        # when
+        await get_value('key')
+        await asyncio.sleep(0.05)
+        stored_after_expiry = len(configuration.storage()._data)
+        await asyncio.sleep(0.1)
+
+        # then
+        assert 1 == stored_after_expiry
+        assert {} == configuration.storage()._data
+
+    async def test_should_release_expired_entries_in_limited_batches(self):
+        # given
+        configuration = self._configuration(expire_after=timedelta(milliseconds=10))
+        sweeper = ExpirySweeper(tick=timedelta(milliseconds=10), batch_size=3)
+        batches = []
+
+        @memoize(configuration=configuration, expiry_sweeper=sweeper)
+        async def get_value(arg):
+            return arg
+
+        release = sweeper._release
+
+        async def recording_release(keys):
+            batches.append(len(keys))
+            await release(keys)
+
+        sweeper._initialize(recording_release)
+
+        # when
+        for arg in range(10):
+            await get_value(arg)
+        await asyncio.sleep(0.1)
+
+        # then
+        assert 10 == sum(batches)
+        assert 3 == max(batches)
+        assert {} == configuration.storage()._data
+
+    async def test_should_not_process_ticks_passed_while_idle(self):
+        # given
+        sweeper = ExpirySweeper(tick=timedelta(milliseconds=10))
+        later = time.time() + 3600
+
+        # when
+        with patch('memoize.expiry.time.time', return_value=later):
+            sweeper.schedule('key', later)
+        with patch.object(TimerWheel, '_cascade', autospec=True, side_effect=TimerWheel._cascade) as cascade:
+            due = sweeper._wheel.advance(later + 0.02, limit=10)
+        await asyncio.sleep(0.02)
+
+        # then
+        assert ['key'] == due
+        assert cascade.call_count <= 3
+        assert 0 == len(sweeper)
+
+    async def test_should_not_accept_non_positive_batch_size(self):
+        # when
+        with pytest.raises(ValueError):
+            ExpirySweeper(batch_size=0)
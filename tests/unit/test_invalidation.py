@@ -4,7 +4,9 @@ from tests.py310workaround import fix_python_3_10_compatibility
 
 fix_python_3_10_compatibility()
 
+from memoize.configuration import MutableCacheConfiguration, DefaultInMemoryCacheConfiguration
 from memoize.invalidation import InvalidationSupport
+from memoize.key import TupleKeyExtractor
 from memoize.wrapper import memoize
 
 
@@ -40,6 +42,37 @@ class TestInvalidationSupport:
         assert res4 == 2  # post-invalidation
         assert res5 == 3  # post-second-invalidation
 
+    async def test_invalidation_of_tuple_keys(self):
+        # given
+        invalidation = InvalidationSupport()
+        global counter
+        counter = 0
+
+        @memoize(
+            configuration=MutableCacheConfiguration
+            .initialized_with(DefaultInMemoryCacheConfiguration())
+            .set_key_extractor(TupleKeyExtractor()),
+            invalidation=invalidation
+        )
+        async def sample_method(arg, kwarg=None):
+            global counter
+            counter += 1
+            return counter
+
+        # when
+        res1 = await sample_method(1)
+        res2 = await sample_method('test', kwarg=['args'])
+        await invalidation.invalidate_for_arguments((1,), {})
+        await invalidation.invalidate_for_arguments(('test',), {'kwarg': ['args']})
+        res3 = await sample_method(1)
+        res4 = await sample_method('test', kwarg=['args'])
+
+        # then
+        assert res1 == 1
+        assert res2 == 2
+        assert res3 == 3  # post-invalidation
+        assert res4 == 4  # post-invalidation (key of unhashable kwarg)
+
     async def test_invalidation_throws_when_not_configured(self):
         # given
         invalidation = InvalidationSupport()
@@ -4,11 +4,20 @@ from tests.py310workaround import fix_python_3_10_compatibility
 
 fix_python_3_10_compatibility()
 
-from unittest.mock import Mock
+import dataclasses
+import datetime
+import enum
+import gc
+import inspect
+import os
+import subprocess
+import sys
+from unittest.mock import Mock, patch
 
 from tests import _ensure_background_tasks_finished, _assert_called_once_with, AnyObject, _as_future
 from memoize.configuration import MutableCacheConfiguration, DefaultInMemoryCacheConfiguration
-from memoize.key import EncodedMethodNameAndArgsKeyExtractor, EncodedMethodReferenceAndArgsKeyExtractor
+from memoize.key import EncodedMethodNameAndArgsKeyExtractor, EncodedMethodReferenceAndArgsKeyExtractor, \
+    HashedArgsKeyExtractor, TupleKeyExtractor, NormalizedArgsKeyExtractor, InstanceScopedKeyExtractor
 from memoize.wrapper import memoize
 
 
@@ -130,3 +139,379 @@ class EncodedMethodNameAndArgsKeyExtractorTests:
 
         # then
         assert key, "('helper_method', ('a', 'b') ==  {'z': 'c'})"
+
+
+def sample_function(arg, kwarg=None):
+    return arg
+
+
+@dataclasses.dataclass
+class SampleArgument:
+    name: str
+    tags: frozenset
+
+
+class SampleEnum(enum.Enum):
+    A = 'a'
+
+
+class TestHashedArgsKeyExtractor:
+
+    def test_should_format_compact_key_prefixed_with_qualified_name(self):
+        # given
+        extractor = HashedArgsKeyExtractor()
+
+        # when
+        key = extractor.format_key(sample_function, ('x' * 10_000,), {'kwarg': list(range(1000))})
+
+        # then
+        prefix, digest = key.split(':')
+        assert prefix == 'tests.unit.test_key.sample_function'
+        assert len(digest) == 32
+
+    def test_should_format_digest_only_on_name_excluded(self):
+        # given
+        extractor = HashedArgsKeyExtractor(digest_size=8, include_name=False)
+
+        # when
+        key = extractor.format_key(sample_function, ('test',), {})
+
+        # then
+        assert len(key) == 16
+
+    def test_should_format_same_key_regardless_of_kwargs_order(self):
+        # given
+        extractor = HashedArgsKeyExtractor()
+
+        # when
+        key1 = extractor.format_key(sample_function, (), {'a': 1, 'b': {'x': 1, 'y': 2}})
+        key2 = extractor.format_key(sample_function, (), {'b': {'y': 2, 'x': 1}, 'a': 1})
+
+        # then
+        assert key1 == key2
+
+    def test_should_format_different_keys_for_different_args(self):
+        # given
+        extractor = HashedArgsKeyExtractor()
+        args = [(1,), ('1',), (1.0,), (True,), (b'1',), ([1],), ((1,),), ({1},), (None,), ('a', 'b'), ('ab',),
+                (SampleEnum.A,), ('a',), (SampleArgument('a', frozenset()),), (datetime.date(2020, 1, 1),)]
+
+        # when
+        keys = {extractor.format_key(sample_function, call_args, {}) for call_args in args}
+
+        # then
+        assert len(keys) == len(args)
+
+    def test_should_skip_first_arg_on_skip_flag_set(self):
+        # given
+        extractor = HashedArgsKeyExtractor(skip_first_arg_as_self=True)
+
+        # when
+        key1 = extractor.format_key(sample_function, (object(), 'test'), {})
+        key2 = extractor.format_key(sample_function, (object(), 'test'), {})
+
+        # then
+        assert key1 == key2
+
+    def test_should_reject_args_without_stable_representation(self):
+        # given
+        extractor = HashedArgsKeyExtractor()
+
+        # when/then
+        with pytest.raises(TypeError):
+            extractor.format_key(sample_function, (object(),), {})
+
+    def test_should_use_encoder_for_unsupported_args(self):
+        # given
+        class Point:
+            def __init__(self, x):
+                self.x = x
+
+        extractor = HashedArgsKeyExtractor(encoder=lambda point: point.x)
+
+        # when
+        key1 = extractor.format_key(sample_function, (Point(1),), {})
+        key2 = extractor.format_key(sample_function, (Point(1),), {})
+        key3 = extractor.format_key(sample_function, (Point(2),), {})
+
+        # then
+        assert key1 == key2
+        assert key1 != key3
+
+    def test_should_format_same_key_in_different_processes(self):
+        # given
+        script = ('from memoize.key import HashedArgsKeyExtractor\n'
+                  'from tests.unit.test_key import sample_function, SampleArgument\n'
+                  'print(HashedArgsKeyExtractor().format_key('
+                  'sample_function, ({"a", "b", "c"}, SampleArgument("x", frozenset({"y", "z"}))), {"kwarg": 1.5}))')
+
+        # when
+        keys = {subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True,
+                               env={**os.environ, 'PYTHONHASHSEED': str(seed)}).stdout
+                for seed in range(3)}
+
+        # then
+        assert len(keys) == 1
+
+
+class TestTupleKeyExtractor:
+
+    def test_should_use_args_as_key_on_single_int_or_str_arg(self):
+        # given
+        extractor = TupleKeyExtractor()
+
+        # when
+        key1 = extractor.format_key(sample_function, (1,), {})
+        key2 = extractor.format_key(sample_function, ('test',), {})
+
+        # then
+        assert key1 == (sample_function, 1)
+        assert key2 == (sample_function, 'test')
+
+    def test_should_format_same_keys_for_same_args(self):
+        # given
+        extractor = TupleKeyExtractor()
+
+        # when
+        key1 = extractor.format_key(sample_function, (1, 'a', (2, 3)), {'kwarg': None})
+        key2 = extractor.format_key(sample_function, (1, 'a', (2, 3)), {'kwarg': None})
+
+        # then
+        assert key1 == key2
+        assert hash(key1) == hash(key2)
+
+    def test_should_format_different_keys_for_different_args(self):
+        # given
+        extractor = TupleKeyExtractor()
+        calls = [((1,), {}), (('1',), {}), ((1, 2), {}), (((1, 2),), {}), ((1,), {'kwarg': 2}),
+                 ((1, 'kwarg', 2), {}), ((), {'kwarg': 1}), (([1],), {}), (([2],), {})]
+
+        # when
+        keys = {extractor.format_key(sample_function, call_args, call_kwargs) for call_args, call_kwargs in calls}
+
+        # then
+        assert len(keys) == len(calls)
+
+    def test_should_distinguish_types_only_if_typed(self):
+        # given
+        extractor = TupleKeyExtractor()
+        typed_extractor = TupleKeyExtractor(typed=True)
+
+        # when
+        keys = {extractor.format_key(sample_function, call_args, {}) for call_args in [(1,), (1.0,), (True,)]}
+        typed_keys = {typed_extractor.format_key(sample_function, call_args, {'kwarg': call_args[0]})
+                      for call_args in [(1,), (1.0,), (True,)]}
+
+        # then
+        assert len(keys) == 1
+        assert len(typed_keys) == 3
+
+    def test_should_fall_back_to_string_key_on_unhashable_args(self):
+        # given
+        extractor = TupleKeyExtractor()
+
+        # when
+        key = extractor.format_key(sample_function, ([1, 2],), {'kwarg': {'a': 1}})
+
+        # then
+        assert key == str((sample_function, ([1, 2],), {'kwarg': {'a': 1}},))
+
+    def test_should_skip_first_arg_as_self(self):
+        # given
+        extractor = TupleKeyExtractor(skip_first_arg_as_self=True)
+
+        # when
+        key1 = extractor.format_key(sample_function, (object(), 1), {})
+        key2 = extractor.format_key(sample_function, (object(), 1), {})
+
+        # then
+        assert key1 == key2
+
+
+def sample_function_with_defaults(a, b=2, *args, c=3, **kwargs):
+    return a
+
+
+class SampleClass:
+    def method(self, arg, logger=None):
+        return arg
+
+
+class TestNormalizedArgsKeyExtractor:
+
+    def test_should_format_same_key_for_equivalent_calls(self):
+        # given
+        extractor = NormalizedArgsKeyExtractor()
+        calls = [((1,), {}), ((1, 2), {}), ((1,), {'b': 2}), ((), {'a': 1, 'b': 2}), ((), {'b': 2, 'a': 1, 'c': 3})]
+
+        # when
+        keys = {extractor.format_key(sample_function_with_defaults, call_args, call_kwargs)
+                for call_args, call_kwargs in calls}
+
+        # then
+        assert len(keys) == 1
+
+    def test_should_pass_normalized_args_to_key_extractor(self):
+        # given
+        key_extractor = Mock()
+        key_extractor.format_key = Mock(return_value='key')
+        extractor = NormalizedArgsKeyExtractor(key_extractor)
+
+        # when
+        extractor.format_key(sample_function_with_defaults, (1, 2, 5, 6), {'z': 1, 'y': 2})
+
+        # then
+        _assert_called_once_with(key_extractor.format_key,
+                                 (sample_function_with_defaults, (5, 6), {'a': 1, 'b': 2, 'c': 3, 'y': 2, 'z': 1}), {})
+
+    def test_should_format_different_keys_for_different_args(self):
+        # given
+        extractor = NormalizedArgsKeyExtractor()
+
+        # when
+        key1 = extractor.format_key(sample_function_with_defaults, (1,), {})
+        key2 = extractor.format_key(sample_function_with_defaults, (1,), {'c': 4})
+        key3 = extractor.format_key(sample_function_with_defaults, (1, 2, 3), {})
+
+        # then
+        assert len({key1, key2, key3}) == 3
+
+    def test_should_exclude_parameters(self):
+        # given
+        extractor = NormalizedArgsKeyExtractor(exclude=['self', 'logger'])
+
+        # when
+        key1 = extractor.format_key(SampleClass.method, (SampleClass(), 'test'), {'logger': Mock()})
+        key2 = extractor.format_key(SampleClass.method, (SampleClass(), 'test'), {})
+
+        # then
+        assert key1 == key2
+
+    def test_should_include_only_given_parameters(self):
+        # given
+        extractor = NormalizedArgsKeyExtractor(include=['arg'])
+
+        # when
+        key1 = extractor.format_key(SampleClass.method, (SampleClass(), 'test', Mock()), {})
+        key2 = extractor.format_key(SampleClass.method, (SampleClass(),), {'arg': 'test'})
+        key3 = extractor.format_key(SampleClass.method, (SampleClass(),), {'arg': 'other'})
+
+        # then
+        assert key1 == key2
+        assert key1 != key3
+
+    def test_should_pass_calls_not_matching_signature_as_they_are(self):
+        # given
+        extractor = NormalizedArgsKeyExtractor()
+
+        # when
+        key = extractor.format_key(sample_function, (1, 2, 3), {})
+
+        # then
+        assert key == EncodedMethodReferenceAndArgsKeyExtractor().format_key(sample_function, (1, 2, 3), {})
+
+    def test_should_not_mix_extra_kwargs_with_positional_only_parameters(self):
+        # given
+        extractor = NormalizedArgsKeyExtractor()
+
+        def function_with_positional_only(*args, **kwargs):  # (a, /, **kwargs) - syntax not supported by python 3.7
+            pass
+
+        function_with_positional_only.__signature__ = inspect.Signature([
+            inspect.Parameter('a', inspect.Parameter.POSITIONAL_ONLY),
+            inspect.Parameter('kwargs', inspect.Parameter.VAR_KEYWORD),
+        ])
+
+        # when
+        key1 = extractor.format_key(function_with_positional_only, (1,), {'a': 2})
+        key2 = extractor.format_key(function_with_positional_only, (2,), {})
+
+        # then
+        assert key1 != key2
+
+    def test_should_inspect_signature_of_each_method_once(self):
+        # given
+        extractor = NormalizedArgsKeyExtractor()
+        signature = Mock(wraps=inspect.signature)
+
+        # when
+        with patch('memoize.key.inspect.signature', signature):
+            for _ in range(100):
+                extractor.format_key(sample_function, (1,), {})
+                extractor.format_key(sample_function_with_defaults, (1,), {})
+
+        # then
+        assert 2 == signature.call_count
+
+    def test_should_throw_on_unknown_parameters(self):
+        # given
+        extractor = NormalizedArgsKeyExtractor(exclude=['logger'])
+
+        # when
+        with pytest.raises(ValueError):
+            extractor.format_key(sample_function, (1,), {})
+
+
+class TestInstanceScopedKeyExtractor:
+
+    def test_should_format_same_keys_for_same_instance_only(self):
+        # given
+        extractor = InstanceScopedKeyExtractor()
+        instance, other_instance = SampleClass(), SampleClass()
+
+        # when
+        key1 = extractor.format_key(SampleClass.method, (instance, 'test'), {})
+        key2 = extractor.format_key(SampleClass.method, (instance, 'test'), {})
+        key3 = extractor.format_key(SampleClass.method, (other_instance, 'test'), {})
+
+        # then
+        assert key1 == key2
+        assert key1 != key3
+
+    def test_should_report_keys_of_collected_instance_to_listeners(self):
+        # given
+        extractor = InstanceScopedKeyExtractor()
+        listener = Mock()
+        extractor.add_release_listener(listener)
+        instance, other_instance = SampleClass(), SampleClass()
+        key1 = extractor.format_key(SampleClass.method, (instance, 'test'), {})
+        key2 = extractor.format_key(SampleClass.method, (instance, 'other'), {})
+        key3 = extractor.format_key(SampleClass.method, (other_instance, 'test'), {})
+        for key in (key1, key2, key3):
+            extractor.on_written(key)
+
+        # when
+        del instance
+        gc.collect()
+
+        # then
+        listener.assert_called_once()
+        assert {key1, key2} == set(listener.call_args[0][0])
+
+    def test_should_not_report_keys_released_or_never_written(self):
+        # given
+        extractor = InstanceScopedKeyExtractor()
+        listener = Mock()
+        extractor.add_release_listener(listener)
+        instance = SampleClass()
+        written = extractor.format_key(SampleClass.method, (instance, 'written'), {})
+        released = extractor.format_key(SampleClass.method, (instance, 'released'), {})
+        extractor.format_key(SampleClass.method, (instance, 'never written'), {})
+        extractor.on_written(written)
+        extractor.on_written(released)
+
+        # when
+        extractor.on_released([released])
+        del instance
+        gc.collect()
+
+        # then
+        listener.assert_called_once_with([written])
+
+    def test_should_throw_on_instance_not_supporting_weak_references(self):
+        # given
+        extractor = InstanceScopedKeyExtractor()
+
+        # when
+        with pytest.raises(TypeError):
+            extractor.format_key(sample_function, (1, 'test'), {})
@@ -0,0 +1,237 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from memoize.backoff import ExponentialFailureBackoff
+from memoize.configuration import DefaultInMemoryCacheConfiguration, MutableCacheConfiguration
+from memoize.eviction import LeastRecentlyUpdatedEvictionStrategy, SizeWeightedEvictionStrategy
+from memoize.exceptions import CachedMethodFailedException
+from memoize.metrics import CacheEvent, Histogram, InMemoryMetrics, Latency, PrometheusTextExporter
+from memoize.syncwrapper import memoize_sync
+from memoize.wrapper import memoize
+from tests import _ensure_background_tasks_finished
+
+
+def _configuration(metrics, update_after=timedelta(minutes=1), expire_after=timedelta(minutes=2)):
+    return MutableCacheConfiguration \
+        .initialized_with(DefaultInMemoryCacheConfiguration(update_after=update_after, expire_after=expire_after)) \
+        .set_metrics_listener(metrics)
+
+
+class TestHistogram:
+
+    def test_should_count_observations_in_cumulative_buckets(self):
+        # given
+        histogram = Histogram(buckets=(0.1, 1.0))
+
+        # when
+        for value in [0.05, 0.1, 0.5, 5.0]:
+            histogram.observe(value)
+
+        # then
+        assert histogram.cumulative_counts() == [(0.1, 2), (1.0, 3), (float('inf'), 4)]
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(5.65)
+
+
+class TestPrometheusTextExporter:
+
+    def test_should_export_counters_and_histograms_of_all_caches(self):
+        # given
+        users = InMemoryMetrics(name='users', buckets=(0.1,))
+        users.on_event(CacheEvent.HIT, 'key')
+        users.on_event(CacheEvent.HIT, 'key')
+        users.on_latency(Latency.METHOD, 0.5)
+        exporter = PrometheusTextExporter(users, prefix='app')
+        exporter.register(InMemoryMetrics(name='say "hi"'))
+
+        # when
+        exported = exporter.export().splitlines()
+
+        # then
+        assert '# TYPE app_events_total counter' in exported
+        assert 'app_events_total{cache="users",event="hit"} 2' in exported
+        assert 'app_events_total{cache="users",event="miss"} 0' in exported
+        assert 'app_events_total{cache="say \\"hi\\"",event="hit"} 0' in exported
+        assert '# TYPE app_latency_seconds histogram' in exported
+        assert 'app_latency_seconds_bucket{cache="users",operation="method",le="0.1"} 0' in exported
+        assert 'app_latency_seconds_bucket{cache="users",operation="method",le="+Inf"} 1' in exported
+        assert 'app_latency_seconds_sum{cache="users",operation="method"} 0.5' in exported
+        assert 'app_latency_seconds_count{cache="users",operation="method"} 1' in exported
+
+
+@pytest.mark.asyncio(scope="class")
+class TestWrapperMetrics:
+
+    async def test_should_report_hits_misses_and_latencies(self):
+        # given
+        metrics = InMemoryMetrics()
+
+        @memoize(configuration=_configuration(metrics))
+        async def get_value(arg):
+            return arg
+
+        # when
+        await get_value('a')
+        await get_value('a')
+        await get_value('b')
+
+        # then
+        assert metrics.events[CacheEvent.HIT] == 1
+        assert metrics.events[CacheEvent.MISS] == 2
+        assert metrics.events[CacheEvent.BLOCKING_REFRESH] == 2
+        assert metrics.latencies[Latency.STORAGE_GET].count == 3
+        assert metrics.latencies[Latency.STORAGE_OFFER].count == 2
+        assert metrics.latencies[Latency.METHOD].count == 2
+
+    async def test_should_report_dogpile_waits(self):
+        # given
+        metrics = InMemoryMetrics()
+
+        @memoize(configuration=_configuration(metrics))
+        async def get_value(arg):
+            await asyncio.sleep(0.01)
+            return arg
+
+        # when
+        await asyncio.gather(*[get_value('a') for _ in range(3)])
+
+        # then
+        assert metrics.events[CacheEvent.MISS] == 3
+        assert metrics.events[CacheEvent.BLOCKING_REFRESH] == 1
+        assert metrics.events[CacheEvent.DOGPILE_WAIT] == 2
+
+    async def test_should_report_background_refreshes(self):
+        # given
+        metrics = InMemoryMetrics()
+
+        @memoize(configuration=_configuration(metrics, update_after=timedelta(0)))
+        async def get_value(arg):
+            return arg
+
+        # when
+        await get_value('a')
+        await get_value('a')
+        await _ensure_background_tasks_finished()
+
+        # then
+        assert metrics.events[CacheEvent.HIT] == 1
+        assert metrics.events[CacheEvent.BACKGROUND_REFRESH] == 1
+
+    async def test_should_report_failures_and_stale_entries_served(self):
+        # given
+        metrics = InMemoryMetrics()
+        fail = False
+
+        @memoize(configuration=_configuration(metrics, update_after=timedelta(0), expire_after=timedelta(0))
+                 .set_stale_if_error(timedelta(minutes=1)))
+        async def get_value(arg):
+            if fail:
+                raise ValueError('backend down')
+            return arg
+
+        # when
+        await get_value('a')
+        fail = True
+        await get_value('a')
+        await _ensure_background_tasks_finished()
+
+        # then
+        assert metrics.events[CacheEvent.STALE_SERVED] == 1
+        assert metrics.events[CacheEvent.FAILURE] == 2  # blocking refresh & its background retry
+
+    async def test_should_report_method_latency_of_calls_not_cached(self):
+        # given
+        metrics = InMemoryMetrics()
+
+        @memoize(configuration=_configuration(metrics).set_method_timeout(timedelta(milliseconds=10)))
+        async def get_value(arg):
+            if arg == 'failing':
+                raise ValueError('backend down')
+            await asyncio.sleep(1)
+
+        @memoize(configuration=_configuration(metrics)
+                 .set_eviction_strategy(SizeWeightedEvictionStrategy(max_entry_size=0)))
+        async def get_not_admitted_value(arg):
+            return arg
+
+        # when
+        for arg in ['failing', 'timing-out']:
+            with pytest.raises(CachedMethodFailedException):
+                await get_value(arg)
+        await get_not_admitted_value('a')
+
+        # then
+        assert metrics.latencies[Latency.METHOD].count == 3
+        assert metrics.latencies[Latency.STORAGE_OFFER].count == 0
+
+    async def test_should_report_failures_served_from_cache(self):
+        # given
+        metrics = InMemoryMetrics()
+
+        @memoize(configuration=_configuration(metrics).set_failure_backoff(ExponentialFailureBackoff()))
+        async def get_value(arg):
+            raise ValueError('backend down')
+
+        # when
+        for _ in range(2):
+            with pytest.raises(CachedMethodFailedException):
+                await get_value('a')
+
+        # then
+        assert metrics.events[CacheEvent.FAILURE] == 2
+        assert metrics.events[CacheEvent.BLOCKING_REFRESH] == 1
+
+    async def test_should_report_releases(self):
+        # given
+        metrics = InMemoryMetrics()
+
+        @memoize(configuration=_configuration(metrics)
+                 .set_eviction_strategy(LeastRecentlyUpdatedEvictionStrategy(capacity=1)))
+        async def get_value(arg):
+            return arg
+
+        # when
+        await get_value('a')
+        await get_value('b')
+        await _ensure_background_tasks_finished()
+
+        # then
+        assert metrics.events[CacheEvent.RELEASE] == 1
+
+
+class TestSyncWrapperMetrics:
+
+    def test_should_report_hits_and_misses(self):
+        # given
+        metrics = InMemoryMetrics()
+
+        @memoize_sync(configuration=_configuration(metrics))
+        def get_value(arg):
+            return arg
+
+        # when
+        get_value('a')
+        get_value('a')
+
+        # then
+        assert metrics.events[CacheEvent.HIT] == 1
+        assert metrics.events[CacheEvent.MISS] == 1
+        assert metrics.latencies[Latency.METHOD].count == 1
+
+    def test_should_report_method_latency_of_failed_calls(self):
+        # given
+        metrics = InMemoryMetrics()
+
+        @memoize_sync(configuration=_configuration(metrics))
+        def get_value(arg):
+            raise ValueError('backend down')
+
+        # when
+        with pytest.raises(CachedMethodFailedException):
+            get_value('a')
+
+        # then
+        assert metrics.events[CacheEvent.FAILURE] == 1
+        assert metrics.latencies[Latency.METHOD].count == 1
@@ -0,0 +1,177 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from memoize.configuration import DefaultInMemoryCacheConfiguration, MutableCacheConfiguration
+from memoize.entrybuilder import ProvidedLifeSpanCacheEntryBuilder
+from memoize.exceptions import CachedMethodFailedException
+from memoize.profiling import InMemorySpanExporter, SamplingProfiler, Span, Stage
+from tests import _ensure_background_tasks_finished
+from memoize.wrapper import memoize
+
+
+def _configuration(profiler):
+    return MutableCacheConfiguration.initialized_with(DefaultInMemoryCacheConfiguration()).set_profiler(profiler)
+
+
+class TestSpan:
+
+    def test_should_finish_span_on_exit_and_keep_error(self):
+        # given
+        span = Span(Stage.CALL)
+
+        # when
+        with pytest.raises(ValueError):
+            with span.child(Stage.METHOD):
+                raise ValueError('failed')
+
+        # then
+        child, = span.children
+        assert child.duration is not None
+        assert isinstance(child.error, ValueError)
+        assert span.duration is None
+
+    def test_should_record_finished_span(self):
+        # given
+        span = Span(Stage.CALL)
+
+        # when
+        child = span.record(Stage.STORAGE_GET, 0.5)
+
+        # then
+        assert child.duration == 0.5
+        assert child.start_time <= span.start_time - 0.5 + 0.01
+
+
+class TestSamplingProfiler:
+
+    def test_should_reject_invalid_rate(self):
+        with pytest.raises(ValueError):
+            SamplingProfiler(rate=1.5)
+
+    def test_should_sample_calls_according_to_rate(self):
+        # given
+        never = SamplingProfiler(rate=0.0)
+        always = SamplingProfiler(rate=1.0)
+
+        # when/then
+        assert all(never.start({}) is None for _ in range(100))
+        assert all(always.start({}) is not None for _ in range(100))
+
+
+@pytest.mark.asyncio(scope="class")
+class TestWrapperProfiling:
+
+    async def test_should_export_spans_of_stages_of_profiled_calls(self):
+        # given
+        exporter = InMemorySpanExporter()
+
+        @memoize(configuration=_configuration(SamplingProfiler(rate=1.0, exporter=exporter)))
+        async def get_value(arg):
+            return arg
+
+        # when
+        await get_value('test')
+        await get_value('test')
+
+        # then
+        miss, hit = exporter.spans
+        assert miss.attributes['method'].endswith('get_value')
+        assert [child.stage for child in miss.children] == [Stage.KEY_EXTRACTION, Stage.STORAGE_GET, Stage.METHOD,
+                                                            Stage.STORAGE_OFFER, Stage.POSTPROCESSING]
+        assert [child.stage for child in hit.children] == [Stage.KEY_EXTRACTION, Stage.STORAGE_GET,
+                                                           Stage.POSTPROCESSING]
+        assert all(span.duration is not None for span in [miss, hit] + miss.children + hit.children)
+
+    async def test_should_pass_stage_timings_to_hook(self):
+        # given
+        timings = []
+
+        @memoize(configuration=_configuration(SamplingProfiler(rate=1.0, hook=lambda t, span: timings.append(t))))
+        async def get_value(arg):
+            return arg
+
+        # when
+        await get_value('test')
+
+        # then
+        stage_timings, = timings
+        assert set(stage_timings) == {Stage.CALL, Stage.KEY_EXTRACTION, Stage.STORAGE_GET, Stage.METHOD,
+                                      Stage.STORAGE_OFFER, Stage.POSTPROCESSING}
+        assert stage_timings[Stage.CALL] >= stage_timings[Stage.METHOD]
+
+    async def test_should_export_failed_calls_with_error(self):
+        # given
+        exporter = InMemorySpanExporter()
+
+        @memoize(configuration=_configuration(SamplingProfiler(rate=1.0, exporter=exporter)))
+        async def get_value(arg):
+            raise ValueError('failed')
+
+        # when
+        with pytest.raises(CachedMethodFailedException):
+            await get_value('test')
+
+        # then
+        span, = exporter.spans
+        assert isinstance(span.error, CachedMethodFailedException)
+
+    async def test_should_not_export_calls_not_sampled(self):
+        # given
+        exporter = InMemorySpanExporter()
+
+        @memoize(configuration=_configuration(SamplingProfiler(rate=0.0, exporter=exporter)))
+        async def get_value(arg):
+            return arg
+
+        # when
+        await get_value('test')
+
+        # then
+        assert exporter.spans == []
+
+    async def test_should_export_stages_of_refresh_awaited_within_max_blocking_wait(self):
+        # given
+        exporter = InMemorySpanExporter()
+
+        @memoize(configuration=_configuration(SamplingProfiler(rate=1.0, exporter=exporter))
+                 .set_entry_builder(ProvidedLifeSpanCacheEntryBuilder(update_after=timedelta(0),
+                                                                      expire_after=timedelta(0)))
+                 .set_max_blocking_wait(timedelta(seconds=1)))
+        async def get_value(arg):
+            return arg
+
+        # when
+        await get_value('test')
+        await get_value('test')
+
+        # then
+        _, expired = exporter.spans
+        assert [child.stage for child in expired.children] == [Stage.KEY_EXTRACTION, Stage.STORAGE_GET, Stage.METHOD,
+                                                               Stage.STORAGE_OFFER, Stage.POSTPROCESSING]
+
+    async def test_should_not_export_stages_of_refresh_left_in_background(self):
+        # given
+        exporter = InMemorySpanExporter()
+        delay = 0
+
+        @memoize(configuration=_configuration(SamplingProfiler(rate=1.0, exporter=exporter))
+                 .set_entry_builder(ProvidedLifeSpanCacheEntryBuilder(update_after=timedelta(0),
+                                                                      expire_after=timedelta(0)))
+                 .set_max_blocking_wait(timedelta(milliseconds=10)))
+        async def get_value(arg):
+            await asyncio.sleep(delay)
+            return arg
+
+        # when
+        await get_value('test')
+        delay = 0.05
+        await get_value('test')
+        await _ensure_background_tasks_finished()
+        await asyncio.sleep(0.1)
+
+        # then
+        _, stale = exporter.spans
+        assert [child.stage for child in stale.children] == [Stage.KEY_EXTRACTION, Stage.STORAGE_GET,
+                                                             Stage.POSTPROCESSING]
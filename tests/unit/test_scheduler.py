@@ -0,0 +1,134 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from memoize.configuration import DefaultInMemoryCacheConfiguration
+from memoize.scheduler import BoundedRefreshScheduler, ImmediateRefreshScheduler
+from memoize.wrapper import memoize
+from tests import _ensure_background_tasks_finished
+
+
+@pytest.mark.asyncio(scope="class")
+class TestBoundedRefreshScheduler:
+
+    def setup_method(self):
+        self.started = []
+        self.releases = {}
+
+    def _refresh(self, key):
+        async def refresh():
+            self.started.append(key)
+            release = self.releases[key] = asyncio.Event()
+            await release.wait()
+
+        return refresh
+
+    async def _finish(self, key):
+        self.releases[key].set()
+        await _ensure_background_tasks_finished()
+
+    async def test_should_limit_concurrently_running_refreshes(self):
+        # given
+        scheduler = BoundedRefreshScheduler(max_concurrency=2)
+
+        # when
+        for key in ['a', 'b', 'c']:
+            scheduler.schedule(key, self._refresh(key))
+        await _ensure_background_tasks_finished()
+        started_before = list(self.started)
+        await self._finish('a')
+
+        # then
+        assert ['a', 'b'] == started_before
+        assert ['a', 'b', 'c'] == self.started
+        await self._finish('b')
+        await self._finish('c')
+
+    async def test_should_deduplicate_refreshes_by_key(self):
+        # given
+        scheduler = BoundedRefreshScheduler(max_concurrency=1)
+
+        # when
+        for key in ['a', 'a', 'b', 'b', 'b']:
+            scheduler.schedule(key, self._refresh(key))
+        await _ensure_background_tasks_finished()
+        await self._finish('a')
+        await self._finish('b')
+
+        # then
+        assert ['a', 'b'] == self.started
+
+    async def test_should_start_most_frequently_requested_refresh_first(self):
+        # given
+        scheduler = BoundedRefreshScheduler(max_concurrency=1)
+
+        # when
+        for key in ['a', 'b', 'c', 'c', 'b', 'c']:
+            scheduler.schedule(key, self._refresh(key))
+        await _ensure_background_tasks_finished()
+        await self._finish('a')
+        await self._finish('c')
+        await self._finish('b')
+
+        # then
+        assert ['a', 'c', 'b'] == self.started
+
+    async def test_should_drop_refreshes_on_queue_full(self):
+        # given
+        scheduler = BoundedRefreshScheduler(max_concurrency=1, max_queued=1)
+
+        # when
+        for key in ['a', 'b', 'c']:
+            scheduler.schedule(key, self._refresh(key))
+        await _ensure_background_tasks_finished()
+        await self._finish('a')
+        await self._finish('b')
+
+        # then
+        assert ['a', 'b'] == self.started
+
+    async def test_should_start_queued_refresh_after_failure(self):
+        # given
+        scheduler = BoundedRefreshScheduler(max_concurrency=1)
+
+        async def failing():
+            raise ValueError('Get lost')
+
+        # when
+        scheduler.schedule('a', failing)
+        scheduler.schedule('b', self._refresh('b'))
+        await _ensure_background_tasks_finished()
+
+        # then
+        assert ['b'] == self.started
+        await self._finish('b')
+
+
+@pytest.mark.asyncio(scope="class")
+class TestRefreshSchedulerInteractions:
+
+    async def test_should_pass_background_refreshes_to_scheduler(self):
+        # given
+        scheduler = Mock(wraps=ImmediateRefreshScheduler())
+        value = 0
+
+        @memoize(configuration=DefaultInMemoryCacheConfiguration(update_after=timedelta(milliseconds=50)),
+                 refresh_scheduler=scheduler)
+        async def get_value(arg):
+            return value
+
+        await get_value('test')
+        await asyncio.sleep(0.1)
+        value = 1
+
+        # when
+        res1 = await get_value('test')
+        await _ensure_background_tasks_finished()
+        res2 = await get_value('test')
+
+        # then
+        assert 0 == res1
+        assert 1 == res2
+        scheduler.schedule.assert_called_once()
@@ -0,0 +1,83 @@
+from tests.py310workaround import fix_python_3_10_compatibility
+
+fix_python_3_10_compatibility()
+
+import sys
+
+from memoize.entry import CacheEntry
+from memoize.serde import PickleSerDe
+from memoize.sizing import EstimatingSizer, SerDeSizer
+
+
+def entry_of(value) -> CacheEntry:
+    return CacheEntry(0.0, 0.0, 0.0, value)
+
+
+class SampleValue:
+    def __init__(self, payload):
+        self.payload = payload
+
+
+class TestEstimatingSizer:
+
+    def test_should_size_flat_values(self):
+        # given
+        sizer = EstimatingSizer()
+
+        # when
+        size = sizer.size('key', entry_of('x' * 1000))
+
+        # then
+        assert size == sys.getsizeof('x' * 1000)
+
+    def test_should_include_items_of_containers_and_attributes_of_objects(self):
+        # given
+        sizer = EstimatingSizer()
+        payload = ['x' * 1000, 'y' * 1000]
+
+        # when
+        list_size = sizer.size('key', entry_of(payload))
+        dict_size = sizer.size('key', entry_of({'payload': payload}))
+        object_size = sizer.size('key', entry_of(SampleValue(payload)))
+
+        # then
+        assert list_size > 2000
+        assert dict_size > list_size
+        assert object_size > list_size
+
+    def test_should_extrapolate_size_of_sampled_items(self):
+        # given
+        sizer = EstimatingSizer(sampled_items=10)
+        payload = ['x' * 100 for _ in range(1000)]
+
+        # when
+        size = sizer.size('key', entry_of(payload))
+
+        # then
+        assert size == sys.getsizeof(payload) + 1000 * sys.getsizeof('x' * 100)
+
+    def test_should_not_follow_values_nested_deeper_than_max_depth(self):
+        # given
+        sizer = EstimatingSizer(max_depth=1)
+        payload = [['x' * 1000]]
+
+        # when
+        size = sizer.size('key', entry_of(payload))
+
+        # then
+        assert size == sys.getsizeof(payload) + sys.getsizeof(payload[0])
+
+
+class TestSerDeSizer:
+
+    def test_should_use_size_of_serialized_entry(self):
+        # given
+        serde = PickleSerDe()
+        sizer = SerDeSizer(serde)
+        entry = entry_of('x' * 1000)
+
+        # when
+        size = sizer.size('key', entry)
+
+        # then
+        assert size == len(serde.serialize(entry))
@@ -4,9 +4,10 @@ from tests.py310workaround import fix_python_3_10_compatibility
 
 fix_python_3_10_compatibility()
 
+import threading
 from datetime import timedelta
 
-from memoize.statuses import InMemoryLocks, UpdateStatuses
+from memoize.statuses import InMemoryLocks, UpdateStatuses, ThreadLocks
 
 
 @pytest.mark.asyncio(scope="class")
@@ -118,3 +119,74 @@ class TestStatuses:
         assert str(result1) == str(ValueError('stub'))
         assert str(result2) == str(ValueError('stub'))
         assert str(result3) == str(ValueError('stub'))
+
+
+class TestThreadLocks:
+
+    def setup_method(self):
+        self.update_statuses: ThreadLocks = ThreadLocks()
+
+    def test_should_mark_being_updated_only_once(self):
+        # given/when
+        first = self.update_statuses.try_mark_being_updated('key')
+        second = self.update_statuses.try_mark_being_updated('key')
+
+        # then
+        assert first
+        assert not second
+        assert self.update_statuses.is_being_updated('key')
+
+    def test_should_raise_exception_during_mark_as_updated(self):
+        # given/when/then
+        with pytest.raises(ValueError):
+            self.update_statuses.mark_updated('key', None)
+
+    def test_should_wait_for_entry_updated_in_another_thread(self):
+        # given
+        self.update_statuses.mark_being_updated('key')
+        timer = threading.Timer(0.05, lambda: self.update_statuses.mark_updated('key', 'entry'))
+
+        # when
+        timer.start()
+        result = self.update_statuses.wait_updated('key')
+
+        # then
+        assert result == 'entry'
+        assert not self.update_statuses.is_being_updated('key')
+
+    def test_should_wait_for_exception_of_aborted_update(self):
+        # given
+        self.update_statuses.mark_being_updated('key')
+        timer = threading.Timer(0.05, lambda: self.update_statuses.mark_update_aborted('key', ValueError('stub')))
+
+        # when
+        timer.start()
+        result = self.update_statuses.wait_updated('key')
+
+        # then
+        assert str(result) == str(ValueError('stub'))
+
+    def test_should_release_lock_on_timeout_passed(self):
+        # given
+        self.update_statuses._update_lock_timeout = timedelta(milliseconds=10)
+        self.update_statuses.mark_being_updated('key')
+
+        # when
+        result = self.update_statuses.wait_updated('key')
+
+        # then
+        assert result is None
+        assert not self.update_statuses.is_being_updated('key')
+
+    @pytest.mark.asyncio
+    async def test_should_await_entry_updated_in_another_thread(self):
+        # given
+        self.update_statuses.mark_being_updated('key')
+        timer = threading.Timer(0.05, lambda: self.update_statuses.mark_updated('key', 'entry'))
+
+        # when
+        timer.start()
+        result = await self.update_statuses.await_updated('key')
+
+        # then
+        assert result == 'entry'
@@ -46,3 +46,24 @@ class TestLocalInMemoryCacheStorage:
 
         # then
         assert returned_value == None
+
+    async def test_objects_released_at_once_are_not_returned(self):
+        # given
+        await self.storage.offer(CACHE_KEY, CACHE_SAMPLE_ENTRY)
+        await self.storage.offer("other", CACHE_SAMPLE_ENTRY)
+
+        # when
+        await self.storage.release_many([CACHE_KEY, "other", "missing"])
+
+        # then
+        assert await self.storage.get_many([CACHE_KEY, "other"]) == [None, None]
+
+    async def test_get_many_returns_values_in_order_of_keys(self):
+        # given
+        await self.storage.offer(CACHE_KEY, CACHE_SAMPLE_ENTRY)
+
+        # when
+        returned_values = await self.storage.get_many(["missing", CACHE_KEY])
+
+        # then
+        assert returned_values == [None, CACHE_SAMPLE_ENTRY]